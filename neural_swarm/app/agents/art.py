@@ -1,15 +1,16 @@
 import json
-from google.genai import types
 from .base import SwarmAgent
 from ..models.project import ProjectContext
-from ..core.ai import client
+from ..core.providers import generate_json, generate_text
 from ..core.config import MODEL_FAST
-from ..core.utils import clean_and_parse_json, retry_with_backoff
+from ..core.utils import gather_limited, retry_with_backoff
+from ..core.batch import parallel_limit
+from ..core.schemas import get_schema
 from ..core.websocket import manager
-from ..core.i18n import i18n
+from ..core.i18n import i18n, LocalizedText
 
 class ArtDirectorAgent(SwarmAgent):
-    name: str = i18n.t("agents.ArtDirector.name")
+    name = LocalizedText("agents.ArtDirector.name")
     department: str = "Arte"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
@@ -23,15 +24,10 @@ class ArtDirectorAgent(SwarmAgent):
         })
         
         def _call():
-            res = client.models.generate_content(
-                model=MODEL_FAST,
-                contents=prompt,
-                config=types.GenerateContentConfig(response_mime_type="application/json")
-            )
-            return clean_and_parse_json(res.text)
+            return generate_json("ArtDirector", prompt, MODEL_FAST, get_schema("ArtDirector"))
         
         try:
-            context.art_direction = await retry_with_backoff(_call)
+            context.art_direction = await retry_with_backoff(_call, agent_id="ArtDirector")
             await self.log(f"✅ Estilo definido")
             await manager.broadcast("Dirección de Arte definida", "data_update", {"step": "art_direction", "data": context.art_direction})
         except Exception as e:
@@ -41,15 +37,14 @@ class ArtDirectorAgent(SwarmAgent):
         return context
 
 class PromptEngineerAgent(SwarmAgent):
-    name: str = i18n.t("agents.PromptEngineer.name")
+    name = LocalizedText("agents.PromptEngineer.name")
     department: str = "Arte"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
         await self.log("Generando prompts técnicos para cada bloque...")
         art_style = json.dumps(context.art_direction, indent=2, ensure_ascii=False)
-        prompts_list = []
         
-        for block in context.final_script:
+        async def _block_prompt(i, block):
             visual_suggestion = block.get("visual_suggestion", block.get("audio_text", "")[:100])
             section = block.get("section", "")
             
@@ -61,18 +56,19 @@ class PromptEngineerAgent(SwarmAgent):
             })
             
             def _call():
-                res = client.models.generate_content(model=MODEL_FAST, contents=prompt)
-                return res.text.strip()
+                return generate_text("PromptEngineer", prompt, MODEL_FAST).strip()
             
             try:
-                visual_prompt = await retry_with_backoff(_call)
-                prompts_list.append({
-                    "block": block.get("block", len(prompts_list)+1),
-                    "section": section,
-                    "prompt": visual_prompt
-                })
+                visual_prompt = await retry_with_backoff(_call, agent_id="PromptEngineer")
             except Exception as e:
-                prompts_list.append({"block": block.get("block", len(prompts_list)+1), "section": section, "prompt": "Cinematic shot"})
+                visual_prompt = "Cinematic shot"
+            return {"block": block.get("block", i + 1), "section": section, "prompt": visual_prompt}
+        
+        # Blocks are independent: fan out (bounded, or all at once in batch mode)
+        prompts_list = await gather_limited(
+            [_block_prompt(i, block) for i, block in enumerate(context.final_script)],
+            parallel_limit()
+        )
         
         context.visual_prompts = prompts_list
         await self.log(f"✅ {len(prompts_list)} prompts técnicos generados")
@@ -80,7 +76,7 @@ class PromptEngineerAgent(SwarmAgent):
         return context
 
 class ThumbnailStrategistAgent(SwarmAgent):
-    name: str = i18n.t("agents.ThumbnailStrategist.name")
+    name = LocalizedText("agents.ThumbnailStrategist.name")
     department: str = "Arte"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
@@ -95,15 +91,10 @@ class ThumbnailStrategistAgent(SwarmAgent):
         })
         
         def _call():
-            res = client.models.generate_content(
-                model=MODEL_FAST,
-                contents=prompt,
-                config=types.GenerateContentConfig(response_mime_type="application/json")
-            )
-            return clean_and_parse_json(res.text)
+            return generate_json("ThumbnailStrategist", prompt, MODEL_FAST, get_schema("ThumbnailStrategist"))
         
         try:
-            context.thumbnail_concept = await retry_with_backoff(_call)
+            context.thumbnail_concept = await retry_with_backoff(_call, agent_id="ThumbnailStrategist")
             await self.log(f"✅ Concepto de thumbnail definido")
             await manager.broadcast("Estrategia de Thumbnail definida", "data_update", {"step": "art_thumbnail", "data": context.thumbnail_concept})
         except Exception as e:
@@ -1,13 +1,13 @@
 import asyncio
-from typing import List, Dict
+from typing import Any, Awaitable, Callable, List, Dict, Optional
 from datetime import datetime
 from .base import AgentBase
-from ..core.ai import client
+from ..core.providers import generate_json
 from ..core.config import MODEL_FAST
 from ..core.i18n import i18n
-from ..core.utils import clean_and_parse_json, retry_with_backoff
+from ..core.utils import retry_with_backoff
+from ..core.schemas import get_schema
 from ..core.websocket import manager
-from google.genai import types
 from ..models.project import ProjectContext
 
 class SpecialistAuditor(AgentBase):
@@ -38,15 +38,10 @@ class SpecialistAuditor(AgentBase):
         })
         
         def _call():
-            res = client.models.generate_content(
-                model=MODEL_FAST,
-                contents=prompt,
-                config=types.GenerateContentConfig(response_mime_type="application/json")
-            )
-            return clean_and_parse_json(res.text)
+            return generate_json("SpecialistAuditor", prompt, MODEL_FAST, get_schema("SpecialistAuditor"))
         
         try:
-            result = await retry_with_backoff(_call)
+            result = await retry_with_backoff(_call, agent_id="SpecialistAuditor")
             result["agent_name"] = self.agent_name
             result["agent_icon"] = self.agent_icon
             await self.log(f"Score: {result.get('overall_score', 0)}/10 - {result.get('verdict', 'N/A')}")
@@ -79,13 +74,25 @@ class AuditPanel:
     async def log(self, message: str, type: str = "info"):
         await manager.broadcast(f"[AuditPanel] {message}", type)
 
-    async def execute(self, state: ProjectContext) -> ProjectContext:
+    async def execute(self, state: ProjectContext, only: Optional[List[str]] = None,
+                      on_report: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None) -> ProjectContext:
+        """Runs the panel; `only` limits it to the auditors with those names (reduced panel).
+
+        `on_report(agent_name, report)` is awaited as each auditor finishes (job progress).
+        """
         script_text = "\n".join([f"[{block.get('section', 'N/A')}] {block.get('audio_text', '')}" for block in state.final_script])
+        agents = [a for a in self.agents if a.agent_name in only] if only else self.agents
+        agents = agents or self.agents
         
-        await self.log("🎯 Convocando panel de 7 expertos...")
+        await self.log(f"🎯 Convocando panel de {len(agents)} expertos...")
         
-        tasks = [agent.evaluate(script_text, state.project_bible.get("selected_topic", {}).get("title", ""), state.niche, {}) for agent in self.agents]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        async def _evaluate(agent):
+            report = await agent.evaluate(script_text, state.project_bible.get("selected_topic", {}).get("title", ""), state.niche, {})
+            if on_report:
+                await on_report(agent.agent_name, report)
+            return report
+
+        results = await asyncio.gather(*[_evaluate(agent) for agent in agents], return_exceptions=True)
         
         agent_reports = []
         total_score = 0
@@ -95,14 +102,14 @@ class AuditPanel:
         
         for i, result in enumerate(results):
             if isinstance(result, Exception):
-                agent_reports.append({"agent_name": self.agents[i].agent_name, "agent_icon": self.agents[i].agent_icon, "overall_score": 0, "verdict": "ERROR"})
+                agent_reports.append({"agent_name": agents[i].agent_name, "agent_icon": agents[i].agent_icon, "overall_score": 0, "verdict": "ERROR"})
             else:
                 agent_reports.append(result)
                 score = result.get('overall_score', 0)
                 if score > 0:
                     total_score += score
                     valid_count += 1
-                all_issues.extend([(self.agents[i].agent_name, issue) for issue in result.get('top_issues', [])])
+                all_issues.extend([(agents[i].agent_name, issue) for issue in result.get('top_issues', [])])
                 all_quick_wins.extend(result.get('quick_wins', []))
         
         global_score = round(total_score / valid_count, 1) if valid_count > 0 else 0
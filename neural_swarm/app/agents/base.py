@@ -15,25 +15,12 @@ class SwarmAgent(AgentBase):
     async def execute(self, context: ProjectContext) -> ProjectContext:
         raise NotImplementedError
 
-    def grounded_call(self, client, model_id: str, prompt: str, response_mime_type: str = "text/plain") -> str:
-        """Realiza una llamada a Gemini con Búsqueda de Google (Grounding) habilitada."""
-        from google.genai import types
-        grounding_tool = types.Tool(google_search=types.GoogleSearch())
-        
-        # NOTE: Gemini API currently does not support tool use with response_mime_type="application/json"
-        # We fallback to text/plain if tools are used, trusting the prompt to guide JSON output format.
-        effective_mime_type = response_mime_type
-        if response_mime_type == "application/json":
-            effective_mime_type = "text/plain"
+    def grounded_call(self, agent_id: str, model_id: str, prompt: str) -> str:
+        """Realiza una llamada con Búsqueda de Google (Grounding) habilitada.
 
-        config = types.GenerateContentConfig(
-            tools=[grounding_tool],
-            response_mime_type=effective_mime_type
-        )
-        
-        res = client.models.generate_content(
-            model=model_id,
-            contents=prompt,
-            config=config
-        )
-        return res.text
+        Gemini does not support tool use together with response_mime_type="application/json",
+        so grounded calls always return text and callers parse JSON themselves. If the agent
+        is routed to a provider without grounding support, the call falls back to Gemini.
+        """
+        from ..core.providers import generate_text
+        return generate_text(agent_id, prompt, model_id, grounded=True)
@@ -1,45 +1,69 @@
+import asyncio
+from typing import Dict, List
 from .base import AgentBase
-from ..core.ai import client
 from ..core.config import MODEL_FAST
+from ..core.providers import generate_text
 from ..core.utils import retry_with_backoff
-from google.genai import types
-from ..core.i18n import i18n
+from ..core.duration import duration_model, spoken_words
+from ..core.metrics import metrics
+from ..core.i18n import i18n, LocalizedText
 
 class EditorAgent(AgentBase):
     """Agente especializado en edición, refinamiento y manipulación de texto."""
-    name: str = i18n.t("agents.Editor.name")
+    name = LocalizedText("agents.Editor.name")
     
+    async def _generate(self, prompt_id: str, context: dict) -> str:
+        prompt = i18n.get_prompt(prompt_id, context)
+        def _call():
+            return generate_text(prompt_id, prompt, MODEL_FAST)
+        return await retry_with_backoff(_call, agent_id=prompt_id)
+
     async def refine_text(self, text: str, critique: str) -> str:
-        prompt = i18n.get_prompt("Editor.refine_prompt", {
+        return await self._generate("Editor.refine_prompt", {
             "text": text,
             "critique": critique
         })
-        def _call():
-            return client.models.generate_content(model=MODEL_FAST, contents=prompt).text
-        return retry_with_backoff(_call)
 
     async def expand_text(self, text: str, context: str = "") -> str:
-        prompt = i18n.get_prompt("Editor.expand_prompt", {
+        return await self._generate("Editor.expand_prompt", {
             "text": text,
             "context": context
         })
-        def _call():
-            return client.models.generate_content(model=MODEL_FAST, contents=prompt).text
-        return retry_with_backoff(_call)
 
     async def shorten_text(self, text: str) -> str:
-        prompt = i18n.get_prompt("Editor.shorten_prompt", {
+        return await self._generate("Editor.shorten_prompt", {
             "text": text
         })
-        def _call():
-            return client.models.generate_content(model=MODEL_FAST, contents=prompt).text
-        return retry_with_backoff(_call)
 
     async def regenerate_visual_prompt(self, text: str, topic: str) -> str:
-        prompt = i18n.get_prompt("Editor.visual_regen_prompt", {
+        return await self._generate("Editor.visual_regen_prompt", {
             "text": text,
             "topic": topic
         })
-        def _call():
-             return client.models.generate_content(model=MODEL_FAST, contents=prompt).text
-        return await retry_with_backoff(_call)
+
+    async def fit_length(self, blocks: List[Dict], target_seconds: float, context: str = "") -> Dict:
+        """Expands or shortens the blocks chosen by the duration model so the script's
+        predicted length matches the target before any TTS is paid for."""
+        plan = duration_model.plan(blocks, target_seconds)
+        if not plan["actions"]:
+            return plan
+        await self.log(f"⏱️ Duración prevista {plan['predicted_seconds']:.0f}s vs objetivo {plan['target_seconds']:.0f}s: "
+                       f"ajustando {len(plan['actions'])} bloques")
+
+        async def _adjust(index: int, action: str):
+            block = blocks[index]
+            text = block.get("audio_text", "")
+            try:
+                new_text = await (self.expand_text(text, context) if action == "expand" else self.shorten_text(text))
+            except Exception as e:
+                await self.log(f"⚠️ No se pudo ajustar el bloque {index + 1}: {e}")
+                return
+            if new_text and new_text.strip():
+                block["audio_text"] = new_text.strip()
+                block["word_count"] = spoken_words(block["audio_text"])
+                metrics.incr("duration", "fit", action)
+
+        await asyncio.gather(*[_adjust(a["index"], a["action"]) for a in plan["actions"]])
+        plan["adjusted_seconds"] = round(duration_model.annotate(blocks), 1)
+        await self.log(f"✅ Duración prevista tras el ajuste: {plan['adjusted_seconds']:.0f}s")
+        return plan
@@ -1,17 +1,47 @@
 import os
-import wave
 from typing import List, Dict
-from google.genai import types
 from .base import AgentBase
 from ..core.ai import client
 from ..core.config import AUDIO_DIR, IMAGE_DIR, get_model_tts, get_model_image, settings_manager
-from ..core.utils import retry_with_backoff
+from ..core.utils import gather_limited, retry_with_backoff, run_blocking
+from ..core.batch import parallel_limit
+from ..core import audio
+from ..core.mastering import process_pcm
+from ..core.storage import publish
 
 class VoiceAgent(AgentBase):
     name: str = "Voice Studio"
+
+    def _tts_config(self):
+        from google.genai import types
+        return types.GenerateContentConfig(
+            response_modalities=["AUDIO"],
+            speech_config=types.SpeechConfig(
+                voice_config=types.VoiceConfig(
+                    prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                        voice_name=settings_manager.get('voice_name', 'Fenrir')
+                    )
+                )
+            )
+        )
+
+    async def _synthesize_chunk(self, text: str):
+        def _call():
+            return client.models.generate_content(
+                model=get_model_tts(),
+                contents=text,
+                config=self._tts_config()
+            )
+
+        # Each chunk retries on its own: a failure never re-requests the chunks that already succeeded
+        res = await retry_with_backoff(_call, agent_id="VoiceAgent")
+        if not res.candidates or not res.candidates[0].content.parts or not res.candidates[0].content.parts[0].inline_data:
+            raise Exception("No audio data received from API")
+        return audio.pcm_from_bytes(res.candidates[0].content.parts[0].inline_data.data)
     
     async def synthesize(self, script_blocks: List[Dict], project_id: str, index_offset=0):
         await self.log("Iniciando sesión de grabación neuronal...")
+        cfg = settings_manager.get("tts", {}) or {}
         files = []
         
         for i, block in enumerate(script_blocks):
@@ -21,42 +51,30 @@ class VoiceAgent(AgentBase):
             
             if not text: continue
 
-            await self.log(f"Grabando bloque {i + 1}/{len(script_blocks)}: {block.get('section', 'N/A')}")
-            
-            def _call():
-                return client.models.generate_content(
-                    model=get_model_tts(), 
-                    contents=text,
-                    config=types.GenerateContentConfig(
-                        response_modalities=["AUDIO"],
-                        speech_config=types.SpeechConfig(
-                            voice_config=types.VoiceConfig(
-                                prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                                    voice_name=settings_manager.get('voice_name', 'Fenrir')
-                                )
-                            )
-                        )
-                    )
-                )
+            chunks = audio.split_sentences(text, cfg.get("chunk_chars", 600))
+            await self.log(f"Grabando bloque {i + 1}/{len(script_blocks)}: {block.get('section', 'N/A')} ({len(chunks)} fragmentos)")
 
             try:
-                res = await retry_with_backoff(_call)
-                if not res.candidates or not res.candidates[0].content.parts or not res.candidates[0].content.parts[0].inline_data:
-                    raise Exception("No audio data received from API")
-                
-                audio_data = res.candidates[0].content.parts[0].inline_data.data
-                with wave.open(filepath, "wb") as wf:
-                    wf.setnchannels(1)
-                    wf.setsampwidth(2)
-                    wf.setframerate(24000)
-                    wf.writeframes(audio_data)
-                    
-                    # Calculate duration
-                    frames = wf.getnframes()
-                    rate = wf.getframerate()
-                    duration = frames / float(rate)
-                    block['duration_seconds'] = duration
+                pcm_chunks = await gather_limited([self._synthesize_chunk(c) for c in chunks], parallel_limit())
+                pcm, starts = audio.stitch(pcm_chunks, cfg.get("crossfade_ms", 10), cfg.get("gap_ms", 120))
+                # Loudness normalization + silence trimming run in the process pool, off the event loop
+                pcm, processing = await process_pcm(pcm)
+                await run_blocking(audio.write_wav, filepath, pcm)
+                await run_blocking(publish, "audio", filename)
+                if processing:
+                    block['audio_processing'] = processing
                 
+                block['duration_seconds'] = audio.duration(len(pcm))
+                # Chunk spans in the WAV as written: stitched offsets (gaps, crossfades) minus the leading trim
+                spans = audio.shift_spans(
+                    [(audio.duration(start), audio.duration(len(chunk_pcm))) for start, chunk_pcm in zip(starts, pcm_chunks)],
+                    audio.duration((processing or {}).get("leading_trim_samples", 0)),
+                    block['duration_seconds'],
+                )
+                block['audio_chunks'] = [
+                    {"text": chunk, "start_seconds": start, "duration_seconds": length}
+                    for chunk, (start, length) in zip(chunks, spans)
+                ]
                 block['audio_file'] = filename
                 files.append(filename)
             except Exception as e:
@@ -74,6 +92,7 @@ class ImageAgent(AgentBase):
         filepath = os.path.join(IMAGE_DIR, filename)
 
         def _call():
+            from google.genai import types
             return client.models.generate_content(
                 model=get_model_image(),
                 contents=prompt,
@@ -83,7 +102,7 @@ class ImageAgent(AgentBase):
             )
 
         try:
-            res = await retry_with_backoff(_call)
+            res = await retry_with_backoff(_call, agent_id="ImageAgent")
             if not res.candidates or not res.candidates[0].content.parts:
                 raise Exception("No image data received")
             
@@ -92,6 +111,7 @@ class ImageAgent(AgentBase):
                 image_data = part.inline_data.data
                 with open(filepath, "wb") as f:
                     f.write(image_data)
+                await run_blocking(publish, "images", filename)
                 return filename
             else:
                 raise Exception("Image part has no inline data")
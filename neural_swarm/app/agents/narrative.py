@@ -1,15 +1,17 @@
 import json
-from google.genai import types
 from .base import SwarmAgent
 from ..models.project import ProjectContext
-from ..core.ai import client
+from ..core.providers import generate_json
 from ..core.config import MODEL_FAST
-from ..core.utils import clean_and_parse_json, retry_with_backoff
+from ..core.utils import PartialOutputError, retry_with_backoff
+from ..core.schemas import get_schema
 from ..core.websocket import manager
-from ..core.i18n import i18n
+from ..core.i18n import i18n, LocalizedText
+from ..core.duration import duration_model, target_seconds
+from .editor import EditorAgent
 
 class ScriptArchitectAgent(SwarmAgent):
-    name: str = i18n.t("agents.ScriptArchitect.name")
+    name = LocalizedText("agents.ScriptArchitect.name")
     department: str = "Narrativa"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
@@ -29,29 +31,32 @@ class ScriptArchitectAgent(SwarmAgent):
         })
         
         def _call():
-            res = client.models.generate_content(
-                model=MODEL_FAST,
-                contents=prompt,
-                config=types.GenerateContentConfig(response_mime_type="application/json")
-            )
-            return clean_and_parse_json(res.text)
+            return generate_json("ScriptArchitect", prompt, MODEL_FAST, get_schema("ScriptArchitect"))
         
         try:
-            result = await retry_with_backoff(_call)
+            result = await retry_with_backoff(_call, agent_id="ScriptArchitect")
             context.script_outline = result.get("outline", [])
+            # Word budget per block from the calibrated voice rate, so LeadWriter writes to length
+            duration_model.allocate(context.script_outline, target_seconds(strategy))
             await self.log(f"✅ Escaleta creada: {len(context.script_outline)} bloques")
             await manager.broadcast("Escaleta Narrativa definida", "data_update", {"step": "script_outline", "data": context.script_outline})
         except Exception as e:
             await self.log(f"⚠️ Error: {e}")
-            context.script_outline = [{"block_number": i+1, "section": s, "content_brief": ""} 
+            partial = e.partial if isinstance(e, PartialOutputError) and isinstance(e.partial, dict) else {}
+            outline = [b for b in partial.get("outline", []) if isinstance(b, dict) and b.get("section")]
+            context.script_outline = outline or [{"block_number": i+1, "section": s, "content_brief": ""} 
                                        for i, s in enumerate(["HOOK", "INTRO", "PROBLEMA", "DESARROLLO", "CLÍMAX", "SOLUCIÓN", "CTA"])]
+            duration_model.allocate(context.script_outline, target_seconds(strategy))
         
         return context
 
 class LeadWriterAgent(SwarmAgent):
-    name: str = i18n.t("agents.LeadWriter.name")
+    name = LocalizedText("agents.LeadWriter.name")
     department: str = "Narrativa"
     
+    def __init__(self):
+        self.editor = EditorAgent()
+    
     async def execute(self, context: ProjectContext) -> ProjectContext:
         await self.log("Escribiendo el guion completo...")
         tone = context.project_bible.get("content_strategy", {}).get("tone", "Épico y revelador")
@@ -65,25 +70,27 @@ class LeadWriterAgent(SwarmAgent):
         })
         
         def _call():
-            res = client.models.generate_content(
-                model=MODEL_FAST,
-                contents=prompt,
-                config=types.GenerateContentConfig(response_mime_type="application/json")
-            )
-            return clean_and_parse_json(res.text)
+            return generate_json("LeadWriter", prompt, MODEL_FAST, get_schema("LeadWriter"))
         
         try:
-            result = await retry_with_backoff(_call)
+            result = await retry_with_backoff(_call, agent_id="LeadWriter")
             context.raw_script = result.get("script", [])
             await self.log(f"✅ Guion escrito: {len(context.raw_script)} bloques")
             await manager.broadcast("Borrador del Guion completado", "data_update", {"step": "script_raw", "data": context.raw_script})
         except Exception as e:
             await self.log(f"⚠️ Error: {e}")
+            # Salvage the blocks that did validate instead of leaving the script empty
+            partial = e.partial if isinstance(e, PartialOutputError) and isinstance(e.partial, dict) else {}
+            context.raw_script = [b for b in partial.get("script", []) if isinstance(b, dict) and b.get("audio_text")]
+        
+        if context.raw_script:
+            topic = context.project_bible.get("selected_topic", {}).get("title", "")
+            await self.editor.fit_length(context.raw_script, target_seconds(context.project_bible.get("content_strategy", {})), topic)
         
         return context
 
 class HookMasterAgent(SwarmAgent):
-    name: str = i18n.t("agents.HookMaster.name")
+    name = LocalizedText("agents.HookMaster.name")
     department: str = "Narrativa"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
@@ -97,15 +104,10 @@ class HookMasterAgent(SwarmAgent):
         })
         
         def _call():
-            res = client.models.generate_content(
-                model=MODEL_FAST,
-                contents=prompt,
-                config=types.GenerateContentConfig(response_mime_type="application/json")
-            )
-            return clean_and_parse_json(res.text)
+            return generate_json("HookMaster", prompt, MODEL_FAST, get_schema("HookMaster"))
         
         try:
-            result = await retry_with_backoff(_call)
+            result = await retry_with_backoff(_call, agent_id="HookMaster")
             selected = result.get("selected_hook", {})
             context.hooked_intro = selected.get("text", current_hook)
             if context.raw_script:
@@ -118,7 +120,7 @@ class HookMasterAgent(SwarmAgent):
         return context
 
 class ComedySpecialistAgent(SwarmAgent):
-    name: str = i18n.t("agents.ComedySpecialist.name")
+    name = LocalizedText("agents.ComedySpecialist.name")
     department: str = "Narrativa"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
@@ -130,15 +132,10 @@ class ComedySpecialistAgent(SwarmAgent):
         })
         
         def _call():
-            res = client.models.generate_content(
-                model=MODEL_FAST,
-                contents=prompt,
-                config=types.GenerateContentConfig(response_mime_type="application/json")
-            )
-            return clean_and_parse_json(res.text)
+            return generate_json("ComedySpecialist", prompt, MODEL_FAST, get_schema("ComedySpecialist"))
         
         try:
-            result = await retry_with_backoff(_call)
+            result = await retry_with_backoff(_call, agent_id="ComedySpecialist")
             context.final_script = result.get("enhanced_script", context.raw_script)
             await self.log(f"✅ Guion mejorado")
             await manager.broadcast("Guion Final pulido (Comedia + Punch-ups)", "data_update", {"step": "script_final", "data": context.final_script})
@@ -1,14 +1,14 @@
 from .base import SwarmAgent
 from ..models.project import ProjectContext
-from ..core.ai import client
+from ..core.providers import generate_json
 from ..core.config import MODEL_FAST
-from ..core.utils import clean_and_parse_json, retry_with_backoff
+from ..core.utils import retry_with_backoff
+from ..core.schemas import get_schema
 from ..core.websocket import manager
-from ..core.i18n import i18n
-from google.genai import types
+from ..core.i18n import i18n, LocalizedText
 
 class SEOOptimizerAgent(SwarmAgent):
-    name: str = i18n.t("agents.SEOOptimizer.name")
+    name = LocalizedText("agents.SEOOptimizer.name")
     department: str = "Post-Producción"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
@@ -22,15 +22,10 @@ class SEOOptimizerAgent(SwarmAgent):
         })
         
         def _call():
-            res = client.models.generate_content(
-                model=MODEL_FAST,
-                contents=prompt,
-                config=types.GenerateContentConfig(response_mime_type="application/json")
-            )
-            return clean_and_parse_json(res.text)
+            return generate_json("SEOOptimizer", prompt, MODEL_FAST, get_schema("SEOOptimizer"))
         
         try:
-            context.seo_package = await retry_with_backoff(_call)
+            context.seo_package = await retry_with_backoff(_call, agent_id="SEOOptimizer")
             await self.log(f"✅ SEO optimizado")
             await manager.broadcast("Paquete SEO Generado", "data_update", {"step": "post_seo", "data": context.seo_package})
         except Exception as e:
@@ -40,7 +35,7 @@ class SEOOptimizerAgent(SwarmAgent):
         return context
 
 class AudioDirectorAgent(SwarmAgent):
-    name: str = i18n.t("agents.AudioDirector.name")
+    name = LocalizedText("agents.AudioDirector.name")
     department: str = "Post-Producción"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
@@ -53,15 +48,10 @@ class AudioDirectorAgent(SwarmAgent):
         })
         
         def _call():
-            res = client.models.generate_content(
-                model=MODEL_FAST,
-                contents=prompt,
-                config=types.GenerateContentConfig(response_mime_type="application/json")
-            )
-            return clean_and_parse_json(res.text)
+            return generate_json("AudioDirector", prompt, MODEL_FAST, get_schema("AudioDirector"))
         
         try:
-            context.audio_instructions = await retry_with_backoff(_call)
+            context.audio_instructions = await retry_with_backoff(_call, agent_id="AudioDirector")
             await self.log("✅ Instrucciones de audio completas")
             await manager.broadcast("Instrucciones de Audio (Director) listas", "data_update", {"step": "post_audio", "data": context.audio_instructions})
         except Exception as e:
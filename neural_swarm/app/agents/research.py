@@ -1,29 +1,41 @@
 from .base import SwarmAgent
 from ..models.project import ProjectContext
-from ..core.ai import client
+from ..core.providers import generate_text
 from ..core.config import MODEL_FAST, MODEL_RESEARCH_ID
-from ..core.utils import retry_with_backoff
+from ..core.utils import retry_with_backoff, run_blocking
 from ..core.websocket import manager
-from ..core.i18n import i18n
+from ..core.knowledge import knowledge_base
+from ..core.i18n import i18n, LocalizedText
 
 class DeepResearcherAgent(SwarmAgent):
-    name: str = i18n.t("agents.DeepResearcher.name")
+    name = LocalizedText("agents.DeepResearcher.name")
     department: str = "Investigación"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
         topic = context.project_bible.get("selected_topic", {}).get("title", context.niche)
+        angle = context.project_bible.get("selected_topic", {}).get("angle", "")
         await self.log(f"Investigación profunda: {topic}")
         
         prompt = i18n.get_prompt("DeepResearcher", {
             "topic": topic,
-            "angle": context.project_bible.get("selected_topic", {}).get("angle", "")
+            "angle": angle
         })
+        known = await run_blocking(knowledge_base.load, context.niche)
+        chunks = known.relevant_research(f"{topic} {angle}")
+        if chunks:
+            # Verified chunks from earlier runs go straight to the dossier; only new findings are researched
+            context.known_research = "\n\n".join(c["text"] for c in chunks)
+            context.research_sources = [s for c in chunks for s in c.get("sources", [])]
+            prompt += i18n.get_prompt("DeepResearcher.delta_prompt", {"known_research": context.known_research})
+            await self.log(f"♻️ {len(chunks)} fragmentos verificados reutilizados de la base de conocimiento")
         
         def _call():
-            return self.grounded_call(client, MODEL_RESEARCH_ID, prompt)
+            return self.grounded_call("DeepResearcher", MODEL_RESEARCH_ID, prompt)
         
         try:
-            context.deep_research = await retry_with_backoff(_call)
+            context.deep_research = await retry_with_backoff(_call, agent_id="DeepResearcher")
+            context.research_sources += getattr(context.deep_research, "sources", [])
+            knowledge_base.record("DeepResearcher", "delta" if chunks else "full")
             await self.log(f"✅ Investigación completada ({len(context.deep_research)} chars)")
             await manager.broadcast("Deep Research finalizado", "data_update", {"step": "research_deep", "data": context.deep_research})
         except Exception as e:
@@ -33,7 +45,7 @@ class DeepResearcherAgent(SwarmAgent):
         return context
 
 class InvestigativeJournalistAgent(SwarmAgent):
-    name: str = i18n.t("agents.InvestigativeJournalist.name")
+    name = LocalizedText("agents.InvestigativeJournalist.name")
     department: str = "Investigación"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
@@ -45,11 +57,10 @@ class InvestigativeJournalistAgent(SwarmAgent):
         })
         
         def _call():
-            res = client.models.generate_content(model=MODEL_FAST, contents=prompt)
-            return res.text
+            return generate_text("InvestigativeJournalist", prompt, MODEL_FAST)
         
         try:
-            context.human_stories = await retry_with_backoff(_call)
+            context.human_stories = await retry_with_backoff(_call, agent_id="InvestigativeJournalist")
             await self.log(f"✅ Historias encontradas ({len(context.human_stories)} chars)")
             await manager.broadcast("Historias Humanas detectadas", "data_update", {"step": "research_human", "data": context.human_stories})
         except Exception as e:
@@ -59,7 +70,7 @@ class InvestigativeJournalistAgent(SwarmAgent):
         return context
 
 class FactCheckerAgent(SwarmAgent):
-    name: str = i18n.t("agents.FactChecker.name")
+    name = LocalizedText("agents.FactChecker.name")
     department: str = "Investigación"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
@@ -71,15 +82,17 @@ class FactCheckerAgent(SwarmAgent):
         })
         
         def _call():
-            res = client.models.generate_content(model=MODEL_FAST, contents=prompt)
-            return res.text
+            return generate_text("FactChecker", prompt, MODEL_FAST)
         
         try:
-            context.verified_research = await retry_with_backoff(_call)
+            verified = await retry_with_backoff(_call, agent_id="FactChecker")
+            topic = context.project_bible.get("selected_topic", {}).get("title", context.niche)
+            await run_blocking(knowledge_base.update, context.niche, lambda k: k.add_research(topic, verified, context.research_sources))
+            context.verified_research = f"{context.known_research}\n\n{verified}" if context.known_research else verified
             await self.log(f"✅ Investigación verificada ({len(context.verified_research)} chars)")
             await manager.broadcast("Dossier de Verdad compilado", "data_update", {"step": "research_verified", "data": context.verified_research})
         except Exception as e:
             await self.log(f"⚠️ Error: {e}")
-            context.verified_research = context.deep_research + "\n\n" + context.human_stories
+            context.verified_research = "\n\n".join(p for p in (context.known_research, context.deep_research, context.human_stories) if p)
         
         return context
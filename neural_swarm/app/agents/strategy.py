@@ -1,54 +1,76 @@
 import json
 from datetime import datetime
-from google.genai import types
 from .base import SwarmAgent
 from ..models.project import ProjectContext
-from ..core.ai import client
+from ..core.providers import generate_json
 from ..core.config import MODEL_FAST
-from ..core.utils import clean_and_parse_json, retry_with_backoff
+from ..core.utils import clean_and_parse_json, ensure_schema, retry_with_backoff, run_blocking
+from ..core.schemas import get_schema
 from ..core.websocket import manager
+from ..core.knowledge import knowledge_base
+from ..core.similarity import rank_opportunities, topic_index
 
-from ..core.i18n import i18n
+from ..core.i18n import i18n, LocalizedText
 
 class TrendHunterAgent(SwarmAgent):
-    name: str = i18n.t("agents.TrendHunter.name")
+    name = LocalizedText("agents.TrendHunter.name")
     department: str = "Strategy"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
         await self.log(f"Escaneando tendencias en: {context.niche}")
+        known = await run_blocking(knowledge_base.load, context.niche)
+        
+        reusable = known.reusable_trends()
+        if reusable:
+            context.trend_opportunities = reusable["opportunities"]
+            knowledge_base.record("TrendHunter", "reused")
+            await self.log(f"♻️ Reutilizando {len(context.trend_opportunities)} oportunidades del {reusable['date'][:16]}")
+            await manager.broadcast("Tendencias detectadas", "data_update", {"step": "trends", "data": context.trend_opportunities})
+            return context
         
         prompt = i18n.get_prompt("TrendHunter", {
             "niche": context.niche,
             "date": datetime.now().strftime("%Y-%m-%d")
         })
+        previous = known.latest_trends()
+        if previous:
+            # Only what changed since the last scan; the known list is merged back below
+            prompt += i18n.get_prompt("TrendHunter.delta_prompt", {
+                "since": previous["date"][:10],
+                "known_topics": "\n".join(f"- {o.get('topic', '')}" for o in previous["opportunities"])
+            })
         
         def _call():
-            res = client.models.generate_content(
-                model=MODEL_FAST,
-                contents=prompt,
-                config=types.GenerateContentConfig(response_mime_type="application/json")
-            )
-            return clean_and_parse_json(res.text)
+            return generate_json("TrendHunter", prompt, MODEL_FAST, get_schema("TrendHunter"))
         
         try:
-            result = await retry_with_backoff(_call)
+            result = await retry_with_backoff(_call, agent_id="TrendHunter")
+            insights = ""
             if isinstance(result, list):
                 context.trend_opportunities = result
             elif isinstance(result, dict):
                 context.trend_opportunities = result.get("opportunities", [])
+                insights = result.get("trend_insights", "")
             else:
                 context.trend_opportunities = []
+            
+            context.trend_opportunities, seen = known.merge_trends(context.trend_opportunities, previous)
+            knowledge_base.record("TrendHunter", "delta" if previous else "full")
+            await run_blocking(knowledge_base.update, context.niche, lambda k: k.add_trends(context.trend_opportunities, insights, seen))
                 
             await self.log(f"✅ Encontradas {len(context.trend_opportunities)} oportunidades")
             await manager.broadcast("Tendencias detectadas", "data_update", {"step": "trends", "data": context.trend_opportunities})
         except Exception as e:
             await self.log(f"⚠️ Error: {e}")
-            context.trend_opportunities = [{"topic": context.niche, "angle": "Análisis profundo", "traffic_potential": 7}]
+            if previous:
+                context.trend_opportunities = previous["opportunities"]
+            else:
+                context.trend_opportunities = [{"topic": context.niche, "angle": "Análisis profundo", "traffic_potential": 7}]
         
         return context
 
 class AudienceProfilerAgent(SwarmAgent):
-    name: str = i18n.t("agents.AudienceProfiler.name")
+    name = LocalizedText("agents.AudienceProfiler.name")
     department: str = "Strategy"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
@@ -61,15 +83,10 @@ class AudienceProfilerAgent(SwarmAgent):
         })
         
         def _call():
-            res = client.models.generate_content(
-                model=MODEL_FAST,
-                contents=prompt,
-                config=types.GenerateContentConfig(response_mime_type="application/json")
-            )
-            return clean_and_parse_json(res.text)
+            return generate_json("AudienceProfiler", prompt, MODEL_FAST, get_schema("AudienceProfiler"))
         
         try:
-            context.audience_profile = await retry_with_backoff(_call)
+            context.audience_profile = await retry_with_backoff(_call, agent_id="AudienceProfiler")
             await self.log("✅ Perfil de audiencia construido")
             await manager.broadcast("Perfil de Audiencia creado", "data_update", {"step": "audience", "data": context.audience_profile})
         except Exception as e:
@@ -79,27 +96,33 @@ class AudienceProfilerAgent(SwarmAgent):
         return context
 
 class ProjectManagerAgent(SwarmAgent):
-    name: str = i18n.t("agents.ProjectManager.name")
+    name = LocalizedText("agents.ProjectManager.name")
     department: str = "Strategy"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
         await self.log("Analizando datos y creando la Biblia del Proyecto...")
         
+        # Past projects: near-duplicates are dropped, close matches are flagged for the model.
+        # The index reloads the DB and rebuilds TF-IDF when it changed, so it runs off the loop
+        try:
+            ranked = await run_blocking(rank_opportunities, context.trend_opportunities)
+            flagged = sum(1 for o in ranked if isinstance(o, dict) and o.get("already_produced"))
+            if len(ranked) < len(context.trend_opportunities) or flagged:
+                await self.log(f"🔁 {len(context.trend_opportunities) - len(ranked)} oportunidades descartadas por repetir vídeos anteriores, {flagged} marcadas como parecidas")
+            context.trend_opportunities = ranked
+        except Exception as e:
+            await self.log(f"⚠️ Detección de duplicados omitida: {e}", "warning")
+        
         prompt = i18n.get_prompt("ProjectManager", {
             "opportunities": json.dumps(context.trend_opportunities, indent=2, ensure_ascii=False),
             "audience_profile": json.dumps(context.audience_profile, indent=2, ensure_ascii=False)
         })
         
         def _call():
-            res = client.models.generate_content(
-                model=MODEL_FAST,
-                contents=prompt,
-                config=types.GenerateContentConfig(response_mime_type="application/json")
-            )
-            return clean_and_parse_json(res.text)
+            return generate_json("ProjectManager", prompt, MODEL_FAST, get_schema("ProjectManager"))
         
         try:
-            context.project_bible = await retry_with_backoff(_call)
+            context.project_bible = await retry_with_backoff(_call, agent_id="ProjectManager")
             
             # Robust extraction of the selected topic title
             if isinstance(context.project_bible, dict):
@@ -110,6 +133,15 @@ class ProjectManagerAgent(SwarmAgent):
                 topic = "Sin título"
                 
             await self.log(f"✅ Biblia creada: {topic}")
+            selected = context.project_bible.get("selected_topic", {}) if isinstance(context.project_bible, dict) else {}
+            try:
+                match = await run_blocking(topic_index.closest, " ".join(str(selected.get(k, "")) for k in ("title", "angle", "hook")))
+            except Exception as e:
+                match = None
+                await self.log(f"⚠️ Comparación con proyectos anteriores omitida: {e}", "warning")
+            if match:
+                context.project_bible["similar_project"] = match
+                await self.log(f"⚠️ Tema muy parecido a un proyecto anterior: {match['topic']} ({match['date'][:10]}, similitud {match['score']:.2f})", "warning")
             await manager.broadcast("Biblia del Proyecto completada", "data_update", {"step": "bible", "data": context.project_bible})
         except Exception as e:
             await self.log(f"⚠️ Error: {e}")
@@ -118,34 +150,53 @@ class ProjectManagerAgent(SwarmAgent):
         return context
 
 class CompetitorAnalystAgent(SwarmAgent):
-    name: str = i18n.t("agents.CompetitorAnalyst.name")
+    name = LocalizedText("agents.CompetitorAnalyst.name")
     department: str = "Strategy"
     
     async def execute(self, context: ProjectContext) -> ProjectContext:
         await self.log(f"Analizando competencia en el nicho: {context.niche}...")
+        known = await run_blocking(knowledge_base.load, context.niche)
+        
+        reusable = known.reusable_competitors()
+        if reusable:
+            context.competitor_analysis = reusable["competitors"]
+            knowledge_base.record("CompetitorAnalyst", "reused")
+            await self.log(f"♻️ Reutilizando análisis de competencia del {reusable['date'][:10]}")
+            await manager.broadcast("Análisis de competencia completado", "data_update", {"step": "competitors", "data": context.competitor_analysis})
+            return context
         
         prompt = i18n.get_prompt("CompetitorAnalyst", {
             "niche": context.niche,
             "date": datetime.now().strftime("%Y-%m-%d")
         })
+        previous = known.latest_competitors()
+        if previous:
+            prompt += i18n.get_prompt("CompetitorAnalyst.delta_prompt", {
+                "since": previous["date"][:10],
+                "known_competitors": "\n".join(f"- {c.get('title', '')} ({c.get('link', '')})" for c in previous["competitors"])
+            })
         
         def _call():
-            # This agent uses grounding via helper
-            return self.grounded_call(client, MODEL_FAST, prompt, response_mime_type="application/json")
+            # This agent uses grounding via helper. Grounding can't be combined with a
+            # response schema, so the schema is enforced locally after parsing.
+            text = self.grounded_call("CompetitorAnalyst", MODEL_FAST, prompt)
+            result = clean_and_parse_json(text)
+            if isinstance(result, list):
+                result = {"competitors": result}
+            return ensure_schema(result, get_schema("CompetitorAnalyst"))
         
         try:
-            result = clean_and_parse_json(await retry_with_backoff(_call))
-            if isinstance(result, list):
-                context.competitor_analysis = result
-            elif isinstance(result, dict):
-                context.competitor_analysis = result.get("competitors", [])
-            else:
-                context.competitor_analysis = []
+            result = await retry_with_backoff(_call, agent_id="CompetitorAnalyst")
+            context.competitor_analysis = result.get("competitors", [])
+            context.competitor_analysis, seen = known.merge_competitors(context.competitor_analysis, previous)
+            knowledge_base.record("CompetitorAnalyst", "delta" if previous else "full")
+            await run_blocking(knowledge_base.update, context.niche,
+                               lambda k: k.add_competitors(context.competitor_analysis, result.get("niche_patterns", ""), seen))
                 
             await self.log(f"✅ Analizados {len(context.competitor_analysis)} competidores clave")
             await manager.broadcast("Análisis de competencia completado", "data_update", {"step": "competitors", "data": context.competitor_analysis})
         except Exception as e:
             await self.log(f"⚠️ Error: {e}")
-            context.competitor_analysis = []
+            context.competitor_analysis = previous["competitors"] if previous else []
         
         return context
@@ -1,25 +1,237 @@
-from google import genai
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
 from .config import get_api_key
+from .settings import settings_manager
+from .batch import current_batch
+from .breaker import breakers, call_with_breaker, CircuitOpenError
 
-_client_cache = {"key": None, "instance": None}
+# A key is ejected after this many consecutive rate-limit errors...
+EJECT_AFTER_429 = 3
+# ...for this long (doubling on each new ejection, capped at EJECT_MAX_SECONDS).
+EJECT_BASE_SECONDS = 30
+EJECT_MAX_SECONDS = 600
+USAGE_WINDOW_SECONDS = 60
+
+def is_rate_limit_error(e: Exception) -> bool:
+    error_msg = str(e).upper()
+    return any(x in error_msg for x in ["429", "QUOTA", "LIMIT", "RESOURCE_EXHAUSTED"])
+
+class ApiKeySlot:
+    """One API key with its own client, rolling-window limiter state and health."""
+
+    def __init__(self, key: str, rpm: Optional[int] = None, label: str = ""):
+        self.key = key
+        self.rpm = rpm
+        self.label = label or f"...{key[-4:]}"
+        # google.genai is slow to import; only pay for it once a key is actually used
+        from google import genai
+        from google.genai import types
+        # Without a timeout a hung request holds its thread (and scheduler slot) forever;
+        # deadlines only stop waiting for it
+        timeout = settings_manager.get("api_timeout_seconds", 600)
+        self.client = genai.Client(api_key=key, http_options=types.HttpOptions(timeout=int(timeout * 1000)) if timeout else None)
+        self.window: deque = deque()
+        self.in_flight = 0
+        self.total_calls = 0
+        self.total_errors = 0
+        self.total_429 = 0
+        self.consecutive_429 = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    def _trim(self, now: float):
+        while self.window and now - self.window[0] > USAGE_WINDOW_SECONDS:
+            self.window.popleft()
+
+    @property
+    def breaker_name(self) -> str:
+        return f"key:{self.label}"
+
+    def available(self, now: float) -> bool:
+        return now >= self.ejected_until and not breakers.is_open(self.breaker_name)
+
+    def headroom(self, now: float) -> float:
+        self._trim(now)
+        used = len(self.window) + self.in_flight
+        if self.rpm:
+            return self.rpm - used
+        # Unknown quota: prefer the least loaded key
+        return -used
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        self._trim(now)
+        return {
+            "label": self.label,
+            "rpm_limit": self.rpm,
+            "calls_last_minute": len(self.window),
+            "in_flight": self.in_flight,
+            "total_calls": self.total_calls,
+            "total_errors": self.total_errors,
+            "total_429": self.total_429,
+            "ejections": self.ejections,
+            "ejected_for_seconds": max(0, round(self.ejected_until - now, 1)),
+        }
+
+class ApiKeyPool:
+    """Routes calls across the configured API keys by remaining headroom.
+
+    Keys come from `api_keys` in settings (strings or {"key", "rpm", "label"}
+    objects) plus the legacy single `api_key`. The pool is rebuilt whenever
+    those settings change; state is kept for keys that are still present.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots: Dict[str, ApiKeySlot] = {}
+        self._signature = None
+
+    def _configured(self) -> List[Dict[str, Any]]:
+        entries = []
+        default_rpm = settings_manager.get("key_rpm_limit")
+        for item in settings_manager.get("api_keys", []) or []:
+            if isinstance(item, str):
+                item = {"key": item}
+            if isinstance(item, dict) and item.get("key"):
+                entries.append({"key": item["key"], "rpm": item.get("rpm", default_rpm), "label": item.get("label", "")})
+        single = get_api_key()
+        if single and all(e["key"] != single for e in entries):
+            entries.insert(0, {"key": single, "rpm": default_rpm, "label": ""})
+        return entries
+
+    def _sync(self):
+        entries = self._configured()
+        signature = tuple((e["key"], e["rpm"], e["label"]) for e in entries)
+        if signature == self._signature:
+            return
+        slots = {}
+        for e in entries:
+            slot = self._slots.get(e["key"])
+            if slot is None:
+                try:
+                    slot = ApiKeySlot(e["key"], e["rpm"], e["label"])
+                except Exception as ex:
+                    print(f"⚠️ Error initializing GenAI Client: {ex}")
+                    continue
+            else:
+                slot.rpm = e["rpm"]
+                slot.label = e["label"] or slot.label
+            slots[e["key"]] = slot
+        self._slots = slots
+        self._signature = signature
+
+    def _ranked(self, now: float) -> List[ApiKeySlot]:
+        """Keys in the order to try them: available ones by headroom, then ejected ones by
+        recovery time. Keys whose breaker is open are left out."""
+        self._sync()
+        available = sorted((s for s in self._slots.values() if s.available(now)), key=lambda s: s.headroom(now), reverse=True)
+        ejected = sorted((s for s in self._slots.values() if not s.available(now) and not breakers.is_open(s.breaker_name)),
+                         key=lambda s: s.ejected_until)
+        return available + ejected
+
+    def best(self) -> Optional[ApiKeySlot]:
+        with self._lock:
+            ranked = self._ranked(time.time())
+            if ranked:
+                return ranked[0]
+            # Every breaker is open: any client still serves the calls that skip the pool (batch jobs)
+            return min(self._slots.values(), key=lambda s: s.ejected_until, default=None)
+
+    def acquire(self) -> Optional[ApiKeySlot]:
+        """Picks the available key with the most headroom and marks a call in flight.
+
+        Raises CircuitOpenError when every key's breaker rejects the call.
+        """
+        with self._lock:
+            now = time.time()
+            ranked = self._ranked(now)
+            if not self._slots:
+                return None
+            for slot in ranked:
+                # Claims the half-open probe when the key's breaker is due for one; a key
+                # whose probe is already out is skipped
+                if not breakers.allow(slot.breaker_name):
+                    continue
+                slot.in_flight += 1
+                slot.window.append(now)
+                slot.total_calls += 1
+                return slot
+        raise CircuitOpenError("CIRCUIT_OPEN: every API key is failing; call rejected")
+
+    def release(self, slot: ApiKeySlot, error: Optional[Exception] = None):
+        with self._lock:
+            slot.in_flight = max(0, slot.in_flight - 1)
+            # 429s are handled by ejection below; the breaker tracks every other failure of the key
+            breakers.record(slot.breaker_name, error is None or is_rate_limit_error(error))
+            if error is None:
+                slot.consecutive_429 = 0
+                return
+            slot.total_errors += 1
+            if not is_rate_limit_error(error):
+                return
+            slot.total_429 += 1
+            slot.consecutive_429 += 1
+            if slot.consecutive_429 >= EJECT_AFTER_429:
+                cooldown = min(EJECT_BASE_SECONDS * (2 ** slot.ejections), EJECT_MAX_SECONDS)
+                slot.ejected_until = time.time() + cooldown
+                slot.ejections += 1
+                slot.consecutive_429 = 0
+                print(f"⚠️ API key {slot.label} ejected for {cooldown}s after repeated 429s.")
+
+    def healthy_count(self) -> int:
+        with self._lock:
+            self._sync()
+            now = time.time()
+            return sum(1 for s in self._slots.values() if s.available(now))
+
+    def usage(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._sync()
+            return [s.stats() for s in self._slots.values()]
+
+key_pool = ApiKeyPool()
 
 def get_client():
-    """Returns a GenAI client, re-initializing if the API key has changed."""
-    current_key = get_api_key()
-    if not current_key:
-        return None
-        
-    if _client_cache["key"] != current_key:
+    """Returns the GenAI client of the key with the most headroom (None if no key is set)."""
+    slot = key_pool.best()
+    return slot.client if slot else None
+
+class _PooledModels:
+    """`client.models` facade that routes each call to a key from the pool."""
+    def __getattr__(self, name):
+        def _call(*args, **kwargs):
+            session = current_batch.get()
+            if session is not None and name == "generate_content":
+                # Batch mode: the request joins the running phase's batch job
+                return session.generate_content(kwargs.get("model"), kwargs.get("contents"), kwargs.get("config"))
+            if name == "generate_content" and kwargs.get("model"):
+                return call_with_breaker(
+                    kwargs["model"],
+                    lambda model: self._on_key(name, *args, **{**kwargs, "model": model}),
+                    is_failure=lambda e: not (is_rate_limit_error(e) or isinstance(e, (AttributeError, CircuitOpenError)))
+                )
+            return self._on_key(name, *args, **kwargs)
+        return _call
+
+    @staticmethod
+    def _on_key(name, *args, **kwargs):
+        slot = key_pool.acquire()
+        if slot is None:
+            raise AttributeError(f"Gemini Client not initialized. Please check your API Key in Settings (trying to access 'models.{name}').")
         try:
-            _client_cache["key"] = current_key
-            _client_cache["instance"] = genai.Client(api_key=current_key)
+            result = getattr(slot.client.models, name)(*args, **kwargs)
         except Exception as e:
-            print(f"⚠️ Error initializing GenAI Client: {e}")
-            return None
-    return _client_cache["instance"]
+            key_pool.release(slot, e)
+            raise
+        key_pool.release(slot)
+        return result
 
 class ClientProxy:
     """Proxy object that always uses the latest initialized client."""
+    models = _PooledModels()
+
     def __getattr__(self, name):
         c = get_client()
         if c is None:
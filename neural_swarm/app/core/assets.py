@@ -0,0 +1,220 @@
+import os
+import time
+import shutil
+import asyncio
+from typing import Any, Dict, List, Optional, Set
+from .constants import BLOB_DIR
+from .settings import settings_manager
+from .metrics import metrics
+from .storage import ASSET_DIRS, StorageError, get_storage
+
+def _config() -> Dict[str, Any]:
+    cfg = settings_manager.get("asset_gc", {}) or {}
+    return {
+        "enabled": cfg.get("enabled", True),
+        "grace_hours": cfg.get("grace_hours", 24),
+        "interval_minutes": cfg.get("interval_minutes", 30),
+        "batch": cfg.get("batch", 500),
+    }
+
+def project_assets(project: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Files a full project references, per asset directory."""
+    images: Set[str] = set()
+    audio: Set[str] = set()
+    for block in project.get("script") or []:
+        images.update(f for f in block.get("generated_images") or [] if f)
+        if block.get("audio_file"):
+            audio.add(block["audio_file"])
+    thumbnail = (project.get("metadata") or {}).get("thumbnail_file")
+    if thumbnail:
+        images.add(thumbnail)
+    master = (project.get("master_audio") or {}).get("file")
+    if master:
+        audio.add(master)
+    video = [project["draft_video"]] if project.get("draft_video") else []
+    return {"audio": sorted(audio), "images": sorted(images), "video": video}
+
+def _file_size(path: str) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(_file_size(os.path.join(root, f)) or 0 for f in files)
+    return total
+
+def project_usage(project_id: str, assets: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Disk usage of one project: its referenced files per kind plus its stored blobs.
+
+    Files this worker has no local copy of are sized on the storage backend.
+    """
+    usage: Dict[str, Any] = {"project_id": project_id, "kinds": {}, "missing": []}
+    storage = get_storage()
+    total = 0
+    for kind, names in assets.items():
+        count = size = 0
+        for name in names:
+            file_size = _file_size(os.path.join(ASSET_DIRS[kind], name))
+            if file_size is None and storage.name != "local":
+                try:
+                    file_size = storage.size(kind, name)
+                except StorageError:
+                    file_size = None
+            if file_size is None:
+                usage["missing"].append(f"{kind}/{name}")
+                continue
+            count += 1
+            size += file_size
+        usage["kinds"][kind] = {"files": count, "bytes": size}
+        total += size
+    blobs = _dir_size(os.path.join(BLOB_DIR, project_id))
+    usage["kinds"]["blobs"] = {"bytes": blobs}
+    usage["total_bytes"] = total + blobs
+    return usage
+
+class AssetCollector:
+    """Deletes asset files no project references once they are older than the grace period.
+
+    Runs incrementally: directories are scanned `batch` entries at a time in a
+    worker thread, yielding to the event loop between batches. The grace
+    period protects files of a run that has not saved its project yet.
+    Blob directories of deleted projects are removed the same way.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def _references() -> Dict[str, Any]:
+        from .database import Database
+        refs = {kind: set() for kind in ASSET_DIRS}
+        ids = set()
+        for record in Database.load(strict=True)["projects"]:
+            ids.add(record.get("id"))
+            assets = (record.get("summary") or {}).get("assets")
+            if assets is None:
+                # Raises MissingSection (a ValueError) on a broken record: the pass is skipped
+                assets = Database.project_assets(record["id"]) or {}
+            for kind, names in assets.items():
+                refs.setdefault(kind, set()).update(names)
+        return {"files": refs, "projects": ids}
+
+    @staticmethod
+    def _sweep(directory: str, names: List[str], referenced: Set[str], cutoff: float, dry_run: bool) -> Dict[str, int]:
+        stats = {"scanned": 0, "deleted": 0, "bytes": 0}
+        for name in names:
+            stats["scanned"] += 1
+            if name in referenced:
+                continue
+            path = os.path.join(directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if st.st_mtime > cutoff:
+                continue
+            try:
+                if os.path.isdir(path):
+                    size = _dir_size(path)
+                    if not dry_run:
+                        shutil.rmtree(path)
+                else:
+                    size = st.st_size
+                    if not dry_run:
+                        os.remove(path)
+            except OSError:
+                continue
+            stats["deleted"] += 1
+            stats["bytes"] += size
+        return stats
+
+    @staticmethod
+    def _sweep_remote(kind: str, referenced: Set[str], cutoff: float, dry_run: bool) -> Dict[str, int]:
+        """Same pass over the objects of a remote storage backend (listed page by page)."""
+        storage = get_storage()
+        stats = {"scanned": 0, "deleted": 0, "bytes": 0}
+        for name, size, mtime in storage.list(kind):
+            stats["scanned"] += 1
+            if name in referenced or mtime > cutoff:
+                continue
+            if not dry_run:
+                storage.delete(kind, name)
+            stats["deleted"] += 1
+            stats["bytes"] += size
+        return stats
+
+    async def collect(self, dry_run: bool = False) -> Dict[str, Any]:
+        """One full incremental pass over the asset and blob directories."""
+        from .utils import run_blocking
+        cfg = _config()
+        started = time.time()
+        try:
+            refs = await run_blocking(self._references)
+        except ValueError as e:
+            # An unreadable DB must never look like "nothing is referenced"
+            report = {"error": f"DB unreadable, GC skipped: {e}", "finished": time.time()}
+            self.last_report = report
+            return report
+        cutoff = started - cfg["grace_hours"] * 3600
+        targets = [(kind, directory, refs["files"].get(kind, set())) for kind, directory in ASSET_DIRS.items()]
+        targets.append(("blobs", BLOB_DIR, {p for p in refs["projects"] if p}))
+        report: Dict[str, Any] = {"dry_run": dry_run, "kinds": {}}
+        for kind, directory, referenced in targets:
+            try:
+                names = await run_blocking(os.listdir, directory)
+            except OSError:
+                continue
+            totals = {"scanned": 0, "deleted": 0, "bytes": 0}
+            for i in range(0, len(names), cfg["batch"]):
+                stats = await run_blocking(self._sweep, directory, names[i:i + cfg["batch"]], referenced, cutoff, dry_run)
+                for key, value in stats.items():
+                    totals[key] += value
+                await asyncio.sleep(0)
+            report["kinds"][kind] = totals
+            if not dry_run:
+                metrics.incr("asset_gc", kind, "deleted", totals["deleted"])
+                metrics.incr("asset_gc", kind, "bytes", totals["bytes"])
+        if get_storage().name != "local":
+            for kind in ASSET_DIRS:
+                try:
+                    totals = await run_blocking(self._sweep_remote, kind, refs["files"].get(kind, set()), cutoff, dry_run)
+                except StorageError as e:
+                    report.setdefault("errors", []).append(str(e))
+                    continue
+                report["kinds"][f"remote_{kind}"] = totals
+                if not dry_run:
+                    metrics.incr("asset_gc", f"remote_{kind}", "deleted", totals["deleted"])
+                    metrics.incr("asset_gc", f"remote_{kind}", "bytes", totals["bytes"])
+        report["deleted"] = sum(k["deleted"] for k in report["kinds"].values())
+        report["bytes"] = sum(k["bytes"] for k in report["kinds"].values())
+        report["seconds"] = round(time.time() - started, 3)
+        report["finished"] = time.time()
+        self.last_report = report
+        return report
+
+    async def _loop(self):
+        while True:
+            cfg = _config()
+            if cfg["enabled"]:
+                try:
+                    report = await self.collect()
+                    if report.get("deleted"):
+                        print(f"🧹 GC de assets: {report['deleted']} archivos, {report['bytes'] / (1 << 20):.1f} MB liberados")
+                except Exception as e:
+                    print(f"⚠️ GC de assets falló: {e}")
+            await asyncio.sleep(cfg["interval_minutes"] * 60)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+asset_collector = AssetCollector()
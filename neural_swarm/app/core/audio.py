@@ -0,0 +1,226 @@
+import os
+import re
+import wave
+import hashlib
+from typing import List, Tuple
+import numpy as np
+
+# Gemini TTS returns 16-bit little-endian mono PCM at 24 kHz
+SAMPLE_RATE = 24000
+SAMPLE_WIDTH = 2
+# Frames copied per read when streaming block WAVs into the master track
+STREAM_FRAMES = 65536
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…;:])[\"'”»)\]]*\s+")
+
+def split_sentences(text: str, max_chars: int = 600) -> List[str]:
+    """Splits text at sentence boundaries into chunks of at most `max_chars`.
+
+    Sentences are packed greedily; a single sentence longer than the budget is
+    cut at the last comma or space that fits.
+    """
+    chunks: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_END.split((text or "").strip()):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = max(sentence.rfind(", ", 0, max_chars), sentence.rfind(" ", 0, max_chars))
+            cut = cut + 1 if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if not sentence:
+            continue
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+def pcm_from_bytes(data: bytes) -> np.ndarray:
+    if len(data) % SAMPLE_WIDTH:
+        data = data[:-1]
+    return np.frombuffer(data, dtype="<i2")
+
+def stitch(chunks: List[np.ndarray], crossfade_ms: float = 10, gap_ms: float = 0, rate: int = SAMPLE_RATE) -> Tuple[np.ndarray, List[int]]:
+    """Joins int16 PCM chunks into one track; returns it with the start sample of every chunk.
+
+    With `gap_ms` the chunks are separated by that much silence and get
+    `crossfade_ms` fade-in/out ramps at the joins (no clicks). Without a gap,
+    consecutive chunks overlap by `crossfade_ms` with an equal-gain crossfade.
+    Empty chunks start where the next chunk would.
+    """
+    starts = []
+    pos = 0
+    kept = [c for c in chunks if len(c)]
+    if not kept:
+        return np.zeros(0, dtype=np.int16), [0] * len(chunks)
+    if len(kept) == 1:
+        return kept[0].astype(np.int16, copy=False), [0] * len(chunks)
+    fade = int(rate * crossfade_ms / 1000)
+    gap = int(rate * gap_ms / 1000)
+    parts = [c.astype(np.float32) for c in kept]
+    if gap:
+        silence = np.zeros(gap, dtype=np.float32)
+        out = []
+        for i, part in enumerate(parts):
+            n = min(fade, len(part) // 2)
+            if n:
+                ramp = np.linspace(0.0, 1.0, n, dtype=np.float32)
+                if i:
+                    part[:n] *= ramp
+                if i < len(parts) - 1:
+                    part[-n:] *= ramp[::-1]
+            if i:
+                out.append(silence)
+                pos += gap
+            out.append(part)
+            starts.append(pos)
+            pos += len(part)
+        mixed = np.concatenate(out)
+    else:
+        total = sum(len(p) for p in parts) - sum(min(fade, len(a), len(b)) for a, b in zip(parts, parts[1:]))
+        mixed = np.zeros(total, dtype=np.float32)
+        pos = 0
+        for i, part in enumerate(parts):
+            n = min(fade, len(parts[i - 1]), len(part)) if i else 0
+            if n:
+                ramp = np.linspace(0.0, 1.0, n, dtype=np.float32)
+                part = part.copy()
+                part[:n] *= ramp
+                mixed[pos - n:pos] *= ramp[::-1]
+                pos -= n
+            starts.append(pos)
+            mixed[pos:pos + len(part)] += part
+            pos += len(part)
+    # Back to one start per input chunk (empty ones take the next start)
+    kept_starts = iter(starts)
+    offsets, pending = [], 0
+    for c in chunks:
+        if len(c):
+            offsets.extend([next(kept_starts)] * (pending + 1))
+            pending = 0
+        else:
+            pending += 1
+    offsets.extend([len(mixed)] * pending)
+    return np.clip(np.rint(mixed), -32768, 32767).astype(np.int16), offsets
+
+def shift_spans(spans: List[Tuple[float, float]], trimmed_seconds: float, total_seconds: float) -> List[Tuple[float, float]]:
+    """(start, duration) spans in seconds moved back by a leading trim and clipped to the trimmed track."""
+    out = []
+    for start, length in spans:
+        begin = min(max(0.0, start - trimmed_seconds), total_seconds)
+        end = min(max(begin, start + length - trimmed_seconds), total_seconds)
+        out.append((begin, end - begin))
+    return out
+
+def write_wav(path: str, pcm: np.ndarray, rate: int = SAMPLE_RATE):
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(SAMPLE_WIDTH)
+        wf.setframerate(rate)
+        wf.writeframes(pcm.astype("<i2", copy=False).tobytes())
+
+def duration(samples: int, rate: int = SAMPLE_RATE) -> float:
+    return samples / float(rate)
+
+def file_hash(path: str) -> str:
+    """sha1 of a file, read in blocks."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def assemble(paths: List[str], out_path: str, gaps_ms: List[float], rate: int = SAMPLE_RATE) -> List[Tuple[float, float]]:
+    """Concatenates mono int16 WAVs into `out_path`, streaming frames so memory stays flat.
+
+    `gaps_ms[i]` is the silence written after file i (the last one is ignored).
+    Returns (start_seconds, end_seconds) of every file in the output.
+    """
+    offsets = []
+    written = 0
+    tmp_path = f"{out_path}.tmp"
+    with wave.open(tmp_path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(SAMPLE_WIDTH)
+        out.setframerate(rate)
+        for i, path in enumerate(paths):
+            with wave.open(path, "rb") as wf:
+                if wf.getnchannels() != 1 or wf.getsampwidth() != SAMPLE_WIDTH or wf.getframerate() != rate:
+                    raise ValueError(f"{path}: expected mono 16-bit {rate} Hz audio")
+                start = written
+                while True:
+                    frames = wf.readframes(STREAM_FRAMES)
+                    if not frames:
+                        break
+                    out.writeframes(frames)
+                    written += len(frames) // SAMPLE_WIDTH
+            offsets.append((duration(start, rate), duration(written, rate)))
+            if i < len(paths) - 1:
+                gap = int(rate * gaps_ms[i] / 1000)
+                if gap:
+                    out.writeframes(b"\x00\x00" * gap)
+                    written += gap
+    os.replace(tmp_path, out_path)
+    return offsets
+
+def read_wav(path: str) -> np.ndarray:
+    with wave.open(path, "rb") as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != SAMPLE_WIDTH:
+            raise ValueError(f"{path}: expected mono 16-bit audio")
+        return pcm_from_bytes(wf.readframes(wf.getnframes()))
+
+def process_pcm(pcm: np.ndarray, target_dbfs: float = -20.0, silence_dbfs: float = -45.0, pad_ms: float = 120,
+                peak_dbfs: float = -1.0, max_gain_db: float = 20.0, frame_ms: float = 20, rate: int = SAMPLE_RATE) -> Tuple[np.ndarray, dict]:
+    """Trims leading/trailing silence and normalizes loudness of int16 PCM.
+
+    Loudness is the mean power of the non-silent 20 ms frames (a gated RMS,
+    like the gating in LUFS), brought to `target_dbfs`; the gain is capped so
+    the peak stays under `peak_dbfs`. Frames quieter than `silence_dbfs` at
+    either end are cut, keeping `pad_ms` of room.
+    """
+    stats = {"gain_db": 0.0, "trimmed_seconds": 0.0, "leading_trim_samples": 0, "loudness_dbfs": None}
+    if not len(pcm):
+        return pcm, stats
+    frame = max(1, int(rate * frame_ms / 1000))
+    x = pcm.astype(np.float32) / 32768.0
+    n_frames = -(-len(x) // frame)
+    framed = np.zeros(n_frames * frame, dtype=np.float32)
+    framed[:len(x)] = x
+    power = np.mean(framed.reshape(n_frames, frame) ** 2, axis=1)
+    voiced = 10 * np.log10(power + 1e-12) > silence_dbfs
+    if not voiced.any():
+        return pcm, stats
+    first, last = np.argmax(voiced), n_frames - 1 - np.argmax(voiced[::-1])
+    pad = int(rate * pad_ms / 1000)
+    start = max(0, first * frame - pad)
+    end = min(len(x), (last + 1) * frame + pad)
+    x = x[start:end]
+    loudness = 10 * np.log10(np.mean(power[voiced]) + 1e-12)
+    peak = float(np.max(np.abs(x))) or 1e-9
+    gain_db = min(target_dbfs - loudness, peak_dbfs - 20 * np.log10(peak), max_gain_db)
+    y = x * np.float32(10 ** (gain_db / 20))
+    out = np.clip(np.rint(y * 32768.0), -32768, 32767).astype(np.int16)
+    stats.update(
+        gain_db=round(float(gain_db), 2),
+        trimmed_seconds=round(duration(len(pcm) - len(out), rate), 3),
+        # Where the kept audio began in the input, to shift offsets measured before processing
+        leading_trim_samples=int(start),
+        loudness_dbfs=round(float(loudness), 2),
+    )
+    return out, stats
+
+def process_wav_file(path: str, options: dict) -> dict:
+    """process_pcm on a WAV file in place; returns the stats plus the new duration. Picklable for process pools."""
+    pcm, stats = process_pcm(read_wav(path), **options)
+    tmp_path = f"{path}.tmp"
+    write_wav(tmp_path, pcm)
+    os.replace(tmp_path, path)
+    stats["duration_seconds"] = duration(len(pcm))
+    return stats
@@ -0,0 +1,259 @@
+import time
+import uuid
+import asyncio
+import threading
+import contextvars
+import concurrent.futures
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .settings import settings_manager
+from .metrics import metrics
+
+# Active batch session of the running pipeline (None = interactive mode).
+# Propagates into LangGraph node tasks and run_blocking workers.
+current_batch: contextvars.ContextVar[Optional["BatchSession"]] = contextvars.ContextVar("current_batch", default=None)
+
+def parallel_limit():
+    """Concurrency for per-block fan-outs: unbounded in batch mode so a phase fills one job."""
+    if current_batch.get() is not None:
+        return None
+    return settings_manager.get("max_parallel_calls", 4)
+
+DONE_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+def _state_name(state: Any) -> str:
+    return getattr(state, "name", None) or str(state)
+
+class BatchBackend:
+    """Submits a list of generate_content requests for one model and polls the job."""
+
+    def submit(self, model: str, requests: List[Dict[str, Any]]) -> str:
+        raise NotImplementedError
+
+    def poll(self, job_name: str) -> Tuple[str, Optional[List[Tuple[Any, Optional[str]]]]]:
+        """Returns (state, results); results is a list of (response, error) once the job is done."""
+        raise NotImplementedError
+
+    def cancel(self, job_name: str):
+        """Best-effort cancellation of a submitted job."""
+
+class GeminiBatchBackend(BatchBackend):
+    """Gemini Batch API with inlined requests."""
+
+    def submit(self, model: str, requests: List[Dict[str, Any]]) -> str:
+        from .ai import get_client
+        job = get_client().batches.create(
+            model=model,
+            src=requests,
+            config={"display_name": f"neural-swarm-{uuid.uuid4().hex[:8]}"}
+        )
+        return job.name
+
+    def poll(self, job_name: str):
+        from .ai import get_client
+        job = get_client().batches.get(name=job_name)
+        state = _state_name(job.state)
+        if state not in DONE_STATES:
+            return state, None
+        if state in ("JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED") and not (job.dest and job.dest.inlined_responses):
+            raise RuntimeError(f"Batch job {job_name} ended as {state}: {job.error}")
+        results = []
+        for item in job.dest.inlined_responses or []:
+            results.append((item.response, str(item.error) if item.error else None))
+        return state, results
+
+    def cancel(self, job_name: str):
+        from .ai import get_client
+        get_client().batches.cancel(name=job_name)
+
+class LocalBatchBackend(BatchBackend):
+    """In-process stand-in for the batch service (tests and offline dry runs).
+
+    Jobs go QUEUED -> RUNNING -> SUCCEEDED on a background thread. Each request
+    is answered by `executor(model, request)`; the default one fabricates
+    responses (schema-shaped JSON, short silence for TTS, a 1x1 PNG for images)
+    without touching the network.
+    """
+
+    def __init__(self, executor: Optional[Callable[[str, Dict[str, Any]], Any]] = None, latency: float = 0.0):
+        self.executor = executor or fake_response
+        self.latency = latency
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, model: str, requests: List[Dict[str, Any]]) -> str:
+        name = f"batches/local-{uuid.uuid4().hex[:10]}"
+        with self._lock:
+            self.jobs[name] = {"state": "JOB_STATE_QUEUED", "results": None}
+        threading.Thread(target=self._run, args=(name, model, requests), daemon=True).start()
+        return name
+
+    def _run(self, name: str, model: str, requests: List[Dict[str, Any]]):
+        with self._lock:
+            self.jobs[name]["state"] = "JOB_STATE_RUNNING"
+        if self.latency:
+            time.sleep(self.latency)
+        results = []
+        for req in requests:
+            try:
+                results.append((self.executor(model, req), None))
+            except Exception as e:
+                results.append((None, str(e)))
+        with self._lock:
+            self.jobs[name].update(state="JOB_STATE_SUCCEEDED", results=results)
+
+    def poll(self, job_name: str):
+        with self._lock:
+            job = self.jobs[job_name]
+            return job["state"], job["results"]
+
+    def cancel(self, job_name: str):
+        with self._lock:
+            if self.jobs[job_name]["results"] is None:
+                self.jobs[job_name]["state"] = "JOB_STATE_CANCELLED"
+
+_PNG_1X1 = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+def fake_response(model: str, request: Dict[str, Any]):
+    """Deterministic GenerateContentResponse for LocalBatchBackend."""
+    import json
+    from google.genai import types
+    from .llm_stub import example_from_schema
+    config = request.get("config")
+    modalities = list(getattr(config, "response_modalities", None) or [])
+    if "AUDIO" in modalities:
+        part = types.Part(inline_data=types.Blob(mime_type="audio/pcm", data=b"\x00\x00" * 12000))
+    elif "IMAGE" in modalities:
+        part = types.Part(inline_data=types.Blob(mime_type="image/png", data=_PNG_1X1))
+    else:
+        schema = getattr(config, "response_json_schema", None)
+        text = json.dumps(example_from_schema(schema)) if schema else f"[batch:{model}] {str(request.get('contents'))[:200]}"
+        part = types.Part(text=text)
+    return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))])
+
+BATCH_BACKENDS = {
+    "gemini": GeminiBatchBackend,
+    "local": LocalBatchBackend,
+}
+
+class BatchSession:
+    """Collects generate_content calls made during a pipeline run into batch jobs.
+
+    Worker threads call `generate_content`, which queues the request on the event
+    loop and blocks until its batch finishes. Requests are grouped per model and
+    flushed once no new request has arrived for `window` seconds (the calls of a
+    phase are gathered, so they land inside one window) or `max_requests` is hit.
+    """
+
+    def __init__(self, backend: BatchBackend, loop: asyncio.AbstractEventLoop, window: float = 2.0, poll_interval: float = 15.0, max_requests: int = 200):
+        self.backend = backend
+        self.loop = loop
+        self.window = window
+        self.poll_interval = poll_interval
+        self.max_requests = max_requests
+        self.pending: Dict[str, List[Tuple[Dict[str, Any], concurrent.futures.Future]]] = defaultdict(list)
+        self.timers: Dict[str, asyncio.TimerHandle] = {}
+        self.tasks: set = set()
+        # Submit/poll get their own threads: the shared call pool may be full of parked requests
+        self.io = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="swarm-batch")
+
+    @classmethod
+    def from_settings(cls, loop: asyncio.AbstractEventLoop) -> "BatchSession":
+        cfg = settings_manager.get("batch", {}) or {}
+        backend = BATCH_BACKENDS.get(cfg.get("backend", "gemini"), GeminiBatchBackend)()
+        return cls(backend, loop, cfg.get("window_seconds", 2.0), cfg.get("poll_seconds", 15.0), cfg.get("max_requests", 200))
+
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> Any:
+        """Blocking call for worker threads; returns the GenerateContentResponse."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            # Blocking here would deadlock the loop that has to flush the batch
+            raise RuntimeError("Batch calls must run in a worker thread (use retry_with_backoff / run_blocking)")
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        request = {"contents": contents, "config": config}
+        self.loop.call_soon_threadsafe(self._enqueue, model, request, future)
+        return future.result()
+
+    def _enqueue(self, model: str, request: Dict[str, Any], future: concurrent.futures.Future):
+        self.pending[model].append((request, future))
+        timer = self.timers.pop(model, None)
+        if timer:
+            timer.cancel()
+        if len(self.pending[model]) >= self.max_requests:
+            self._flush(model)
+        else:
+            self.timers[model] = self.loop.call_later(self.window, self._flush, model)
+
+    def _flush(self, model: str):
+        self.timers.pop(model, None)
+        items = self.pending.pop(model, [])
+        if items:
+            task = self.loop.create_task(self._run_job(model, items))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _run_job(self, model: str, items: List[Tuple[Dict[str, Any], concurrent.futures.Future]]):
+        started = time.perf_counter()
+        metrics.incr("batch", model, "jobs")
+        metrics.incr("batch", model, "requests", len(items))
+        job_name = None
+        try:
+            job_name = await self.loop.run_in_executor(self.io, self.backend.submit, model, [req for req, _ in items])
+            while True:
+                state, results = await self.loop.run_in_executor(self.io, self.backend.poll, job_name)
+                if results is not None:
+                    break
+                await asyncio.sleep(self.poll_interval)
+        except asyncio.CancelledError:
+            if job_name:
+                self.io.submit(self.backend.cancel, job_name)
+            self._fail(items, RuntimeError("Swarm stopped by user"))
+            raise
+        except Exception as e:
+            metrics.incr("batch", model, "failed_jobs")
+            self._fail(items, e)
+            return
+        metrics.observe("batch", model, "job_seconds", time.perf_counter() - started)
+        for i, (_, future) in enumerate(items):
+            if future.done():
+                continue
+            if i >= len(results):
+                future.set_exception(RuntimeError(f"Batch job {job_name} returned no result for request {i}"))
+                continue
+            response, error = results[i]
+            if error or response is None:
+                metrics.incr("batch", model, "failed_requests")
+                future.set_exception(RuntimeError(f"Batch request failed: {error}"))
+            else:
+                future.set_result(response)
+
+    @staticmethod
+    def _fail(items, error: Exception):
+        for _, future in items:
+            if not future.done():
+                future.set_exception(error)
+
+    def cancel(self):
+        """Drops queued requests and cancels running jobs; parked callers get an error."""
+        for timer in self.timers.values():
+            timer.cancel()
+        self.timers.clear()
+        for items in self.pending.values():
+            self._fail(items, RuntimeError("Swarm stopped by user"))
+        self.pending.clear()
+        for task in list(self.tasks):
+            task.cancel()
+
+    async def close(self):
+        """Flushes what is still queued and waits for running jobs."""
+        for model in list(self.pending):
+            self._flush(model)
+        if self.tasks:
+            await asyncio.gather(*list(self.tasks), return_exceptions=True)
+        self.io.shutdown(wait=False)
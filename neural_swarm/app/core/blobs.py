@@ -0,0 +1,94 @@
+import os
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import concurrent.futures
+from typing import Any, Dict, Optional, Tuple
+from .constants import BLOB_DIR
+from .settings import settings_manager
+from .metrics import metrics
+from .persistence import file_writer
+
+# Project sections stored outside the DB record; everything else stays inline
+HEAVY_FIELDS = ("script", "project_bible", "audience_profile", "competitor_analysis",
+                "audit_report", "art_direction", "audio_instructions")
+COMPRESS_LEVEL = 6
+
+class BlobStore:
+    """Heavy project sections as gzip'd JSON under studio_blobs/<project_id>/<field>-<hash>.json.gz.
+
+    The name carries a hash of the content, so an unchanged section is never
+    rewritten and a cached entry can never be stale. Decompressed JSON is kept
+    in an LRU bounded by `storage.blob_cache_mb`.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_bytes = 0
+
+    def _path(self, project_id: str, name: str) -> str:
+        return os.path.join(self.directory, project_id, name)
+
+    def _remember(self, key: str, raw: bytes):
+        limit = (settings_manager.get("storage", {}) or {}).get("blob_cache_mb", 64) * (1 << 20)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return
+            self._cache[key] = raw
+            self._cache_bytes += len(raw)
+            while self._cache_bytes > limit and self._cache:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+
+    def put(self, project_id: str, field: str, value: Any, previous: Optional[str] = None) -> Tuple[str, Optional[concurrent.futures.Future]]:
+        """Stores `value`; returns its blob name and the future of the write (None when it equals `previous`).
+
+        `previous` is left alone: the caller removes it once nothing on disk points at it.
+        """
+        raw = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        name = f"{field}-{hashlib.sha1(raw).hexdigest()[:16]}.json.gz"
+        if name == previous:
+            return name, None
+        os.makedirs(os.path.join(self.directory, project_id), exist_ok=True)
+        data = gzip.compress(raw, COMPRESS_LEVEL, mtime=0)
+        written = file_writer.write(self._path(project_id, name), data, coalesce=False)
+        self._remember(f"{project_id}/{name}", raw)
+        metrics.incr("blobs", field, "writes")
+        metrics.incr("blobs", field, "bytes_saved", len(raw) - len(data))
+        return name, written
+
+    def get(self, project_id: str, name: str) -> Any:
+        """Section stored under `name` (None when the blob is missing)."""
+        key = f"{project_id}/{name}"
+        with self._lock:
+            raw = self._cache.get(key)
+            if raw is not None:
+                self._cache.move_to_end(key)
+        if raw is None:
+            metrics.incr("blobs", "cache", "misses")
+            data = file_writer.read(self._path(project_id, name))
+            if data is None:
+                return None
+            raw = gzip.decompress(data)
+            self._remember(key, raw)
+        else:
+            metrics.incr("blobs", "cache", "hits")
+        return json.loads(raw)
+
+    def remove(self, project_id: str, name: str):
+        with self._lock:
+            raw = self._cache.pop(f"{project_id}/{name}", None)
+            if raw is not None:
+                self._cache_bytes -= len(raw)
+        file_writer.delete(self._path(project_id, name))
+
+    def drop_project(self, project_id: str, refs: Dict[str, str]):
+        for name in refs.values():
+            self.remove(project_id, name)
+
+blob_store = BlobStore(BLOB_DIR)
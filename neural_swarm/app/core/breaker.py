@@ -0,0 +1,181 @@
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+from .settings import settings_manager
+from .metrics import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Call rejected without touching the network: the model's circuit is open."""
+
+def _config() -> Dict[str, Any]:
+    cfg = settings_manager.get("circuit_breaker", {}) or {}
+    return {
+        "enabled": cfg.get("enabled", True),
+        "window": cfg.get("window", 20),
+        "min_calls": cfg.get("min_calls", 5),
+        "error_rate": cfg.get("error_rate", 0.5),
+        "cooldown_seconds": cfg.get("cooldown_seconds", 60),
+        "fallbacks": cfg.get("fallbacks", {}) or {},
+    }
+
+class CircuitBreaker:
+    """Rolling error-rate breaker for one model or API key.
+
+    CLOSED: calls pass and outcomes fill a window of the last `window` calls.
+    Once at least `min_calls` are recorded and the error rate reaches
+    `error_rate`, the breaker OPENs and rejects calls for `cooldown` seconds
+    (doubling on each failed probe). After that one probe call is let through
+    (HALF_OPEN): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.outcomes: deque = deque()
+        self.opened_at = 0.0
+        self.cooldown = 0.0
+        self.failed_probes = 0
+        self.probe_in_flight = False
+
+    def _retry_at(self) -> float:
+        return self.opened_at + self.cooldown
+
+    def is_open(self, now: float) -> bool:
+        """True while calls would be rejected (no side effects)."""
+        if self.state == OPEN:
+            return now < self._retry_at()
+        return self.state == HALF_OPEN and self.probe_in_flight
+
+    def allow(self, now: float) -> bool:
+        """Claims a call; in HALF_OPEN only the single probe is allowed."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now >= self._retry_at():
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def record(self, ok: bool, now: float, cfg: Dict[str, Any]) -> Optional[str]:
+        """Stores an outcome; returns the new state if it changed."""
+        if self.state == HALF_OPEN:
+            self.probe_in_flight = False
+            if ok:
+                self.state = CLOSED
+                self.outcomes.clear()
+                self.failed_probes = 0
+                return CLOSED
+            self.failed_probes += 1
+            self._open(now, cfg)
+            return OPEN
+        if self.state == OPEN:
+            # Late result of a call started before the circuit opened
+            return None
+        self.outcomes.append(ok)
+        while len(self.outcomes) > cfg["window"]:
+            self.outcomes.popleft()
+        errors = self.outcomes.count(False)
+        if len(self.outcomes) >= cfg["min_calls"] and errors / len(self.outcomes) >= cfg["error_rate"]:
+            self._open(now, cfg)
+            return OPEN
+        return None
+
+    def _open(self, now: float, cfg: Dict[str, Any]):
+        self.state = OPEN
+        self.opened_at = now
+        self.cooldown = cfg["cooldown_seconds"] * (2 ** min(self.failed_probes, 4))
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "calls_in_window": len(self.outcomes),
+            "error_rate": round(self.outcomes.count(False) / len(self.outcomes), 3) if self.outcomes else 0.0,
+            "retry_in_seconds": max(0, round(self._retry_at() - now, 1)) if self.state == OPEN else 0,
+        }
+
+class BreakerRegistry:
+    """Breakers by name (`model:<model>`, `key:<label>`), shared by every worker thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def _get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker(name)
+        return breaker
+
+    def is_open(self, name: str) -> bool:
+        if not _config()["enabled"]:
+            return False
+        with self._lock:
+            breaker = self._breakers.get(name)
+            return bool(breaker and breaker.is_open(time.time()))
+
+    def allow(self, name: str) -> bool:
+        if not _config()["enabled"]:
+            return True
+        with self._lock:
+            allowed = self._get(name).allow(time.time())
+        if not allowed:
+            metrics.incr("breaker", name, "short_circuited")
+        return allowed
+
+    def record(self, name: str, ok: bool):
+        cfg = _config()
+        if not cfg["enabled"]:
+            return
+        with self._lock:
+            breaker = self._get(name)
+            changed = breaker.record(ok, time.time(), cfg)
+            cooldown = breaker.cooldown
+        if changed:
+            metrics.incr("breaker", name, f"to_{changed}")
+            if changed == OPEN:
+                _announce(f"⚡ Circuito abierto para {name}: fallando rápido durante {cooldown:g}s", "warning")
+            else:
+                _announce(f"✅ Circuito cerrado para {name}: el servicio se ha recuperado", "info")
+
+    def states(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            now = time.time()
+            return {name: b.stats(now) for name, b in self._breakers.items()}
+
+def _announce(message: str, type: str):
+    print(message)
+    from .websocket import manager
+    manager.broadcast_threadsafe(message, type)
+
+breakers = BreakerRegistry()
+
+def fallback_model(model: str) -> Optional[str]:
+    return _config()["fallbacks"].get(model)
+
+def call_with_breaker(model: str, call: Callable[[str], Any], is_failure: Callable[[Exception], bool] = lambda e: True) -> Any:
+    """Runs `call(model)` behind the model's breaker, switching to the configured fallback model while it is open.
+
+    Errors for which `is_failure` is False (e.g. quota errors, which are a key
+    problem and not a model one) pass through without counting against the model.
+    """
+    name = f"model:{model}"
+    if not breakers.allow(name):
+        fallback = fallback_model(model)
+        if not fallback or not breakers.allow(f"model:{fallback}"):
+            raise CircuitOpenError(f"CIRCUIT_OPEN: {model} is failing; call rejected")
+        metrics.incr("breaker", name, "fallbacks")
+        model, name = fallback, f"model:{fallback}"
+    try:
+        result = call(model)
+    except Exception as e:
+        breakers.record(name, not is_failure(e))
+        raise
+    breakers.record(name, True)
+    return result
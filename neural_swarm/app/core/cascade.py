@@ -0,0 +1,91 @@
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .settings import settings_manager
+from .metrics import metrics
+
+class CascadeRejected(Exception):
+    """Una respuesta de un nivel barato no superó las comprobaciones del cascade."""
+
+def get_policy(agent_id: str) -> Optional[Dict[str, Any]]:
+    """Política de cascade del agente (`cascades` en settings), o None.
+
+    Ejemplo:
+        "cascades": {
+            "SpecialistAuditor": {"models": ["gemini-2.0-flash-lite"], "accept": {"overall_score": [1, 10]}},
+            "PromptEngineer": {"models": ["gemini-2.0-flash-lite"], "min_chars": 80}
+        }
+    `models` son los niveles baratos (nombre de modelo o {"provider", "model"}) que se
+    prueban antes del modelo normal del agente.
+    """
+    cascades = settings_manager.get("cascades", {}) or {}
+    policy = cascades.get(agent_id)
+    if policy is None and "." in agent_id:
+        policy = cascades.get(agent_id.split(".", 1)[0])
+    if not policy or not policy.get("models"):
+        return None
+    return policy
+
+def _lookup(data: Any, path: str) -> Any:
+    for part in path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
+
+def check_output(policy: Dict[str, Any], result: Any):
+    """Lanza CascadeRejected si el resultado debe escalar al siguiente nivel."""
+    min_chars = policy.get("min_chars", 0)
+    if min_chars:
+        size = len(result) if isinstance(result, str) else len(json.dumps(result, ensure_ascii=False))
+        if size < min_chars:
+            raise CascadeRejected(f"too_short ({size} < {min_chars})")
+    for field, bounds in (policy.get("accept") or {}).items():
+        value = _lookup(result, field)
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise CascadeRejected(f"missing_{field}")
+        low, high = bounds
+        if not (low <= value <= high):
+            raise CascadeRejected(f"{field}_out_of_bounds ({value})")
+
+def _model_cost(model: str) -> float:
+    return float((settings_manager.get("model_costs", {}) or {}).get(model, 0))
+
+def run_cascade(agent_id: str, policy: Dict[str, Any], tiers: List[Tuple[Any, str]], call: Callable[[Any, str], Any]) -> Any:
+    """Ejecuta `call(provider, model)` nivel a nivel; el último nivel es el modelo normal y no se valida."""
+    final_model = tiers[-1][1]
+    metrics.incr("cascade", agent_id, "calls")
+    for level, (provider, model) in enumerate(tiers):
+        is_final = level == len(tiers) - 1
+        started = time.perf_counter()
+        try:
+            result = call(provider, model)
+            if not is_final:
+                check_output(policy, result)
+        except CascadeRejected as e:
+            metrics.incr("cascade", agent_id, "escalations")
+            metrics.incr("cascade", agent_id, f"escalated:{str(e).split(' ')[0]}")
+            continue
+        except Exception as e:
+            if is_final:
+                raise
+            metrics.incr("cascade", agent_id, "escalations")
+            metrics.incr("cascade", agent_id, f"escalated:{type(e).__name__}")
+            continue
+        finally:
+            metrics.observe("cascade", agent_id, f"latency:{model}", time.perf_counter() - started)
+        metrics.incr("cascade", agent_id, f"served_by:{model}")
+        if level:
+            metrics.incr("cascade", agent_id, "escalated_calls")
+        if not is_final:
+            # Savings are estimated against the strong model's observed latency and configured cost
+            strong_latency = metrics.average("cascade", agent_id, f"latency:{final_model}")
+            if strong_latency:
+                metrics.incr("cascade", agent_id, "latency_saved_s", max(0.0, strong_latency - (time.perf_counter() - started)))
+            metrics.incr("cascade", agent_id, "cost_saved", _model_cost(final_model) - _model_cost(model))
+        return result
+    raise RuntimeError("cascade without tiers")
+
+def escalation_rates() -> Dict[str, float]:
+    snap = metrics.snapshot().get("cascade", {})
+    return {agent: round(v.get("escalated_calls", 0) / v["calls"], 3) for agent, v in snap.items() if v.get("calls")}
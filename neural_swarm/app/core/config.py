@@ -25,8 +25,15 @@ def __getattr__(name):
     if name == "API_KEY": return get_api_key()
     raise AttributeError(f"module {__name__} has no attribute {name}")
 
-from .constants import BASE_DIR, DB_FILE, AUDIO_DIR, IMAGE_DIR
+from .constants import BASE_DIR, DB_FILE, BLOB_DIR, AUDIO_DIR, IMAGE_DIR, VIDEO_DIR, KNOWLEDGE_DIR, DURATION_FILE
 
-# Ensure directories exist
-os.makedirs(AUDIO_DIR, exist_ok=True)
-os.makedirs(IMAGE_DIR, exist_ok=True)
+_dirs_ready = False
+
+def ensure_data_dirs():
+    """Creates the data directories (once per process; called at app startup and before a run, not at import)."""
+    global _dirs_ready
+    if _dirs_ready:
+        return
+    for directory in (AUDIO_DIR, IMAGE_DIR, VIDEO_DIR, KNOWLEDGE_DIR, BLOB_DIR):
+        os.makedirs(directory, exist_ok=True)
+    _dirs_ready = True
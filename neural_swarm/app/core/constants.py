@@ -5,6 +5,10 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__fil
 
 # Data paths
 DB_FILE = os.path.join(BASE_DIR, "studio_db.json")
+BLOB_DIR = os.path.join(BASE_DIR, "studio_blobs")
 AUDIO_DIR = os.path.join(BASE_DIR, "studio_audio")
 IMAGE_DIR = os.path.join(BASE_DIR, "studio_images")
+VIDEO_DIR = os.path.join(BASE_DIR, "studio_video")
 SETTINGS_FILE = os.path.join(BASE_DIR, "settings.json")
+KNOWLEDGE_DIR = os.path.join(BASE_DIR, "studio_knowledge")
+DURATION_FILE = os.path.join(BASE_DIR, "studio_durations.json")
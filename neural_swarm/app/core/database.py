@@ -1,42 +1,234 @@
 import json
-import os
+import threading
 from .config import DB_FILE
+from .persistence import file_writer, json_bytes
+from .patch import apply_patch
+from .blobs import HEAVY_FIELDS, blob_store
+from .assets import project_assets
+
+class VersionConflict(Exception):
+    """The project changed since the version the client edited."""
+    def __init__(self, current_version: int):
+        super().__init__(f"Project is at version {current_version}")
+        self.current_version = current_version
+
+class MissingSection(ValueError):
+    """A project record references a blob that is not in the store."""
+    def __init__(self, project_id: str, field: str, name: str):
+        super().__init__(f"Project {project_id}: {field} blob {name} is missing")
+        self.field = field
+
+class SaveFailed(Exception):
+    """The project could not be written to disk; the stored version is unchanged."""
+
+class _BlobChanges:
+    """Blobs one save writes and the blobs it supersedes (applied by `Database._commit`)."""
+    def __init__(self):
+        self.written = []
+        self.obsolete = []
 
 class Database:
+    """Project store: slim records in studio_db.json, heavy sections in compressed blobs.
+
+    `load()` returns the slim records (what list views need); `get_project()`
+    returns one full project with its blobs loaded. Writers take full projects.
+    Blobs are resolved under `_lock`: a writer replacing a section deletes the
+    blob it superseded, so a record read outside the lock may point at a blob
+    that no longer exists. On disk, a save goes new blobs -> DB file -> deletes
+    of the replaced blobs, each step waiting for the previous one, so a crash
+    never leaves the DB pointing at a deleted blob.
+    """
+    # Serializes load-modify-save sequences (async handlers, threadpool endpoints and pipeline runs)
+    _lock = threading.RLock()
+    # Bumped by every save of this process; caches built from load() key on it
+    revision = 0
+
     @staticmethod
-    def load():
-        if not os.path.exists(DB_FILE):
+    def load(strict=False):
+        """DB contents. An unreadable file reads as empty, or raises ValueError with `strict`
+        (callers that delete by absence, like the asset GC, must not mistake it for an empty DB)."""
+        data = file_writer.read(DB_FILE)
+        if data is None:
             return {"projects": []}
         try:
-            with open(DB_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except:
+            return json.loads(data)
+        except Exception as e:
+            if strict:
+                raise ValueError(f"{DB_FILE} is not valid JSON: {e}")
             return {"projects": []}
 
     @staticmethod
     def save(data):
-        with open(DB_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        # Atomic write by the writer thread; waits for it, so a failed write reaches the caller
+        file_writer.write(DB_FILE, json_bytes(data), coalesce=False).result()
+        with Database._lock:
+            Database.revision += 1
+
+    @staticmethod
+    def _commit(db, changes):
+        """Saves `db` once its new blobs are on disk, then deletes the blobs it no longer references."""
+        try:
+            for _, _, written in changes.written:
+                written.result()
+            Database.save(db)
+        except BaseException as e:
+            # Nothing on disk references the new blobs
+            for project_id, name, _ in changes.written:
+                blob_store.remove(project_id, name)
+            if isinstance(e, OSError):
+                raise SaveFailed(f"Project not saved: {e}") from e
+            raise
+        for project_id, name in changes.obsolete:
+            blob_store.remove(project_id, name)
+
+    @staticmethod
+    def list_projects():
+        """Slim records for list views (no blob references)."""
+        return [{k: v for k, v in p.items() if k != "blobs"} for p in Database.load()["projects"]]
+
+    @staticmethod
+    def project_assets(project_id):
+        """Asset files one project references, from its summary (hydrating records that predate it), or None."""
+        with Database._lock:
+            record = next((p for p in Database.load()["projects"] if p.get("id") == project_id), None)
+            if record is None:
+                return None
+            assets = (record.get("summary") or {}).get("assets")
+            return assets if assets is not None else project_assets(Database._hydrate(record))
+
+    @staticmethod
+    def _hydrate(record):
+        """Full project from a record; call with `_lock` held. MissingSection if a blob is gone."""
+        project = {k: v for k, v in record.items() if k not in ("blobs", "summary")}
+        for field, name in (record.get("blobs") or {}).items():
+            value = blob_store.get(record["id"], name)
+            if value is None:
+                # Skipping it would let the next save drop the section for good
+                raise MissingSection(record["id"], field, name)
+            project[field] = value
+        return project
+
+    @staticmethod
+    def _slim(project, changes, previous=None, keep_missing=False):
+        """Record of `project` for the DB file; heavy sections go to blobs (only the changed ones are written).
+
+        With `keep_missing`, sections absent from `project` keep the previous
+        blob instead of being dropped (whole-project writers cannot tell a
+        removed section from one they never had). Blob writes and the blobs
+        they replace are recorded in `changes` for `_commit`.
+        """
+        old_refs = dict((previous or {}).get("blobs") or {})
+        record = {k: v for k, v in project.items() if k not in HEAVY_FIELDS}
+        refs = {}
+        for field in HEAVY_FIELDS:
+            if field in project:
+                previous_name = old_refs.pop(field, None)
+                refs[field], written = blob_store.put(project["id"], field, project[field], previous_name)
+                if written is not None:
+                    changes.written.append((project["id"], refs[field], written))
+                    if previous_name:
+                        changes.obsolete.append((project["id"], previous_name))
+            elif keep_missing and field in old_refs:
+                refs[field] = old_refs.pop(field)
+        # Sections the new version no longer has
+        changes.obsolete.extend((project["id"], name) for name in old_refs.values())
+        record["blobs"] = refs
+        record["summary"] = {
+            "selected_topic": (project.get("project_bible") or {}).get("selected_topic", {}),
+            "blocks": len(project.get("script") or []),
+            # Files on disk this version references (asset GC and storage accounting)
+            "assets": project_assets(project),
+        }
+        return record
+
+    @staticmethod
+    def get_project(project_id):
+        """Full project (blobs loaded), or None."""
+        with Database._lock:
+            record = next((p for p in Database.load()["projects"] if p.get("id") == project_id), None)
+            return Database._hydrate(record) if record else None
 
     @staticmethod
     def add_project(project):
-        db = Database.load()
-        # Verificar si ya existe para evitar duplicados
-        db["projects"] = [p for p in db["projects"] if p.get("id") != project.get("id")]
-        db["projects"].append(project)
-        Database.save(db)
-
-    @staticmethod
-    def update_project(updated_project):
-        db = Database.load()
-        for i, p in enumerate(db["projects"]):
-            if p.get("id") == updated_project.get("id"):
-                db["projects"][i] = updated_project
-                break
-        Database.save(db)
-        
+        with Database._lock:
+            db = Database.load()
+            previous = next((p for p in db["projects"] if p.get("id") == project.get("id")), None)
+            project["version"] = (previous or {}).get("version", 0) + 1
+            # Verificar si ya existe para evitar duplicados
+            db["projects"] = [p for p in db["projects"] if p.get("id") != project.get("id")]
+            changes = _BlobChanges()
+            db["projects"].append(Database._slim(project, changes, previous))
+            Database._commit(db, changes)
+
+    @staticmethod
+    def update_project(updated_project, version=None):
+        """Replaces a stored project; False if it does not exist.
+
+        With `version`, only if the stored project is still at it (otherwise VersionConflict).
+        """
+        with Database._lock:
+            db = Database.load()
+            for i, p in enumerate(db["projects"]):
+                if p.get("id") == updated_project.get("id"):
+                    if version is not None and version != p.get("version", 0):
+                        raise VersionConflict(p.get("version", 0))
+                    updated_project["version"] = p.get("version", 0) + 1
+                    changes = _BlobChanges()
+                    db["projects"][i] = Database._slim(updated_project, changes, p, keep_missing=True)
+                    Database._commit(db, changes)
+                    return True
+            return False
+
+    @staticmethod
+    def patch_project(project_id, ops, version=None):
+        """Applies JSON Patch operations to one project atomically.
+
+        With `version`, the patch only applies if the stored project is still at
+        that version (optimistic concurrency); otherwise VersionConflict.
+        Returns (new_version, changed_fragments), or None if the project does not exist.
+        """
+        with Database._lock:
+            db = Database.load()
+            index = next((i for i, p in enumerate(db["projects"]) if p.get("id") == project_id), None)
+            if index is None:
+                return None
+            record = db["projects"][index]
+            current = record.get("version", 0)
+            if version is not None and version != current:
+                raise VersionConflict(current)
+            patched, changed = apply_patch(Database._hydrate(record), ops)
+            patched["id"] = project_id
+            patched["version"] = current + 1
+            changes = _BlobChanges()
+            db["projects"][index] = Database._slim(patched, changes, record)
+            Database._commit(db, changes)
+            return patched["version"], changed
+
     @staticmethod
     def delete_project(project_id):
-        db = Database.load()
-        db["projects"] = [p for p in db["projects"] if p.get("id") != project_id]
-        Database.save(db)
+        with Database._lock:
+            db = Database.load()
+            removed = [p for p in db["projects"] if p.get("id") == project_id]
+            db["projects"] = [p for p in db["projects"] if p.get("id") != project_id]
+            try:
+                Database.save(db)
+            except OSError as e:
+                raise SaveFailed(f"Project not deleted: {e}") from e
+            for p in removed:
+                blob_store.drop_project(project_id, p.get("blobs") or {})
+
+    @staticmethod
+    def compact():
+        """Moves heavy sections still stored inline (records written before blobs existed) into blobs."""
+        with Database._lock:
+            db = Database.load()
+            legacy = [i for i, p in enumerate(db["projects"]) if any(f in p for f in HEAVY_FIELDS)]
+            changes = _BlobChanges()
+            for i in legacy:
+                try:
+                    db["projects"][i] = Database._slim(Database._hydrate(db["projects"][i]), changes, db["projects"][i])
+                except MissingSection as e:
+                    print(f"⚠️ Migración omitida: {e}")
+            if legacy:
+                Database._commit(db, changes)
+            return len(legacy)
@@ -0,0 +1,138 @@
+import time
+import asyncio
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, Optional
+from .settings import settings_manager
+from .metrics import metrics
+from .batch import current_batch
+from .utils import run_blocking
+from .scheduler import call_scheduler
+
+LATENCY_WINDOW = 200
+
+class DeadlineExceeded(TimeoutError):
+    """A model call exceeded its per-agent deadline."""
+
+_latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+
+def get_deadline(agent_id: Optional[str]) -> Optional[float]:
+    """Seconds allowed per attempt (`deadlines` in settings; `default` applies to unlisted agents)."""
+    deadlines = settings_manager.get("deadlines", {}) or {}
+    value = deadlines.get(agent_id) if agent_id else None
+    if value is None and agent_id and "." in agent_id:
+        value = deadlines.get(agent_id.split(".", 1)[0])
+    if value is None:
+        value = deadlines.get("default")
+    return float(value) if value else None
+
+def overall_deadline(agent_id: Optional[str]) -> Optional[float]:
+    """`time.monotonic()` by which a call and all its retries must be done, or None.
+
+    The budget is `deadline_budget` times the agent's per-attempt deadline; batch
+    mode has none, like the attempts themselves.
+    """
+    deadline = get_deadline(agent_id)
+    budget = settings_manager.get("deadline_budget", 3)
+    if deadline is None or not budget or current_batch.get() is not None:
+        return None
+    return time.monotonic() + deadline * budget
+
+def latency_percentile(agent_id: str, percentile: float) -> Optional[float]:
+    samples = _latencies.get(agent_id)
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def hedge_delay(agent_id: Optional[str]) -> Optional[float]:
+    """Observed pN latency after which a duplicate call is issued, or None (no hedging)."""
+    cfg = settings_manager.get("hedging", {}) or {}
+    agents = cfg.get("agents", [])
+    if not agent_id or (agent_id not in agents and agent_id.split(".", 1)[0] not in agents):
+        return None
+    if len(_latencies.get(agent_id, ())) < cfg.get("min_samples", 20):
+        return None
+    return latency_percentile(agent_id, cfg.get("percentile", 95))
+
+async def run_attempt(fn: Callable[[], Any], agent_id: Optional[str] = None, deadline_at: Optional[float] = None) -> Any:
+    """One attempt of a blocking model call with the agent's deadline and optional hedging.
+
+    `deadline_at` (a `time.monotonic()` value, see `overall_deadline`) caps the
+    attempt to what is left of the call's overall budget.
+
+    Hedging is only for idempotent calls: the duplicate runs the same `fn` and the
+    first successful response wins. Threads of losing or timed-out calls cannot be
+    killed; they finish in the background (bounded by the client's HTTP timeout),
+    their result is dropped and their scheduler slot is abandoned.
+    """
+    if current_batch.get() is not None:
+        # Batch jobs are slow by design; deadlines and hedges would only duplicate them
+        return await run_blocking(fn)
+    key = agent_id or "unknown"
+    deadline = get_deadline(agent_id)
+    if deadline_at is not None:
+        left = deadline_at - time.monotonic()
+        if left <= 0:
+            metrics.incr("deadlines", key, "budget_exceeded")
+            raise DeadlineExceeded(f"DEADLINE_EXCEEDED: {key} used up its overall deadline")
+        deadline = left if deadline is None else min(deadline, left)
+    hedge_after = hedge_delay(agent_id)
+    # Queueing for a slot of the caller's priority class is not part of the attempt:
+    # the deadline and the latency samples measure the model call only. The wait
+    # itself is bounded by the same deadline, so a scheduler full of hung calls
+    # still surfaces as DeadlineExceeded (and a retry) instead of a silent stall
+    try:
+        slot = await asyncio.wait_for(call_scheduler.acquire(), deadline)
+    except asyncio.TimeoutError:
+        metrics.incr("deadlines", key, "queue_exceeded")
+        raise DeadlineExceeded(f"DEADLINE_EXCEEDED: {key} waited more than {deadline:g}s for a call slot")
+    slots = [slot]
+
+    async def _hedge():
+        hedge_slot = await call_scheduler.acquire()
+        slots.append(hedge_slot)
+        return await call_scheduler.submit(fn, hedge_slot)
+
+    started = time.perf_counter()
+    primary = asyncio.ensure_future(call_scheduler.submit(fn, slot))
+    tasks = {primary}
+    last_error: Optional[BaseException] = None
+    try:
+        while tasks:
+            elapsed = time.perf_counter() - started
+            remaining = None if deadline is None else deadline - elapsed
+            if remaining is not None and remaining <= 0:
+                break
+            timeout = remaining
+            if hedge_after is not None:
+                until_hedge = max(0.0, hedge_after - elapsed)
+                timeout = until_hedge if timeout is None else min(timeout, until_hedge)
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                tasks.discard(task)
+                if task.exception() is None:
+                    latency = time.perf_counter() - started
+                    _latencies[key].append(latency)
+                    metrics.observe("latency", key, "seconds", latency)
+                    if task is not primary:
+                        metrics.incr("hedging", key, "hedge_wins")
+                    return task.result()
+                last_error = task.exception()
+            if hedge_after is not None and time.perf_counter() - started >= hedge_after:
+                # One duplicate at most, and only while the primary is still in flight
+                hedge_after = None
+                if tasks:
+                    metrics.incr("hedging", key, "hedges")
+                    tasks.add(asyncio.ensure_future(_hedge()))
+        if last_error is not None and not tasks:
+            raise last_error
+        metrics.incr("deadlines", key, "exceeded")
+        raise DeadlineExceeded(f"DEADLINE_EXCEEDED: {key} took more than {deadline:g}s")
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Calls still in flight (timed out, lost hedge) stop counting against the class
+        for s in slots:
+            call_scheduler.abandon(s)
+        metrics.incr("hedging", key, "calls")
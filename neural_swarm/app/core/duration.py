@@ -0,0 +1,198 @@
+import re
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from .constants import DURATION_FILE
+from .settings import settings_manager
+from .metrics import metrics
+from .persistence import file_writer, json_bytes
+from .knowledge import WORD_RE
+
+# Rough effect of one Editor pass, used to decide how many blocks to touch
+EXPAND_GAIN = 0.5
+SHORTEN_CUT = 0.3
+# Word counts of the two prior pseudo-samples that anchor a fit with little history
+_PRIOR_WORDS = (40, 120)
+_MARKUP = re.compile(r"\[[^\]]*\]|\*")
+# Sections that are meant to be shorter than the rest of the script
+_SHORT_SECTIONS = {"HOOK", "CTA"}
+
+def _config() -> Dict[str, Any]:
+    cfg = settings_manager.get("duration", {}) or {}
+    return {
+        "words_per_second": cfg.get("words_per_second", 2.5),
+        "prior_weight": cfg.get("prior_weight", 5),
+        "tolerance": cfg.get("tolerance", 0.15),
+        "max_blocks": cfg.get("max_blocks", 4),
+        "max_projects": cfg.get("max_projects", 200),
+    }
+
+def spoken_words(text: str) -> int:
+    """Words the voice actually reads: [PAUSA] marks and *emphasis* asterisks are not spoken."""
+    return len(WORD_RE.findall(_MARKUP.sub(" ", text or "")))
+
+def target_seconds(strategy: Dict[str, Any], default_minutes: float = 10) -> float:
+    """target_length_minutes of a content strategy in seconds ("8-10" and "12 min" are accepted)."""
+    value = strategy.get("target_length_minutes", default_minutes)
+    if not isinstance(value, (int, float)):
+        match = re.search(r"\d+(?:[.,]\d+)?", str(value))
+        value = float(match.group().replace(",", ".")) if match else default_minutes
+    return float(value or default_minutes) * 60
+
+def voice_key(voice: Optional[str] = None, language: Optional[str] = None) -> str:
+    return f"{language or settings_manager.get('language', 'es')}:{voice or settings_manager.get('voice_name', 'Fenrir')}"
+
+class DurationModel:
+    """Predicts spoken seconds from word counts, calibrated per voice and language.
+
+    Each voice keeps the sums of a least-squares fit `seconds = a + b * words`
+    over real block WAV durations. Two pseudo-samples at the configured
+    `words_per_second` act as a prior, so a voice with no history still gets a
+    sensible estimate and the fit drifts to the measured rate as runs add up.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Any]] = None
+
+    def _load(self) -> Dict[str, Any]:
+        if self._data is None:
+            try:
+                self._data = json.loads(file_writer.read(self.path) or "{}")
+            except ValueError:
+                self._data = {}
+            self._data.setdefault("voices", {})
+            self._data.setdefault("projects", [])
+        return self._data
+
+    def _save(self):
+        file_writer.write(self.path, json_bytes(self._data, indent=2))
+
+    def _fit(self, key: str) -> Tuple[float, float]:
+        cfg = _config()
+        s = self._load()["voices"].get(key, {})
+        w = cfg["prior_weight"] / len(_PRIOR_WORDS)
+        rate = cfg["words_per_second"]
+        n = s.get("n", 0) + w * len(_PRIOR_WORDS)
+        sx = s.get("sx", 0.0) + w * sum(_PRIOR_WORDS)
+        sy = s.get("sy", 0.0) + w * sum(x / rate for x in _PRIOR_WORDS)
+        sxx = s.get("sxx", 0.0) + w * sum(x * x for x in _PRIOR_WORDS)
+        sxy = s.get("sxy", 0.0) + w * sum(x * x / rate for x in _PRIOR_WORDS)
+        denom = n * sxx - sx * sx
+        slope = (n * sxy - sx * sy) / denom if denom else 0.0
+        if slope <= 0:
+            return 0.0, 1 / rate
+        return (sy - slope * sx) / n, slope
+
+    def coefficients(self, voice: Optional[str] = None, language: Optional[str] = None) -> Dict[str, Any]:
+        key = voice_key(voice, language)
+        with self._lock:
+            intercept, slope = self._fit(key)
+            samples = self._load()["voices"].get(key, {}).get("n", 0)
+        return {
+            "voice": key,
+            "samples": samples,
+            "intercept_seconds": round(intercept, 3),
+            "seconds_per_word": round(slope, 4),
+            "words_per_minute": round(60 / slope, 1),
+        }
+
+    def predict(self, text: str, voice: Optional[str] = None, language: Optional[str] = None) -> float:
+        """Predicted seconds of `text` once synthesized and processed."""
+        words = spoken_words(text)
+        if not words:
+            return 0.0
+        with self._lock:
+            intercept, slope = self._fit(voice_key(voice, language))
+        return max(0.0, intercept + slope * words)
+
+    def words_for(self, seconds: float, voice: Optional[str] = None, language: Optional[str] = None) -> int:
+        """Words that take about `seconds` to say."""
+        with self._lock:
+            intercept, slope = self._fit(voice_key(voice, language))
+        return max(1, int(round((seconds - intercept) / slope)))
+
+    def block_targets(self, sections: List[str], total_seconds: float) -> List[int]:
+        """Word budget of each section so the script adds up to `total_seconds`.
+
+        HOOK and CTA get half the share of a regular block.
+        """
+        weights = [0.5 if str(s).upper() in _SHORT_SECTIONS else 1.0 for s in sections]
+        total = sum(weights) or 1.0
+        return [self.words_for(total_seconds * w / total) for w in weights]
+
+    def allocate(self, outline: List[Dict[str, Any]], total_seconds: float):
+        """Sets `target_words` on every outline block."""
+        blocks = [b for b in outline if isinstance(b, dict)]
+        for block, words in zip(blocks, self.block_targets([b.get("section", "") for b in blocks], total_seconds)):
+            block["target_words"] = words
+
+    def annotate(self, blocks: List[Dict[str, Any]]) -> float:
+        """Sets `predicted_seconds` on blocks without real audio; returns the predicted total."""
+        total = 0.0
+        for block in blocks:
+            if block.get("audio_file") and block.get("duration_seconds"):
+                total += float(block["duration_seconds"])
+                continue
+            block["predicted_seconds"] = round(self.predict(block.get("audio_text", "")), 1)
+            total += block["predicted_seconds"]
+        return total
+
+    def plan(self, blocks: List[Dict[str, Any]], total_seconds: float) -> Dict[str, Any]:
+        """Blocks to expand or shorten so the predicted length lands within `tolerance` of the target.
+
+        The shortest blocks are expanded (longest shortened) until the expected
+        effect of the edits covers the gap, at most `max_blocks` of them. The
+        hook is left alone: HookMaster owns it.
+        """
+        cfg = _config()
+        predicted = self.annotate(blocks)
+        result = {"predicted_seconds": round(predicted, 1), "target_seconds": round(total_seconds, 1), "actions": []}
+        gap = total_seconds - predicted
+        if not blocks or abs(gap) <= total_seconds * cfg["tolerance"]:
+            return result
+        action = "expand" if gap > 0 else "shorten"
+        factor = EXPAND_GAIN if gap > 0 else SHORTEN_CUT
+        candidates = [i for i in range(len(blocks)) if i or len(blocks) == 1]
+        candidates.sort(key=lambda i: blocks[i].get("predicted_seconds", 0), reverse=gap < 0)
+        covered = 0.0
+        for i in candidates[:cfg["max_blocks"]]:
+            if covered >= abs(gap):
+                break
+            result["actions"].append({"index": i, "action": action})
+            covered += blocks[i].get("predicted_seconds", 0) * factor
+        return result
+
+    def calibrate(self, project: Dict[str, Any], voice: Optional[str] = None, language: Optional[str] = None) -> int:
+        """Adds the synthesized blocks of a finished project to the fit; returns the samples used.
+
+        A project is only counted once, so re-running audio steps does not skew the fit.
+        """
+        key = voice_key(voice, language)
+        samples = [
+            (spoken_words(b.get("audio_text", "")), float(b["duration_seconds"]))
+            for b in project.get("script", [])
+            if b.get("audio_file") and b.get("duration_seconds")
+        ]
+        samples = [(x, y) for x, y in samples if x]
+        with self._lock:
+            data = self._load()
+            if not samples or project.get("id") in data["projects"]:
+                return 0
+            intercept, slope = self._fit(key)
+            for x, y in samples:
+                metrics.observe("duration", key, "abs_error_seconds", abs(intercept + slope * x - y))
+            s = data["voices"].setdefault(key, {"n": 0, "sx": 0.0, "sy": 0.0, "sxx": 0.0, "sxy": 0.0})
+            for x, y in samples:
+                s["n"] += 1
+                s["sx"] += x
+                s["sy"] += y
+                s["sxx"] += x * x
+                s["sxy"] += x * y
+            data["projects"].append(project.get("id"))
+            del data["projects"][:-_config()["max_projects"]]
+            self._save()
+        return len(samples)
+
+duration_model = DurationModel(DURATION_FILE)
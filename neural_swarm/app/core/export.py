@@ -0,0 +1,148 @@
+import io
+import json
+import time
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .render import build_timeline
+from .storage import ensure_local
+from .metrics import metrics
+
+READ_CHUNK_BYTES = 1 << 20
+# Longest subtitle cue; longer sentences are cut at a comma or space
+SRT_MAX_CHARS = 84
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable stream: ZipFile writes into it and the generator drains it.
+
+    Because it cannot seek, ZipFile streams every entry with a data descriptor
+    instead of going back to patch sizes, so only the bytes of the current
+    write are ever held in memory.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _srt_time(seconds: float) -> str:
+    ms = int(round(seconds * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+def to_srt(project: Dict[str, Any], timeline: Optional[Dict[str, Any]] = None) -> str:
+    """SRT subtitles: each block's narration split into short cues over the block's audio span.
+
+    The span of a block comes from the timeline (master track index or block
+    durations); inside it, cue time is shared out in proportion to characters.
+    """
+    from .audio import split_sentences
+    timeline = timeline or build_timeline(project)
+    script = project.get("script") or []
+    cues: List[Tuple[float, float, str]] = []
+    for event in timeline["events"]:
+        text = script[event["index"]].get("audio_text", "")
+        start, end = event["start_seconds"], event["audio_end_seconds"]
+        parts = split_sentences(text, SRT_MAX_CHARS)
+        total = sum(len(p) for p in parts)
+        if not parts or end <= start:
+            continue
+        cursor = start
+        for part in parts:
+            length = (end - start) * len(part) / total
+            cues.append((cursor, cursor + length, part))
+            cursor += length
+    return "\n".join(f"{i}\n{_srt_time(a)} --> {_srt_time(b)}\n{text}\n" for i, (a, b, text) in enumerate(cues, 1))
+
+def to_text(project: Dict[str, Any]) -> str:
+    """Plain-text script: title, then every block with its section and visual prompt."""
+    title = (project.get("metadata") or {}).get("title") or project.get("topic", "")
+    lines = [title, "=" * len(title), ""]
+    for i, block in enumerate(project.get("script") or []):
+        lines.append(f"[{i + 1:02d}] {block.get('section', '')}")
+        lines.append(block.get("audio_text", ""))
+        if block.get("visual_prompt"):
+            lines.append(f"(Visual: {block['visual_prompt']})")
+        lines.append("")
+    return "\n".join(lines)
+
+def seo_package(project: Dict[str, Any]) -> Dict[str, Any]:
+    metadata = project.get("metadata") or {}
+    package = {k: v for k, v in metadata.items() if k != "thumbnail_file"}
+    if project.get("seo_package"):
+        package["seo_package"] = project["seo_package"]
+    return package
+
+def package_entries(project: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """What goes into the export, in archive order: {"name", "text"} or {"name", "kind", "file"}."""
+    timeline = build_timeline(project)
+    entries: List[Dict[str, Any]] = [
+        {"name": "script/script.txt", "text": to_text(project)},
+        {"name": "script/script.srt", "text": to_srt(project, timeline)},
+        {"name": "script/script.json", "text": json.dumps(project.get("script") or [], indent=2, ensure_ascii=False)},
+        {"name": "seo/seo.json", "text": json.dumps(seo_package(project), indent=2, ensure_ascii=False)},
+    ]
+    for i, block in enumerate(project.get("script") or []):
+        # Numbered by block so the editor's file browser lists them in script order
+        if block.get("audio_file"):
+            entries.append({"name": f"audio/{i + 1:02d}_{block['audio_file']}", "kind": "audio", "file": block["audio_file"]})
+        for n, image in enumerate(f for f in block.get("generated_images") or [] if f):
+            entries.append({"name": f"images/{i + 1:02d}_{n + 1}_{image}", "kind": "images", "file": image})
+    master = (project.get("master_audio") or {}).get("file")
+    if master:
+        entries.append({"name": f"audio/{master}", "kind": "audio", "file": master})
+    thumbnail = (project.get("metadata") or {}).get("thumbnail_file")
+    if thumbnail:
+        entries.append({"name": f"thumbnail/{thumbnail}", "kind": "images", "file": thumbnail})
+    return entries
+
+def stream_package(project: Dict[str, Any]) -> Iterator[bytes]:
+    """ZIP of a project's production package, generated while it is sent.
+
+    Files are read in 1 MB chunks and every chunk is yielded as soon as it is
+    written, so memory stays flat whatever the project size and the first
+    bytes go out before any media is read. Only text entries are deflated.
+    Assets missing from local disk are
+    fetched from the storage backend; ones that cannot be found are listed in
+    MISSING.txt at the end of the archive. Blocking: iterate it in a worker
+    (StreamingResponse does this for sync iterators).
+    """
+    started = time.perf_counter()
+    sink = _ChunkSink()
+    missing: List[str] = []
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        for entry in package_entries(project):
+            if "text" in entry:
+                archive.writestr(entry["name"], entry["text"])
+                yield sink.drain()
+                continue
+            path = ensure_local(entry["kind"], entry["file"])
+            if not path:
+                missing.append(entry["name"])
+                continue
+            # Media is stored as-is: PNG/MP4 are already compressed and PCM barely deflates,
+            # so compressing would only make the export CPU-bound
+            info = zipfile.ZipInfo(entry["name"], time.localtime(time.time())[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            with open(path, "rb") as src, archive.open(info, "w", force_zip64=True) as dest:
+                for chunk in iter(lambda: src.read(READ_CHUNK_BYTES), b""):
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            yield sink.drain()
+        if missing:
+            archive.writestr("MISSING.txt", "\n".join(missing) + "\n")
+    yield sink.drain()
+    metrics.incr("export", "zip", "bytes", sink.position)
+    metrics.observe("export", "zip", "seconds", time.perf_counter() - started)
@@ -1,44 +1,186 @@
 import json
 import os
-from typing import Dict, Any, Optional
+import time
+import hashlib
+from string import Formatter
+from typing import Dict, Any, Optional, FrozenSet, List, Tuple
 from .settings import settings_manager
-from .config import BASE_DIR
+from .persistence import file_writer, json_bytes
+
+# Placeholders each agent passes to get_prompt. Templates are validated against
+# these sets when a language is loaded, so a bad edit is caught before a run.
+PROMPT_CONTEXTS: Dict[str, FrozenSet[str]] = {
+    "TrendHunter": frozenset({"niche", "date"}),
+    "TrendHunter.delta_prompt": frozenset({"since", "known_topics"}),
+    "CompetitorAnalyst": frozenset({"niche", "date"}),
+    "CompetitorAnalyst.delta_prompt": frozenset({"since", "known_competitors"}),
+    "AudienceProfiler": frozenset({"niche", "topics"}),
+    "ProjectManager": frozenset({"opportunities", "audience_profile"}),
+    "DeepResearcher": frozenset({"topic", "angle"}),
+    "DeepResearcher.delta_prompt": frozenset({"known_research"}),
+    "InvestigativeJournalist": frozenset({"topic"}),
+    "FactChecker": frozenset({"deep_research", "human_stories"}),
+    "ScriptArchitect": frozenset({"title", "angle", "technique", "target_length", "tone", "audience_psychographics", "verified_research"}),
+    "LeadWriter": frozenset({"script_outline", "verified_research", "tone", "speak_to"}),
+    "HookMaster": frozenset({"current_hook", "title", "fears"}),
+    "ComedySpecialist": frozenset({"script_text"}),
+    "ArtDirector": frozenset({"topic", "tone"}),
+    "PromptEngineer": frozenset({"art_style", "section", "visual_suggestion", "audio_text"}),
+    "ThumbnailStrategist": frozenset({"topic", "fears", "aesthetic"}),
+    "AudioDirector": frozenset({"script_text"}),
+    "SEOOptimizer": frozenset({"topic", "niche"}),
+    "SpecialistAuditor": frozenset({"agent_name", "focus_prompt", "topic", "niche", "script_text", "criteria_list"}),
+    "Editor.refine_prompt": frozenset({"text", "critique"}),
+    "Editor.expand_prompt": frozenset({"text", "context"}),
+    "Editor.shorten_prompt": frozenset({"text"}),
+    "Editor.visual_regen_prompt": frozenset({"text", "topic"}),
+}
+
+# Seconds between mtime checks of a language file (hot reload).
+RELOAD_CHECK_INTERVAL = 1.0
+
+class PromptContextError(KeyError):
+    """The context passed to get_prompt lacks placeholders the template needs."""
+
+class PromptTemplate:
+    """A prompt template parsed once into literal/field segments."""
+    __slots__ = ("text", "segments", "placeholders", "version", "simple")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.segments: List[Tuple[str, Optional[str], Optional[str], str]] = []
+        placeholders = set()
+        self.simple = True
+        for literal, field, spec, conversion in Formatter().parse(text):
+            self.segments.append((literal, field, conversion, spec or ""))
+            if field is not None:
+                root = field.split(".", 1)[0].split("[", 1)[0]
+                placeholders.add(root)
+                if root != field or not field:
+                    self.simple = False
+        self.placeholders: FrozenSet[str] = frozenset(placeholders)
+        self.version = hashlib.sha1(text.encode("utf-8")).hexdigest()[:10]
+
+    def render(self, context: Dict[str, Any]) -> str:
+        missing = self.placeholders - context.keys()
+        if missing:
+            raise PromptContextError(f"Missing prompt placeholders: {', '.join(sorted(missing))}")
+        if not self.simple:
+            return self.text.format(**context)
+        parts = []
+        for literal, field, conversion, spec in self.segments:
+            parts.append(literal)
+            if field is None:
+                continue
+            value = context[field]
+            if conversion == "r":
+                value = repr(value)
+            elif conversion == "a":
+                value = ascii(value)
+            parts.append(format(value, spec) if spec or not isinstance(value, str) else value)
+        return "".join(parts)
+
+class _LanguageBundle:
+    """Loaded state of one language file."""
+    def __init__(self, data: Dict[str, Any], mtime: float):
+        self.data = data
+        self.mtime = mtime
+        self.checked_at = time.monotonic()
+        self.flat: Dict[str, str] = {}
+        self._flatten(data, "")
+        self.templates: Dict[str, PromptTemplate] = {}
+        self.errors: Dict[str, str] = {}
+        self._compile()
+
+    def _flatten(self, node: Any, prefix: str):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                self._flatten(value, f"{prefix}.{key}" if prefix else key)
+        elif prefix:
+            self.flat[prefix] = str(node)
+
+    def _compile(self):
+        for agent_id, entry in self.data.get("agents", {}).items():
+            if not isinstance(entry, dict):
+                continue
+            for key, text in entry.items():
+                if key == "name" or not isinstance(text, str):
+                    continue
+                prompt_id = agent_id if key == "prompt" else f"{agent_id}.{key}"
+                try:
+                    tmpl = PromptTemplate(text)
+                except ValueError as e:
+                    self.errors[prompt_id] = f"unparseable template: {e}"
+                    continue
+                expected = PROMPT_CONTEXTS.get(prompt_id)
+                unknown = tmpl.placeholders - expected if expected is not None else set()
+                if unknown:
+                    self.errors[prompt_id] = f"unknown placeholders: {', '.join(sorted(unknown))}"
+                    continue
+                self.templates[prompt_id] = tmpl
 
 class I18nManager:
-    """Manages translations and localized prompts."""
-    
+    """Manages translations and localized prompts.
+
+    Languages are loaded lazily on first use, their prompt templates are
+    compiled and validated once, and files are re-read when their mtime changes.
+    """
+
     def __init__(self, i18n_dir: str):
         self.i18n_dir = i18n_dir
         self.translations: Dict[str, Dict[str, Any]] = {}
-        self._load_available()
-
-    def _load_available(self):
+        self._bundles: Dict[str, _LanguageBundle] = {}
+        self._missing: Dict[str, float] = {}
         os.makedirs(self.i18n_dir, exist_ok=True)
-        for filename in os.listdir(self.i18n_dir):
-            if filename.endswith(".json"):
-                lang = filename[:-5]
-                try:
-                    with open(os.path.join(self.i18n_dir, filename), 'r', encoding='utf-8') as f:
-                        self.translations[lang] = json.load(f)
-                except Exception:
-                    pass
-        
         # Ensure at least 'es' exists with defaults if empty
-        if 'es' not in self.translations:
-            self.translations['es'] = self.get_defaults('es')
-            self.save_translation('es', self.translations['es'])
+        if not os.path.exists(self._path('es')):
+            self.save_translation('es', self.get_defaults('es'))
+
+    def _path(self, lang: str) -> str:
+        return os.path.join(self.i18n_dir, f"{lang}.json")
+
+    def _read(self, lang: str) -> Optional[_LanguageBundle]:
+        filepath = self._path(lang)
+        try:
+            mtime = os.path.getmtime(filepath)
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return None
+        bundle = _LanguageBundle(data, mtime)
+        for prompt_id, error in bundle.errors.items():
+            print(f"⚠️ i18n[{lang}] prompt '{prompt_id}' ignored: {error}")
+        return bundle
+
+    def _bundle(self, lang: str) -> Optional[_LanguageBundle]:
+        bundle = self._bundles.get(lang)
+        now = time.monotonic()
+        if bundle is None and now - self._missing.get(lang, -RELOAD_CHECK_INTERVAL) < RELOAD_CHECK_INTERVAL:
+            return None
+        if bundle is not None:
+            if now - bundle.checked_at < RELOAD_CHECK_INTERVAL:
+                return bundle
+            bundle.checked_at = now
+            try:
+                if os.path.getmtime(self._path(lang)) == bundle.mtime:
+                    return bundle
+            except OSError:
+                return bundle
+        fresh = self._read(lang)
+        if fresh is None:
+            if bundle is None and lang == 'es':
+                fresh = _LanguageBundle(self.get_defaults('es'), 0.0)
+            else:
+                if bundle is None:
+                    self._missing[lang] = now
+                return bundle
+        self._bundles[lang] = fresh
+        self.translations[lang] = fresh.data
+        return fresh
 
     def load_language(self, lang: str):
         """Ensures a language is available in the translations cache."""
-        filepath = os.path.join(self.i18n_dir, f"{lang}.json")
-        if os.path.exists(filepath):
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    self.translations[lang] = json.load(f)
-            except Exception:
-                pass
-        elif lang == 'es':
-            self.translations['es'] = self.get_defaults('es')
+        self._bundle(lang)
 
     def get_defaults(self, lang: str) -> Dict[str, Any]:
         # This will be populated with all UI and Prompt strings
@@ -61,34 +203,68 @@ class I18nManager:
             }
         }
 
+    def _resolve(self, lang: Optional[str]) -> Optional[_LanguageBundle]:
+        lang = lang or settings_manager.get("language", "es")
+        return self._bundle(lang) or self._bundle('es')
+
     def t(self, path: str, lang: Optional[str] = None) -> str:
         """Translates a string based on a dot-separated path."""
-        lang = lang or settings_manager.get("language", "es")
-        data = self.translations.get(lang, self.translations.get('es', {}))
-        
-        parts = path.split('.')
-        for part in parts:
-            if isinstance(data, dict):
-                data = data.get(part, path)
-            else:
+        bundle = self._resolve(lang)
+        if bundle is None:
+            return path
+        if path in bundle.flat:
+            return bundle.flat[path]
+        # Non-leaf paths (whole sections) are rare; walk them the slow way
+        data: Any = bundle.data
+        for part in path.split('.'):
+            if not isinstance(data, dict) or part not in data:
                 return path
+            data = data[part]
         return str(data)
 
+    def get_template(self, agent_id: str, lang: Optional[str] = None) -> PromptTemplate:
+        """Compiled template for an agent prompt, falling back to Spanish."""
+        bundle = self._resolve(lang)
+        tmpl = bundle.templates.get(agent_id) if bundle else None
+        if tmpl is None:
+            fallback = self._bundle('es')
+            tmpl = fallback.templates.get(agent_id) if fallback else None
+        if tmpl is None:
+            raise PromptContextError(f"No valid prompt template for '{agent_id}'")
+        return tmpl
+
+    def prompt_version(self, agent_id: str, lang: Optional[str] = None) -> str:
+        """Short content hash of the active template; use it in cache keys and metrics."""
+        return self.get_template(agent_id, lang).version
+
     def get_prompt(self, agent_id: str, context: Dict[str, Any] = None, lang: str = None) -> str:
-        prompt_tmpl = self.t(f"agents.{agent_id}.prompt", lang)
-        if context:
-            try:
-                return prompt_tmpl.format(**context)
-            except Exception:
-                return prompt_tmpl
-        return prompt_tmpl
+        tmpl = self.get_template(agent_id, lang)
+        if context is None:
+            return tmpl.text
+        return tmpl.render(context)
 
     def save_translation(self, lang: str, data: Dict[str, Any]):
+        bundle = _LanguageBundle(data, 0.0)
+        if bundle.errors:
+            raise ValueError("; ".join(f"{k}: {v}" for k, v in bundle.errors.items()))
+        filepath = self._path(lang)
+        # Waits for the write: the bundle's mtime must be the file's new one
+        file_writer.write_sync(filepath, json_bytes(data))
+        bundle.mtime = os.path.getmtime(filepath)
+        self._bundles[lang] = bundle
         self.translations[lang] = data
-        filepath = os.path.join(self.i18n_dir, f"{lang}.json")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+
+class LocalizedText:
+    """Class attribute resolved through i18n on every access (follows hot reloads).
+
+    Instances may still assign their own value, e.g. `self.name = ...`.
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    def __get__(self, obj, objtype=None) -> str:
+        return i18n.t(self.path)
 
 # Singleton instance
-I18N_DIR = os.path.join(BASE_DIR, "neural_swarm", "app", "i18n")
+I18N_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "i18n")
 i18n = I18nManager(I18N_DIR)
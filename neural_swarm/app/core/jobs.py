@@ -0,0 +1,163 @@
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from .settings import settings_manager
+from .metrics import metrics
+from .websocket import manager
+from .scheduler import priority
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+def _config() -> Dict[str, Any]:
+    cfg = settings_manager.get("jobs", {}) or {}
+    return {
+        "max_concurrent": max(1, int(cfg.get("max_concurrent", 2))),
+        "keep_minutes": cfg.get("keep_minutes", 60),
+        "max_kept": cfg.get("max_kept", 200),
+        "priority": cfg.get("priority", "pipeline"),
+    }
+
+class JobConflict(Exception):
+    """The same kind of job is already active for this target, with different parameters."""
+    def __init__(self, job: "Job"):
+        super().__init__(f"A {job.kind} job for this project is already {job.status}")
+        self.job = job
+
+def params_digest(params: Any) -> str:
+    return hashlib.sha1(json.dumps(params, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()[:12]
+
+class Job:
+    """A long-running operation on a project, run off the request (regen images, auto-fix, audit panel)."""
+
+    def __init__(self, kind: str, project_id: str, target: str = "", params: Any = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.project_id = project_id
+        self.target = target
+        self.params = params_digest(params)
+        self.status = QUEUED
+        self.progress: Dict[str, Any] = {"done": 0, "total": 0, "message": ""}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self, result: bool = True) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "kind": self.kind,
+            "project_id": self.project_id,
+            "target": self.target,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if result:
+            data["result"] = self.result
+        return data
+
+    async def update(self, done: Optional[int] = None, total: Optional[int] = None, message: str = ""):
+        """Records progress and streams it to the websocket clients."""
+        if done is not None:
+            self.progress["done"] = done
+        if total is not None:
+            self.progress["total"] = total
+        if message:
+            self.progress["message"] = message
+        await manager.broadcast(message or f"{self.kind}: {self.progress['done']}/{self.progress['total']}",
+                                "job_progress", self.to_dict(result=False))
+
+class JobManager:
+    """Runs jobs in the background, at most `jobs.max_concurrent` at a time.
+
+    `submit()` returns at once with a queued job; the endpoint hands its id
+    to the client, which follows `job_progress` / `job_done` / `job_failed`
+    on the websocket and fetches the result from `/api/jobs/{id}`. Submitting
+    a kind that is already queued or running for the same project and target
+    (e.g. a block) returns that job when `params` (what the job was asked to
+    do, e.g. the auto-fix instruction) match, and raises JobConflict when
+    they differ, rather than dropping the new request.
+    Finished jobs are kept for `keep_minutes` (at most `max_kept`), in memory.
+    """
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._limit = 0
+
+    def _slots(self) -> asyncio.Semaphore:
+        limit = _config()["max_concurrent"]
+        if self._semaphore is None or limit != self._limit:
+            # A new limit applies to jobs submitted from now on
+            self._semaphore, self._limit = asyncio.Semaphore(limit), limit
+        return self._semaphore
+
+    def _prune(self):
+        cfg = _config()
+        cutoff = time.time() - cfg["keep_minutes"] * 60
+        finished = [j for j in self._jobs.values() if j.status in FINISHED]
+        for i, job in enumerate(finished):
+            if job.finished < cutoff or len(finished) - i > cfg["max_kept"]:
+                del self._jobs[job.id]
+
+    def submit(self, kind: str, project_id: str, fn: Callable[[Job], Awaitable[Any]], target: str = "",
+               params: Any = None) -> Job:
+        for job in self._jobs.values():
+            if (job.kind, job.project_id, job.target) == (kind, project_id, target) and job.status not in FINISHED:
+                if job.params != params_digest(params):
+                    raise JobConflict(job)
+                return job
+        self._prune()
+        job = Job(kind, project_id, target, params)
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, fn, self._slots()))
+        metrics.incr("jobs", kind, "submitted")
+        return job
+
+    async def _run(self, job: Job, fn: Callable[[Job], Awaitable[Any]], slots: asyncio.Semaphore):
+        try:
+            async with slots:
+                job.status = RUNNING
+                job.started = time.time()
+                metrics.observe("jobs", job.kind, "queue_seconds", job.started - job.created)
+                await job.update(message=f"▶️ {job.kind} iniciado")
+                with priority(_config()["priority"]):
+                    job.result = await fn(job)
+            job.status = SUCCEEDED
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+        job.finished = time.time()
+        metrics.incr("jobs", job.kind, job.status)
+        if job.started:
+            metrics.observe("jobs", job.kind, "run_seconds", job.finished - job.started)
+        if job.status == SUCCEEDED:
+            await manager.broadcast(f"✅ {job.kind} completado", "job_done", job.to_dict(result=False))
+        else:
+            await manager.broadcast(f"⚠️ {job.kind} {job.status}: {job.error or ''}", "job_failed", job.to_dict(result=False))
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self, project_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [j.to_dict(result=False) for j in reversed(self._jobs.values()) if project_id in (None, j.project_id)]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job and job.status not in FINISHED and job.task:
+            job.task.cancel()
+        return job
+
+job_manager = JobManager()
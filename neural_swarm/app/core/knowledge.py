@@ -0,0 +1,204 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .constants import KNOWLEDGE_DIR
+from .settings import settings_manager
+from .metrics import metrics
+from .persistence import file_writer, json_bytes
+
+# Research text is stored in chunks of about this many characters
+CHUNK_CHARS = 1200
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+def _config() -> Dict[str, Any]:
+    cfg = settings_manager.get("knowledge_base", {}) or {}
+    return {
+        "enabled": cfg.get("enabled", True),
+        "trends_reuse_hours": cfg.get("trends_reuse_hours", 12),
+        "trends_days": cfg.get("trends_days", 7),
+        "competitors_days": cfg.get("competitors_days", 14),
+        "research_days": cfg.get("research_days", 60),
+        "research_chunks": cfg.get("research_chunks", 6),
+        "max_entries": cfg.get("max_entries", 30),
+        "max_items": cfg.get("max_items", 25),
+    }
+
+def fold_text(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+def tokens(text: str) -> set:
+    return {w for w in WORD_RE.findall(fold_text(text)) if len(w) > 3}
+
+def niche_slug(niche: str) -> str:
+    base = re.sub(r"[^a-z0-9]+", "-", fold_text(niche)).strip("-")[:40] or "niche"
+    return f"{base}-{hashlib.sha1(fold_text(niche).strip().encode('utf-8')).hexdigest()[:8]}"
+
+def chunk_text(text: str, size: int = CHUNK_CHARS) -> List[str]:
+    """Splits research text on paragraph boundaries into chunks of about `size` chars."""
+    chunks, current = [], ""
+    for para in re.split(r"\n\s*\n", text or ""):
+        para = para.strip()
+        if not para:
+            continue
+        if current and len(current) + len(para) > size:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{para}" if current else para
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _parse_date(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return datetime.min
+
+class NicheKnowledge:
+    """What earlier runs learned about one niche: dated trend lists, competitor
+    analyses and verified research chunks with their grounding sources."""
+
+    def __init__(self, niche: str, data: Optional[Dict[str, Any]] = None):
+        self.niche = niche
+        data = data or {}
+        self.trends: List[Dict[str, Any]] = data.get("trends", [])
+        self.competitors: List[Dict[str, Any]] = data.get("competitors", [])
+        self.research: List[Dict[str, Any]] = data.get("research", [])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"niche": self.niche, "trends": self.trends, "competitors": self.competitors, "research": self.research}
+
+    @staticmethod
+    def _fresh(entries: List[Dict[str, Any]], max_age: timedelta) -> List[Dict[str, Any]]:
+        cutoff = datetime.now() - max_age
+        return [e for e in entries if _parse_date(e.get("date")) >= cutoff]
+
+    def _latest(self, entries: List[Dict[str, Any]], max_age: timedelta) -> Optional[Dict[str, Any]]:
+        fresh = self._fresh(entries, max_age)
+        return fresh[-1] if fresh else None
+
+    def reusable_trends(self) -> Optional[Dict[str, Any]]:
+        """Trend list recent enough to use as is (no model call)."""
+        return self._latest(self.trends, timedelta(hours=_config()["trends_reuse_hours"]))
+
+    def latest_trends(self) -> Optional[Dict[str, Any]]:
+        """Trend list recent enough to ask the model only for what is new since."""
+        return self._latest(self.trends, timedelta(days=_config()["trends_days"]))
+
+    def reusable_competitors(self) -> Optional[Dict[str, Any]]:
+        return self._latest(self.competitors, timedelta(days=_config()["competitors_days"]))
+
+    def latest_competitors(self) -> Optional[Dict[str, Any]]:
+        return self.competitors[-1] if self.competitors else None
+
+    def relevant_research(self, query: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Fresh research chunks ranked by word overlap with `query` (topic + angle)."""
+        cfg = _config()
+        wanted = tokens(query)
+        if not wanted:
+            return []
+        scored = []
+        for chunk in self._fresh(self.research, timedelta(days=cfg["research_days"])):
+            words = tokens(chunk.get("topic", "") + " " + chunk.get("text", ""))
+            score = len(wanted & words) / len(wanted)
+            if score >= 0.3:
+                scored.append((score, chunk))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [chunk for _, chunk in scored[:limit or cfg["research_chunks"]]]
+
+    @staticmethod
+    def _merge(items: List[Dict[str, Any]], previous: Optional[Dict[str, Any]], field: str,
+               key: Callable[[Dict[str, Any]], Any], max_age: timedelta) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        """`items` plus the items of `previous` they do not repeat, with when each was last seen.
+
+        Carried-over items expire once unseen for `max_age`, and the list is capped at
+        `max_items`, so a niche scanned every day does not grow its list forever.
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        seen = {str(key(item)): now for item in items}
+        merged = list(items)
+        if previous:
+            # Entries saved before `seen` existed date every item by the entry
+            known = previous.get("seen", {})
+            cutoff = datetime.now() - max_age
+            for item in previous.get(field, []):
+                k = str(key(item))
+                when = known.get(k, previous.get("date"))
+                if k in seen or _parse_date(when) < cutoff:
+                    continue
+                seen[k] = when
+                merged.append(item)
+        merged = merged[:_config()["max_items"]]
+        return merged, {k: seen[k] for k in (str(key(item)) for item in merged)}
+
+    def merge_trends(self, opportunities: List[Dict[str, Any]], previous: Optional[Dict[str, Any]]):
+        return self._merge(opportunities, previous, "opportunities", lambda o: o.get("topic", "").lower(),
+                           timedelta(days=_config()["trends_days"]))
+
+    def merge_competitors(self, competitors: List[Dict[str, Any]], previous: Optional[Dict[str, Any]]):
+        return self._merge(competitors, previous, "competitors", lambda c: c.get("link"),
+                           timedelta(days=_config()["competitors_days"]))
+
+    def _append(self, entries: List[Dict[str, Any]], entry: Dict[str, Any]):
+        entries.append({"date": datetime.now().isoformat(timespec="seconds"), **entry})
+        del entries[:-_config()["max_entries"]]
+
+    def add_trends(self, opportunities: List[Dict[str, Any]], insights: str = "", seen: Optional[Dict[str, str]] = None):
+        self._append(self.trends, {"opportunities": opportunities, "trend_insights": insights, "seen": seen or {}})
+
+    def add_competitors(self, competitors: List[Dict[str, Any]], patterns: str = "", seen: Optional[Dict[str, str]] = None):
+        self._append(self.competitors, {"competitors": competitors, "niche_patterns": patterns, "seen": seen or {}})
+
+    def add_research(self, topic: str, text: str, sources: List[Dict[str, str]]):
+        known = {c.get("hash") for c in self.research}
+        sources = list({s.get("uri"): s for s in sources if s.get("uri")}.values())
+        for part in chunk_text(text):
+            digest = hashlib.sha1(fold_text(part).encode("utf-8")).hexdigest()[:16]
+            if digest in known:
+                continue
+            known.add(digest)
+            self._append(self.research, {"topic": topic, "text": part, "sources": sources, "hash": digest})
+        # Research is capped separately: it is the bulk of the file
+        del self.research[:-_config()["max_entries"] * 10]
+
+class KnowledgeBase:
+    """One JSON file per niche under studio_knowledge/."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _path(self, niche: str) -> str:
+        return os.path.join(self.directory, f"{niche_slug(niche)}.json")
+
+    def load(self, niche: str) -> NicheKnowledge:
+        """Stored knowledge of `niche` (empty when the knowledge base is disabled)."""
+        if not _config()["enabled"]:
+            return NicheKnowledge(niche)
+        data = file_writer.read(self._path(niche))
+        try:
+            return NicheKnowledge(niche, json.loads(data) if data else None)
+        except ValueError:
+            return NicheKnowledge(niche)
+
+    def update(self, niche: str, fn):
+        """Applies `fn(knowledge)` to the stored knowledge of `niche` and saves it."""
+        if not _config()["enabled"]:
+            return
+        with self._lock:
+            knowledge = self.load(niche)
+            fn(knowledge)
+            file_writer.write(self._path(niche), json_bytes(knowledge.to_dict(), indent=2))
+
+    def record(self, agent_id: str, outcome: str):
+        """Counts knowledge-base outcomes per agent: reused / delta / full."""
+        metrics.incr("knowledge", agent_id, outcome)
+
+knowledge_base = KnowledgeBase(KNOWLEDGE_DIR)
@@ -0,0 +1,75 @@
+"""Servidor stub local con la API `/v1/chat/completions` de OpenAI.
+
+Sirve para probar `OpenAICompatibleProvider` y el enrutado por agente sin un
+modelo real:
+
+    python -m neural_swarm.app.core.llm_stub --port 8089
+
+y en settings.json:
+
+    "providers": {"local": {"type": "openai", "base_url": "http://127.0.0.1:8089/v1", "model": "stub"}},
+    "routing": {"PromptEngineer": "local"}
+
+Las respuestas JSON son la instancia mínima válida del esquema recibido.
+"""
+import json
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+def example_from_schema(schema: Dict[str, Any]) -> Any:
+    kind = schema.get("type")
+    if kind == "object":
+        return {k: example_from_schema(v) for k, v in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [example_from_schema(schema.get("items", {})) for _ in range(max(1, schema.get("minItems", 1)))]
+    if kind in ("number", "integer"):
+        return schema.get("minimum", 7)
+    if kind == "boolean":
+        return True
+    return "stub"
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        fmt = body.get("response_format") or {}
+        if fmt.get("type") == "json_schema":
+            content = json.dumps(example_from_schema(fmt.get("json_schema", {}).get("schema", {})))
+        elif fmt.get("type") == "json_object":
+            content = "{}"
+        else:
+            prompt = body.get("messages", [{}])[-1].get("content", "")
+            content = f"[stub:{body.get('model', '')}] {prompt[:200]}"
+        payload = json.dumps({
+            "id": "stub",
+            "object": "chat.completion",
+            "model": body.get("model", ""),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_in_background(host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Arranca el stub en un hilo; `server.server_address` da el puerto asignado."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+    print(f"LLM stub escuchando en http://{args.host}:{args.port}/v1")
+    ThreadingHTTPServer((args.host, args.port), StubHandler).serve_forever()
@@ -0,0 +1,154 @@
+import os
+import json
+import asyncio
+import hashlib
+import functools
+import threading
+import multiprocessing
+import concurrent.futures
+from typing import Any, Dict, List, Optional, Tuple
+from .config import AUDIO_DIR, settings_manager
+from .metrics import metrics
+from .storage import ensure_local, publish
+from . import audio
+
+_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def process_pool() -> concurrent.futures.ProcessPoolExecutor:
+    """Worker processes for CPU-bound audio work (NumPy on raw PCM), created on first use."""
+    global _pool
+    with _pool_lock:
+        # A crashed worker breaks the whole pool; start a fresh one
+        if _pool is None or getattr(_pool, "_broken", False):
+            # spawn: forking a process that runs an event loop and worker threads is unsafe
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=max(1, (os.cpu_count() or 2) - 1),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+def processing_options() -> Optional[Dict[str, Any]]:
+    """Keyword arguments for audio.process_pcm from `audio_processing` in settings (None = disabled)."""
+    cfg = dict(settings_manager.get("audio_processing", {}) or {})
+    if not cfg.pop("enabled", True):
+        return None
+    allowed = ("target_dbfs", "silence_dbfs", "pad_ms", "peak_dbfs", "max_gain_db")
+    return {k: v for k, v in cfg.items() if k in allowed}
+
+async def process_pcm(pcm):
+    """Normalizes and trims PCM in the process pool; returns (pcm, stats), unchanged when disabled."""
+    options = processing_options()
+    if options is None:
+        return pcm, None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(process_pool(), functools.partial(audio.process_pcm, pcm, **options))
+
+async def process_project_audio(project: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalizes and trims every block WAV of a project in place, updating duration_seconds.
+
+    Returns {"enabled", "processed": [block indexes], "errors": [{"block", "file", "error"}]};
+    blocks without audio are neither processed nor errors.
+    """
+    report: Dict[str, Any] = {"enabled": True, "processed": [], "errors": []}
+    options = processing_options()
+    if options is None:
+        report["enabled"] = False
+        return report
+    loop = asyncio.get_running_loop()
+    jobs = []
+    for i, block in enumerate(project.get("script", [])):
+        filename = block.get("audio_file")
+        if not filename:
+            continue
+        path = await loop.run_in_executor(None, ensure_local, "audio", filename)
+        if not path:
+            report["errors"].append({"block": i, "file": filename, "error": "audio file not found"})
+            continue
+        jobs.append((i, block, loop.run_in_executor(process_pool(), audio.process_wav_file, path, options)))
+    results = await asyncio.gather(*(job for _, _, job in jobs), return_exceptions=True)
+    for (i, block, _), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            report["errors"].append({"block": i, "file": block["audio_file"], "error": str(result) or type(result).__name__})
+            metrics.incr("audio_processing", "block", "errors")
+            continue
+        block["duration_seconds"] = result.pop("duration_seconds")
+        block["audio_processing"] = result
+        if block.get("audio_chunks") and all("start_seconds" in c for c in block["audio_chunks"]):
+            # Reprocessing trims again: chunk spans move with the audio
+            spans = audio.shift_spans([(c.get("start_seconds", 0.0), c.get("duration_seconds", 0.0)) for c in block["audio_chunks"]],
+                                      audio.duration(result.get("leading_trim_samples", 0)), block["duration_seconds"])
+            block["audio_chunks"] = [dict(c, start_seconds=s, duration_seconds=d) for c, (s, d) in zip(block["audio_chunks"], spans)]
+        # Processed in place: the backend copy is replaced
+        await loop.run_in_executor(None, publish, "audio", block["audio_file"])
+        report["processed"].append(i)
+    report["errors"].sort(key=lambda e: e["block"])
+    return report
+
+_hash_lock = threading.Lock()
+# path -> ((size, mtime_ns), sha1): unchanged files are not re-read
+_hash_cache: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+def audio_hash(path: str) -> str:
+    stat = os.stat(path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        cached = _hash_cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    digest = audio.file_hash(path)
+    with _hash_lock:
+        _hash_cache[path] = (key, digest)
+    return digest
+
+def build_master_track(project: Dict[str, Any], force: bool = False) -> Optional[Dict[str, Any]]:
+    """Assembles the block WAVs of a compiled project into `{id}_master.wav`.
+
+    Blocks are joined in script order with `master_audio.gap_ms` of silence
+    (a block's own `gap_after_ms` wins). The result, stored in
+    `project["master_audio"]`, holds the timing index (start/end of every
+    block) and the audio hashes it was built from, so calling this again is a
+    no-op until a block's audio or a gap changes. Blocking: run it in a worker.
+    """
+    cfg = settings_manager.get("master_audio", {}) or {}
+    default_gap = cfg.get("gap_ms", 400)
+    entries = []
+    for index, block in enumerate(project.get("script", [])):
+        filename = block.get("audio_file")
+        path = ensure_local("audio", filename) if filename else None
+        if path:
+            entries.append((index, block, filename, path))
+    if not entries:
+        return project.get("master_audio")
+
+    hashes = [audio_hash(path) for _, _, _, path in entries]
+    gaps = [block.get("gap_after_ms", default_gap) for _, block, _, _ in entries]
+    signature = hashlib.sha1(json.dumps([hashes, gaps]).encode("utf-8")).hexdigest()
+    filename = f"{project['id']}_master.wav"
+    out_path = os.path.join(AUDIO_DIR, filename)
+    current = project.get("master_audio") or {}
+    if not force and current.get("signature") == signature and ensure_local("audio", filename):
+        metrics.incr("master_audio", "builds", "skipped")
+        return current
+
+    offsets = audio.assemble([path for _, _, _, path in entries], out_path, gaps)
+    publish("audio", filename)
+    metrics.incr("master_audio", "builds", "built")
+    project["master_audio"] = {
+        "file": filename,
+        "signature": signature,
+        "duration_seconds": offsets[-1][1],
+        "blocks": [
+            {
+                "index": index,
+                "section": block.get("section", ""),
+                "audio_file": block_file,
+                "hash": digest,
+                "gap_after_ms": gap,
+                "start_seconds": round(start, 3),
+                "end_seconds": round(end, 3),
+            }
+            for (index, block, block_file, _), digest, gap, (start, end) in zip(entries, hashes, gaps, offsets)
+        ],
+    }
+    return project["master_audio"]
@@ -0,0 +1,43 @@
+import threading
+from collections import defaultdict
+from typing import Any, Dict
+
+class Metrics:
+    """Contadores y tiempos en memoria, agrupados por sección (p.ej. 'cascade')."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, Dict[str, float]]] = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
+        self._timings: Dict[str, Dict[str, Dict[str, list]]] = defaultdict(lambda: defaultdict(dict))
+
+    def incr(self, section: str, key: str, field: str, amount: float = 1):
+        with self._lock:
+            self._counters[section][key][field] += amount
+
+    def observe(self, section: str, key: str, field: str, value: float):
+        """Registra una muestra: se expone count/avg/max."""
+        with self._lock:
+            stats = self._timings[section][key].setdefault(field, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += value
+            stats[2] = max(stats[2], value)
+
+    def average(self, section: str, key: str, field: str) -> float:
+        with self._lock:
+            stats = self._timings[section][key].get(field)
+            return stats[1] / stats[0] if stats else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {}
+            for section, keys in self._counters.items():
+                for key, fields in keys.items():
+                    out.setdefault(section, {}).setdefault(key, {}).update({f: round(v, 3) for f, v in fields.items()})
+            for section, keys in self._timings.items():
+                for key, fields in keys.items():
+                    entry = out.setdefault(section, {}).setdefault(key, {})
+                    for f, (count, total, peak) in fields.items():
+                        entry[f] = {"count": count, "avg": round(total / count, 3), "max": round(peak, 3)}
+            return out
+
+metrics = Metrics()
@@ -0,0 +1,114 @@
+import copy
+from typing import Any, Dict, List, Tuple
+
+class PatchError(ValueError):
+    """An operation of a patch is malformed or does not apply to the document."""
+
+def parse_pointer(path: str) -> List[str]:
+    """JSON Pointer (RFC 6901) -> list of unescaped tokens."""
+    if path == "":
+        return []
+    if not path.startswith("/"):
+        raise PatchError(f"Invalid path {path!r}: must start with '/'")
+    return [t.replace("~1", "/").replace("~0", "~") for t in path[1:].split("/")]
+
+def _index(container: list, token: str, allow_end: bool = False) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise PatchError(f"Invalid list index {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f"List index {index} out of range")
+    return index
+
+def _parent(doc: Any, tokens: List[str]) -> Tuple[Any, str]:
+    if not tokens:
+        raise PatchError("The document root cannot be changed")
+    node = doc
+    for token in tokens[:-1]:
+        if isinstance(node, dict):
+            if token not in node:
+                raise PatchError(f"Path segment {token!r} not found")
+            node = node[token]
+        elif isinstance(node, list):
+            node = node[_index(node, token)]
+        else:
+            raise PatchError(f"Cannot descend into {type(node).__name__} at {token!r}")
+    return node, tokens[-1]
+
+def get_path(doc: Any, path: str) -> Any:
+    node = doc
+    for token in parse_pointer(path):
+        if isinstance(node, dict) and token in node:
+            node = node[token]
+        elif isinstance(node, list):
+            node = node[_index(node, token)]
+        else:
+            raise PatchError(f"Path {path!r} not found")
+    return node
+
+def _apply_one(doc: Any, op: Dict[str, Any]) -> str:
+    """Applies one operation; returns its path with a trailing "-" resolved to the index added."""
+    kind, path = op.get("op"), op.get("path")
+    if not isinstance(path, str):
+        raise PatchError("Every operation needs a string 'path'")
+    if kind in ("add", "replace", "test") and "value" not in op:
+        raise PatchError(f"'{kind}' needs a 'value'")
+    if kind == "test":
+        if get_path(doc, path) != op["value"]:
+            raise PatchError(f"Test failed at {path!r}")
+        return path
+    parent, token = _parent(doc, parse_pointer(path))
+    if not isinstance(parent, (dict, list)):
+        raise PatchError(f"Cannot change {path!r}: its parent is a {type(parent).__name__}")
+    if kind == "add":
+        if isinstance(parent, list):
+            index = _index(parent, token, allow_end=True)
+            parent.insert(index, op["value"])
+            if token == "-":
+                path = f"{path[:-1]}{index}"
+        else:
+            parent[token] = op["value"]
+    elif kind == "replace":
+        if isinstance(parent, list):
+            parent[_index(parent, token)] = op["value"]
+        elif token in parent:
+            parent[token] = op["value"]
+        else:
+            raise PatchError(f"Path {path!r} not found")
+    elif kind == "remove":
+        if isinstance(parent, list):
+            del parent[_index(parent, token)]
+        elif token in parent:
+            del parent[token]
+        else:
+            raise PatchError(f"Path {path!r} not found")
+    else:
+        raise PatchError(f"Unsupported op {kind!r} (add, remove, replace, test)")
+    return path
+
+def apply_patch(doc: Dict[str, Any], ops: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Applies JSON Patch (RFC 6902) add/remove/replace/test operations all-or-nothing.
+
+    Returns the patched copy of `doc` and the changed fragments: the new value
+    at every touched path ({"path", "value"}, or {"path", "removed": True}).
+    `doc` itself is never modified.
+    """
+    if not isinstance(ops, list):
+        raise PatchError("The patch must be a list of operations")
+    patched = copy.deepcopy(doc)
+    touched: List[str] = []
+    for op in ops:
+        if not isinstance(op, dict):
+            raise PatchError("Every operation must be an object")
+        path = _apply_one(patched, op)
+        if op.get("op") != "test" and path not in touched:
+            touched.append(path)
+    changed = []
+    for path in touched:
+        try:
+            changed.append({"path": path, "value": get_path(patched, path)})
+        except PatchError:
+            changed.append({"path": path, "removed": True})
+    return patched, changed
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import atexit
+import asyncio
+import hashlib
+import threading
+import concurrent.futures
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from .metrics import metrics
+
+# A burst of writes to the same file within this window ends up as one disk write
+COALESCE_SECONDS = 0.05
+UPLOAD_CHUNK_BYTES = 1 << 20
+
+def atomic_write(path: str, data: bytes):
+    """Writes `data` to a temp file next to `path`, fsyncs it and renames it over `path`.
+
+    A crash leaves either the old or the new file, never a truncated one.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(directory)
+
+def _fsync_dir(directory: str):
+    # Makes the rename itself durable; not supported on every platform
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def json_bytes(data: Any, indent: int = 4) -> bytes:
+    return json.dumps(data, indent=indent, ensure_ascii=False).encode("utf-8")
+
+class FileWriter:
+    """Single writer thread for the state files (DB, settings, translations, project blobs).
+
+    `write()` returns at once: the bytes are queued and written atomically by
+    the writer thread. Writes to a file that is still queued replace the queued
+    bytes, so bursts coalesce into one write. `read()` returns queued bytes
+    before the file, so a load right after a save never sees stale data.
+    """
+
+    def __init__(self, coalesce_seconds: float = COALESCE_SECONDS):
+        self.coalesce_seconds = coalesce_seconds
+        self._cond = threading.Condition()
+        # path -> (bytes, first queued at, futures waiting for it)
+        self._pending: Dict[str, Tuple[Optional[bytes], float, List[concurrent.futures.Future]]] = {}
+        self._writing: Dict[str, Optional[bytes]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="file-writer", daemon=True)
+            self._thread.start()
+
+    def write(self, path: str, data: Optional[bytes], coalesce: bool = True) -> concurrent.futures.Future:
+        """Queues `data` for `path`; the future resolves when it (or a newer version) is on disk.
+
+        `data=None` queues a deletion, which coalesces with queued writes like any other version.
+        `coalesce=False` skips the coalescing window, for callers that wait on the future.
+        """
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._cond:
+            if path in self._pending:
+                _, queued_at, futures = self._pending[path]
+                futures.append(future)
+                self._pending[path] = (data, queued_at if coalesce else queued_at - self.coalesce_seconds, futures)
+                metrics.incr("persistence", "writes", "coalesced")
+            else:
+                queued_at = time.monotonic() - (0 if coalesce else self.coalesce_seconds)
+                self._pending[path] = (data, queued_at, [future])
+            self._ensure_thread()
+            self._cond.notify()
+        return future
+
+    def delete(self, path: str) -> concurrent.futures.Future:
+        return self.write(path, None)
+
+    def write_sync(self, path: str, data: bytes, timeout: Optional[float] = None):
+        """write() and wait for it (for callers that need the file on disk, e.g. to read its mtime)."""
+        self.write(path, data).result(timeout)
+
+    async def write_async(self, path: str, data: bytes):
+        await asyncio.wrap_future(self.write(path, data))
+
+    def read(self, path: str) -> Optional[bytes]:
+        """Latest content of `path`: queued bytes first, then the file; None when neither exists."""
+        with self._cond:
+            # A queued deletion reads as None, like a missing file
+            if path in self._pending:
+                return self._pending[path][0]
+            if path in self._writing:
+                return self._writing[path]
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def flush(self, timeout: Optional[float] = None):
+        """Waits until everything queued so far is on disk."""
+        with self._cond:
+            futures = [f for _, _, fs in self._pending.values() for f in fs]
+        concurrent.futures.wait(futures, timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                path, (data, queued_at, futures) = min(self._pending.items(), key=lambda item: item[1][1])
+                wait = queued_at + self.coalesce_seconds - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                del self._pending[path]
+                self._writing[path] = data
+            started = time.perf_counter()
+            try:
+                if data is None:
+                    if os.path.exists(path):
+                        os.remove(path)
+                else:
+                    atomic_write(path, data)
+                error = None
+            except Exception as e:
+                error = e
+                # Fire-and-forget writers never look at the future: the failure must at least be visible
+                metrics.incr("persistence", "writes", "errors")
+                print(f"⚠️ Escritura de {path} fallida: {e}")
+            with self._cond:
+                if path in self._writing and self._writing[path] is data:
+                    del self._writing[path]
+            metrics.observe("persistence", "writes", "seconds", time.perf_counter() - started)
+            metrics.incr("persistence", "writes", "bytes", len(data or b""))
+            for future in futures:
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+
+file_writer = FileWriter()
+atexit.register(file_writer.flush, 10)
+
+class UploadTooLarge(ValueError):
+    """The upload exceeded the configured size limit."""
+
+async def stream_to_file(chunks: AsyncIterator[bytes], path: str, max_bytes: int) -> Dict[str, Any]:
+    """Streams chunks to `path` off the event loop, hashing on the fly.
+
+    The data goes to a temp file that is fsynced and renamed into place only
+    when complete, so a failed or oversized upload never leaves a partial file.
+    Returns {"size", "sha256"}; raises UploadTooLarge past `max_bytes`.
+    """
+    loop = asyncio.get_running_loop()
+    digest = hashlib.sha256()
+    size = 0
+    tmp = f"{path}.part"
+    f = await loop.run_in_executor(None, open, tmp, "wb")
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes // (1 << 20)} MB")
+            digest.update(chunk)
+            await loop.run_in_executor(None, f.write, chunk)
+        await loop.run_in_executor(None, lambda: (f.flush(), os.fsync(f.fileno())))
+        await loop.run_in_executor(None, f.close)
+        await loop.run_in_executor(None, os.replace, tmp, path)
+    except BaseException:
+        f.close()
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    metrics.incr("persistence", "uploads", "bytes", size)
+    return {"size": size, "sha256": digest.hexdigest()}
+
+async def upload_chunks(upload, chunk_size: int = UPLOAD_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """Async chunks of a Starlette UploadFile."""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,208 @@
+import json
+import urllib.request
+import urllib.error
+from typing import Any, Dict, List, Optional, Tuple
+from .settings import settings_manager
+from .utils import clean_and_parse_json
+from .cascade import get_policy, run_cascade
+from .breaker import call_with_breaker
+
+class ProviderError(Exception):
+    """Error devuelto por un backend LLM que no es Gemini."""
+
+class GroundedText(str):
+    """Texto de una llamada con grounding; `sources` lista las webs citadas ({"title", "uri"})."""
+    sources: List[Dict[str, str]]
+
+    def __new__(cls, text: str, sources: Optional[List[Dict[str, str]]] = None):
+        obj = super().__new__(cls, text or "")
+        obj.sources = sources or []
+        return obj
+
+def _grounding_sources(response: Any) -> List[Dict[str, str]]:
+    sources, seen = [], set()
+    for candidate in getattr(response, "candidates", None) or []:
+        meta = getattr(candidate, "grounding_metadata", None)
+        for chunk in getattr(meta, "grounding_chunks", None) or []:
+            web = getattr(chunk, "web", None)
+            uri = getattr(web, "uri", None)
+            if uri and uri not in seen:
+                seen.add(uri)
+                sources.append({"title": getattr(web, "title", "") or "", "uri": uri})
+    return sources
+
+class LLMProvider:
+    """Interfaz común de generación de texto/JSON para los agentes."""
+    name: str = "base"
+    supports_grounding: bool = False
+    supports_image: bool = False
+    supports_audio: bool = False
+    supports_json_schema: bool = False
+
+    def generate_text(self, model: str, prompt: str, grounded: bool = False) -> str:
+        raise NotImplementedError
+
+    def generate_json(self, model: str, prompt: str, schema: Optional[Dict[str, Any]] = None) -> Any:
+        raise NotImplementedError
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+    supports_grounding = True
+    supports_image = True
+    supports_audio = True
+    supports_json_schema = True
+
+    def generate_text(self, model: str, prompt: str, grounded: bool = False) -> str:
+        from google.genai import types
+        from .ai import client
+        if not grounded:
+            return client.models.generate_content(model=model, contents=prompt).text
+        config = types.GenerateContentConfig(tools=[types.Tool(google_search=types.GoogleSearch())])
+        res = client.models.generate_content(model=model, contents=prompt, config=config)
+        return GroundedText(res.text, _grounding_sources(res))
+
+    def generate_json(self, model: str, prompt: str, schema: Optional[Dict[str, Any]] = None) -> Any:
+        from google.genai import types
+        from .ai import client
+        config = types.GenerateContentConfig(response_mime_type="application/json")
+        if schema is not None:
+            config.response_json_schema = schema
+        res = client.models.generate_content(model=model, contents=prompt, config=config)
+        return clean_and_parse_json(res.text, schema)
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Backend HTTP para servidores con API `/v1/chat/completions` (vLLM, llama.cpp, Ollama...)."""
+    name = "openai"
+    supports_json_schema = True
+
+    def __init__(self, base_url: str, api_key: str = "", default_model: str = "", timeout: float = 120, json_schema: bool = True):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.default_model = default_model
+        self.timeout = timeout
+        self.supports_json_schema = json_schema
+
+    def _chat(self, model: str, prompt: str, response_format: Optional[Dict[str, Any]] = None) -> str:
+        from .ai import is_rate_limit_error
+        return call_with_breaker(
+            model or self.default_model,
+            lambda m: self._post(m, prompt, response_format),
+            is_failure=lambda e: not is_rate_limit_error(e)
+        )
+
+    def _post(self, model: str, prompt: str, response_format: Optional[Dict[str, Any]] = None) -> str:
+        body = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+        if response_format:
+            body["response_format"] = response_format
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        req = urllib.request.Request(
+            f"{self.base_url}/chat/completions",
+            data=json.dumps(body).encode("utf-8"),
+            headers=headers,
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                data = json.loads(resp.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            # Keep the status code in the message so retry_with_backoff can spot 429s
+            raise ProviderError(f"{e.code} {e.reason}: {e.read()[:300].decode('utf-8', 'replace')}")
+        try:
+            return data["choices"][0]["message"]["content"] or ""
+        except (KeyError, IndexError, TypeError):
+            raise ProviderError(f"Respuesta inesperada del proveedor: {str(data)[:300]}")
+
+    def generate_text(self, model: str, prompt: str, grounded: bool = False) -> str:
+        # Grounding is not available here; callers check supports_grounding first
+        return self._chat(model, prompt)
+
+    def generate_json(self, model: str, prompt: str, schema: Optional[Dict[str, Any]] = None) -> Any:
+        if schema is not None and self.supports_json_schema:
+            response_format = {"type": "json_schema", "json_schema": {"name": "output", "schema": schema}}
+        else:
+            response_format = {"type": "json_object"}
+        return clean_and_parse_json(self._chat(model, prompt, response_format), schema)
+
+PROVIDER_TYPES = {
+    "gemini": lambda cfg: GeminiProvider(),
+    "openai": lambda cfg: OpenAICompatibleProvider(
+        base_url=cfg.get("base_url", "http://localhost:8000/v1"),
+        api_key=cfg.get("api_key", ""),
+        default_model=cfg.get("model", ""),
+        timeout=cfg.get("timeout", 120),
+        json_schema=cfg.get("json_schema", True)
+    ),
+}
+
+_gemini = GeminiProvider()
+_provider_cache: Dict[str, Tuple[str, LLMProvider]] = {}
+
+def get_provider(provider_name: str) -> LLMProvider:
+    """Instancia (cacheada por configuración) del proveedor definido en settings `providers`."""
+    if provider_name == "gemini":
+        return _gemini
+    cfg = settings_manager.get("providers", {}).get(provider_name)
+    if not cfg:
+        print(f"⚠️ Proveedor '{provider_name}' no configurado. Usando Gemini.")
+        return _gemini
+    signature = json.dumps(cfg, sort_keys=True)
+    cached = _provider_cache.get(provider_name)
+    if cached and cached[0] == signature:
+        return cached[1]
+    factory = PROVIDER_TYPES.get(cfg.get("type", "openai"))
+    if factory is None:
+        print(f"⚠️ Tipo de proveedor desconocido: {cfg.get('type')}. Usando Gemini.")
+        return _gemini
+    provider = factory(cfg)
+    _provider_cache[provider_name] = (signature, provider)
+    return provider
+
+def resolve_route(agent_id: str, default_model: str) -> Tuple[LLMProvider, str]:
+    """Proveedor y modelo para un agente según `routing` en settings.
+
+    `routing` mapea ids de agente (o `Editor.shorten_prompt` para una sola tarea)
+    a un nombre de proveedor o a {"provider": ..., "model": ...}.
+    """
+    routing = settings_manager.get("routing", {})
+    route = routing.get(agent_id)
+    if route is None and "." in agent_id:
+        route = routing.get(agent_id.split(".", 1)[0])
+    if route is None:
+        return _gemini, default_model
+    if isinstance(route, str):
+        route = {"provider": route}
+    provider = get_provider(route.get("provider", "gemini"))
+    model = route.get("model") or (default_model if provider is _gemini else getattr(provider, "default_model", "") or default_model)
+    return provider, model
+
+def _tiers(agent_id: str, provider: LLMProvider, model: str, policy: Dict[str, Any]) -> List[Tuple[LLMProvider, str]]:
+    tiers = []
+    for entry in policy["models"]:
+        if isinstance(entry, str):
+            tiers.append((provider, entry))
+        else:
+            tiers.append((get_provider(entry.get("provider", "gemini")), entry.get("model", model)))
+    tiers.append((provider, model))
+    return tiers
+
+def generate_text(agent_id: str, prompt: str, model: str, grounded: bool = False) -> str:
+    provider, model_id = resolve_route(agent_id, model)
+    if grounded and not provider.supports_grounding:
+        provider, model_id = _gemini, model
+    policy = get_policy(agent_id)
+    if policy is None:
+        return provider.generate_text(model_id, prompt, grounded=grounded)
+    tiers = [(p, m) for p, m in _tiers(agent_id, provider, model_id, policy) if not grounded or p.supports_grounding]
+    return run_cascade(agent_id, policy, tiers, lambda p, m: p.generate_text(m, prompt, grounded=grounded))
+
+def generate_json(agent_id: str, prompt: str, model: str, schema: Optional[Dict[str, Any]] = None) -> Any:
+    provider, model_id = resolve_route(agent_id, model)
+    policy = get_policy(agent_id)
+    if policy is None:
+        return provider.generate_json(model_id, prompt, schema)
+    return run_cascade(agent_id, policy, _tiers(agent_id, provider, model_id, policy), lambda p, m: p.generate_json(m, prompt, schema))
@@ -0,0 +1,208 @@
+import os
+import shutil
+import asyncio
+import tempfile
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List, Optional
+from .config import AUDIO_DIR, IMAGE_DIR, VIDEO_DIR, settings_manager
+from .storage import ensure_local, publish
+from .utils import run_blocking
+
+def _config() -> Dict[str, Any]:
+    cfg = settings_manager.get("render", {}) or {}
+    return {
+        "fps": cfg.get("fps", 30),
+        "width": cfg.get("width", 1280),
+        "height": cfg.get("height", 720),
+        "gap_ms": cfg.get("gap_ms", (settings_manager.get("master_audio", {}) or {}).get("gap_ms", 400)),
+        "workers": cfg.get("workers") or max(1, (os.cpu_count() or 2) // 2),
+        "crf": cfg.get("crf", 28),
+    }
+
+def build_timeline(project: Dict[str, Any]) -> Dict[str, Any]:
+    """Edit decision list of a compiled project: one event per block with its image and audio.
+
+    Offsets come from the master track timing index when there is one (so the
+    timeline lines up with `<id>_master.wav`); otherwise they are accumulated
+    from `duration_seconds` plus the configured gap. An event lasts until the
+    next one starts, so its image covers the gap after the block.
+    """
+    cfg = _config()
+    master = {b["index"]: b for b in (project.get("master_audio") or {}).get("blocks", [])}
+    events: List[Dict[str, Any]] = []
+    cursor = 0.0
+    for index, block in enumerate(project.get("script", [])):
+        timing = master.get(index)
+        if timing:
+            start, audio_end = timing["start_seconds"], timing["end_seconds"]
+        else:
+            start = cursor
+            audio_end = start + float(block.get("duration_seconds") or 0)
+        images = block.get("generated_images") or []
+        events.append({
+            "index": index,
+            "section": block.get("section", f"BLOQUE_{index + 1}"),
+            "image": images[0] if images else None,
+            "audio_file": block.get("audio_file") or None,
+            "start_seconds": round(start, 3),
+            "audio_end_seconds": round(audio_end, 3),
+        })
+        cursor = audio_end + block.get("gap_after_ms", cfg["gap_ms"]) / 1000
+    for event, following in zip(events, events[1:] + [None]):
+        end = following["start_seconds"] if following else event["audio_end_seconds"]
+        event["end_seconds"] = round(max(end, event["audio_end_seconds"]), 3)
+        event["duration_seconds"] = round(event["end_seconds"] - event["start_seconds"], 3)
+    return {
+        "project_id": project.get("id"),
+        "title": (project.get("metadata") or {}).get("title") or project.get("topic", ""),
+        "fps": cfg["fps"],
+        "duration_seconds": events[-1]["end_seconds"] if events else 0.0,
+        "master_audio": (project.get("master_audio") or {}).get("file"),
+        "events": events,
+    }
+
+def _frames(seconds: float, fps: int) -> int:
+    return int(round(seconds * fps))
+
+def _timecode(seconds: float, fps: int) -> str:
+    frames = _frames(seconds, fps)
+    return f"{frames // (3600 * fps):02d}:{frames // (60 * fps) % 60:02d}:{frames // fps % 60:02d}:{frames % fps:02d}"
+
+def to_edl(timeline: Dict[str, Any]) -> str:
+    """CMX 3600 EDL: a video event per block image and an audio event per block WAV."""
+    fps = timeline["fps"]
+    title = (timeline["title"] or timeline["project_id"] or "Neural Swarm")[:70]
+    lines = [f"TITLE: {title}", "FCM: NON-DROP FRAME", ""]
+    number = 0
+    for event in timeline["events"]:
+        start, end = event["start_seconds"], event["end_seconds"]
+        clips = [("V", event["image"], end - start)]
+        if event["audio_file"]:
+            clips.append(("A", event["audio_file"], event["audio_end_seconds"] - start))
+        for track, clip, length in clips:
+            number += 1
+            reel = f"B{event['index'] + 1:03d}" if clip else "BL"
+            lines.append(
+                f"{number:03d}  {reel:<8} {track:<5} C        "
+                f"{_timecode(0, fps)} {_timecode(length, fps)} {_timecode(start, fps)} {_timecode(start + length, fps)}"
+            )
+            if clip:
+                lines.append(f"* FROM CLIP NAME: {clip}")
+            lines.append(f"* COMMENT: {event['section']}")
+        lines.append("")
+    return "\n".join(lines)
+
+def to_fcpxml(timeline: Dict[str, Any]) -> str:
+    """FCPXML 1.9 with one spine: block images as video clips, block audio attached to each."""
+    fps = timeline["fps"]
+    cfg = _config()
+
+    def t(seconds: float) -> str:
+        return f"{_frames(seconds, fps)}/{fps}s"
+
+    root = ET.Element("fcpxml", version="1.9")
+    resources = ET.SubElement(root, "resources")
+    ET.SubElement(resources, "format", id="r0", name=f"FFVideoFormat{cfg['height']}p{fps}",
+                  frameDuration=f"1/{fps}s", width=str(cfg["width"]), height=str(cfg["height"]))
+    assets: Dict[str, str] = {}
+
+    def asset(name: str, folder: str, has_video: bool) -> str:
+        if name not in assets:
+            assets[name] = f"r{len(assets) + 1}"
+            node = ET.SubElement(resources, "asset", id=assets[name], name=name, start="0s",
+                                 hasVideo="1" if has_video else "0", hasAudio="0" if has_video else "1")
+            ET.SubElement(node, "media-rep", kind="original-media", src=f"file://{os.path.join(folder, name)}")
+        return assets[name]
+
+    library = ET.SubElement(root, "library")
+    event_node = ET.SubElement(library, "event", name="Neural Swarm")
+    project_node = ET.SubElement(event_node, "project", name=timeline["title"] or str(timeline["project_id"]))
+    sequence = ET.SubElement(project_node, "sequence", format="r0", duration=t(timeline["duration_seconds"]), tcStart="0s")
+    spine = ET.SubElement(sequence, "spine")
+    for event in timeline["events"]:
+        length = t(event["duration_seconds"])
+        if event["image"]:
+            clip = ET.SubElement(spine, "video", name=event["section"], ref=asset(event["image"], IMAGE_DIR, True),
+                                 offset=t(event["start_seconds"]), start="0s", duration=length)
+        else:
+            clip = ET.SubElement(spine, "gap", name=event["section"], offset=t(event["start_seconds"]), start="0s", duration=length)
+        if event["audio_file"]:
+            ET.SubElement(clip, "asset-clip", name=event["audio_file"], ref=asset(event["audio_file"], AUDIO_DIR, False),
+                          lane="-1", offset="0s", start="0s", duration=t(event["audio_end_seconds"] - event["start_seconds"]))
+    ET.indent(root)
+    return '<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE fcpxml>\n' + ET.tostring(root, encoding="unicode")
+
+class RenderError(Exception):
+    """ffmpeg is missing or failed while rendering the draft video."""
+
+async def _ffmpeg(args: List[str]):
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y", *args,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        _, stderr = await proc.communicate()
+    except asyncio.CancelledError:
+        proc.kill()
+        raise
+    if proc.returncode != 0:
+        raise RenderError(stderr.decode("utf-8", "replace")[-500:])
+
+def _segment_args(event: Dict[str, Any], out_path: str, cfg: Dict[str, Any]) -> List[str]:
+    fps, w, h = cfg["fps"], cfg["width"], cfg["height"]
+    image = os.path.join(IMAGE_DIR, event["image"]) if event["image"] else None
+    wav = os.path.join(AUDIO_DIR, event["audio_file"]) if event["audio_file"] else None
+    args = ["-loop", "1", "-framerate", str(fps), "-i", image] if image and os.path.exists(image) else \
+        ["-f", "lavfi", "-i", f"color=c=black:s={w}x{h}:r={fps}"]
+    args += ["-i", wav] if wav and os.path.exists(wav) else ["-f", "lavfi", "-i", "anullsrc=r=48000:cl=stereo"]
+    # Identical codec parameters in every segment are what lets the concat step copy streams
+    return args + [
+        "-t", f"{event['duration_seconds']:.3f}",
+        "-vf", f"scale={w}:{h}:force_original_aspect_ratio=decrease,pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,format=yuv420p",
+        "-r", str(fps), "-c:v", "libx264", "-preset", "veryfast", "-tune", "stillimage", "-crf", str(cfg["crf"]),
+        "-af", "apad", "-c:a", "aac", "-ar", "48000", "-ac", "2", "-b:a", "128k",
+        out_path
+    ]
+
+def _localize(events: List[Dict[str, Any]]):
+    for event in events:
+        if event["image"]:
+            ensure_local("images", event["image"])
+        if event["audio_file"]:
+            ensure_local("audio", event["audio_file"])
+
+async def render_draft(project: Dict[str, Any], timeline: Optional[Dict[str, Any]] = None) -> str:
+    """Slideshow MP4 of the project: one ffmpeg process per block segment, `render.workers`
+    at a time, then the segments are concatenated with stream copy (no re-encode)."""
+    if shutil.which("ffmpeg") is None:
+        raise RenderError("ffmpeg is not installed")
+    cfg = _config()
+    timeline = timeline or build_timeline(project)
+    events = [e for e in timeline["events"] if e["duration_seconds"] > 0]
+    if not events:
+        raise RenderError("Project has no timed blocks to render")
+    # Media published by another worker is fetched into the local directories first
+    await run_blocking(_localize, events)
+    # Own segment directory per render, so two renders never share or delete each other's files
+    os.makedirs(VIDEO_DIR, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix=f"{project['id']}_segments_", dir=VIDEO_DIR)
+    semaphore = asyncio.Semaphore(cfg["workers"])
+
+    async def _segment(event):
+        path = os.path.join(work_dir, f"{event['index']:04d}.mp4")
+        async with semaphore:
+            await _ffmpeg(_segment_args(event, path, cfg))
+        return path
+
+    try:
+        segments = await asyncio.gather(*[_segment(e) for e in events])
+        list_path = os.path.join(work_dir, "segments.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            f.writelines(f"file '{path}'\n" for path in segments)
+        filename = f"{project['id']}_draft.mp4"
+        await _ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", "-movflags", "+faststart",
+                       os.path.join(VIDEO_DIR, filename)])
+        await run_blocking(publish, "video", filename)
+        return filename
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
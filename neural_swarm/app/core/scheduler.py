@@ -0,0 +1,213 @@
+import time
+import asyncio
+import threading
+import contextlib
+import contextvars
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+from .settings import settings_manager
+from .metrics import metrics
+
+INTERACTIVE, PIPELINE, BATCH = "interactive", "pipeline", "batch"
+# Highest priority first: a freed slot goes to the first class with someone waiting
+PRIORITY_CLASSES = (INTERACTIVE, PIPELINE, BATCH)
+WAIT_WINDOW = 500
+
+# Class of the model calls made in the current context (endpoints set it; pipelines inherit the default)
+call_priority: contextvars.ContextVar[str] = contextvars.ContextVar("call_priority", default=PIPELINE)
+
+@contextlib.contextmanager
+def priority(cls: str) -> Iterator[None]:
+    """Model calls made inside the block (and in tasks it spawns) are scheduled as `cls`."""
+    if cls not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority class {cls!r} ({', '.join(PRIORITY_CLASSES)})")
+    token = call_priority.set(cls)
+    try:
+        yield
+    finally:
+        call_priority.reset(token)
+
+def _config() -> Dict[str, Any]:
+    cfg = settings_manager.get("scheduling", {}) or {}
+    total = max(1, int(cfg.get("max_concurrent", 8)))
+    reserved = min(total - 1, max(0, int(cfg.get("reserved_interactive", 2))))
+    shared = total - reserved
+    return {
+        "enabled": cfg.get("enabled", True),
+        "abandoned_max": max(0, int(cfg.get("abandoned_max", 4))),
+        "limits": {
+            INTERACTIVE: total,
+            PIPELINE: shared,
+            BATCH: max(1, min(shared, int(cfg.get("batch_max", shared)))),
+        },
+    }
+
+class Slot:
+    """A granted slot. `abandon()` moves it out of its class while its thread still runs."""
+    __slots__ = ("cls", "released", "abandoned")
+
+    def __init__(self, cls: str):
+        self.cls = cls
+        self.released = False
+        self.abandoned = False
+
+class _Waiter:
+    __slots__ = ("loop", "future", "granted", "cancelled")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+        self.cancelled = False
+
+class CallScheduler:
+    """Concurrency slots for model calls, handed out by priority class.
+
+    `max_concurrent` calls run at once across the process. Pipeline and batch
+    calls together never use the last `reserved_interactive` slots, so an
+    editor request finds a free slot even while several productions run;
+    batch is further capped at `batch_max`. When a slot frees, it goes to
+    the oldest waiter of the highest class (interactive, pipeline, batch).
+    A call whose caller gave up on it (deadline passed, hedge lost) cannot be
+    killed, so its thread keeps running until the HTTP timeout at worst.
+    `abandon()` moves it out of its class into a separate bucket of at most
+    `abandoned_max` calls, so a few hung calls cannot starve a class. Past
+    that cap an abandoned call keeps its slot until its thread finishes,
+    which bounds how many threads pile up behind hung calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._abandoned = 0
+        self._running: Dict[str, int] = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._waiting: Dict[str, Deque[_Waiter]] = {cls: deque() for cls in PRIORITY_CLASSES}
+        self._waits: Dict[str, Deque[float]] = {cls: deque(maxlen=WAIT_WINDOW) for cls in PRIORITY_CLASSES}
+
+    def _can_run(self, cls: str, limits: Dict[str, int]) -> bool:
+        total = sum(self._running.values())
+        if total >= limits[INTERACTIVE]:
+            return False
+        if cls == INTERACTIVE:
+            return True
+        shared = self._running[PIPELINE] + self._running[BATCH]
+        if shared >= limits[PIPELINE]:
+            return False
+        return cls != BATCH or self._running[BATCH] < limits[BATCH]
+
+    def _dispatch(self, limits: Dict[str, int]):
+        """Grants free slots to waiters, highest class first. Called with the lock held."""
+        for cls in PRIORITY_CLASSES:
+            queue = self._waiting[cls]
+            while queue and self._can_run(cls, limits):
+                waiter = queue.popleft()
+                if waiter.cancelled:
+                    continue
+                waiter.granted = True
+                self._running[cls] += 1
+                waiter.loop.call_soon_threadsafe(_grant, waiter.future)
+
+    async def acquire(self, cls: Optional[str] = None) -> Optional[Slot]:
+        """Waits for a slot of `cls` (default: the context's class). Returns the slot to pass
+        to `submit()`, or None when scheduling is disabled. Bound the wait with asyncio.wait_for."""
+        cfg = _config()
+        if not cfg["enabled"]:
+            return None
+        cls = cls or call_priority.get()
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # Nobody jumps ahead of an older waiter of the same or a higher class
+            ahead = any(not w.cancelled for c in PRIORITY_CLASSES[:PRIORITY_CLASSES.index(cls) + 1] for w in self._waiting[c])
+            if not ahead and self._can_run(cls, cfg["limits"]):
+                self._running[cls] += 1
+                waiter = None
+            else:
+                waiter = _Waiter(loop)
+                self._waiting[cls].append(waiter)
+        if waiter is not None:
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                with self._lock:
+                    waiter.cancelled = True
+                    granted = waiter.granted
+                # The slot may have been granted right before the cancellation: hand it on
+                if granted:
+                    self.release(Slot(cls))
+                raise
+        wait = time.perf_counter() - started
+        with self._lock:
+            self._waits[cls].append(wait)
+        metrics.observe("scheduler", cls, "queue_wait_seconds", wait)
+        metrics.incr("scheduler", cls, "calls")
+        return Slot(cls)
+
+    def release(self, slot: Slot):
+        with self._lock:
+            if slot.released:
+                return
+            slot.released = True
+            if slot.abandoned:
+                self._abandoned -= 1
+            else:
+                self._running[slot.cls] -= 1
+            self._dispatch(_config()["limits"])
+
+    def abandon(self, slot: Optional[Slot]):
+        """The caller stopped waiting for this call: its class gets the slot back while the thread finishes."""
+        if slot is None:
+            return
+        cfg = _config()
+        with self._lock:
+            if slot.released or slot.abandoned:
+                return
+            if self._abandoned >= cfg["abandoned_max"]:
+                metrics.incr("scheduler", slot.cls, "abandoned_over_cap")
+                return
+            slot.abandoned = True
+            self._abandoned += 1
+            self._running[slot.cls] -= 1
+            self._dispatch(cfg["limits"])
+        metrics.incr("scheduler", slot.cls, "abandoned")
+
+    def submit(self, fn: Callable[[], Any], slot: Optional[Slot]) -> "asyncio.Future[Any]":
+        """Runs the blocking model call `fn` in the call pool on a slot from `acquire()`.
+
+        The slot is released when the thread finishes, not when the caller stops waiting.
+        """
+        from .utils import submit_blocking
+        try:
+            future = submit_blocking(fn)
+        except BaseException:
+            if slot is not None:
+                self.release(slot)
+            raise
+        if slot is not None:
+            future.add_done_callback(lambda _: self.release(slot))
+        return asyncio.wrap_future(future)
+
+    async def run(self, fn: Callable[[], Any], cls: Optional[str] = None) -> Any:
+        """`fn` in the call pool once a slot of `cls` (default: the context's class) is free."""
+        return await self.submit(fn, await self.acquire(cls))
+
+    def snapshot(self) -> Dict[str, Any]:
+        cfg = _config()
+        limits = cfg["limits"]
+        with self._lock:
+            out: Dict[str, Any] = {"abandoned": {"running": self._abandoned, "limit": cfg["abandoned_max"]}}
+            for cls in PRIORITY_CLASSES:
+                waits = sorted(self._waits[cls])
+                out[cls] = {
+                    "running": self._running[cls],
+                    "queued": sum(1 for w in self._waiting[cls] if not w.cancelled and not w.granted),
+                    "limit": limits[cls],
+                    "wait_p50_seconds": round(waits[len(waits) // 2], 3) if waits else 0.0,
+                    "wait_p95_seconds": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+                }
+            return out
+
+def _grant(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+call_scheduler = CallScheduler()
@@ -0,0 +1,125 @@
+from typing import Any, Dict, Optional
+
+# Esquemas de salida por agente (subset de JSON Schema aceptado por Gemini).
+# Los proveedores los envían al modelo y se validan de nuevo al parsear.
+
+def _obj(properties: Dict[str, Any], required=None) -> Dict[str, Any]:
+    return {"type": "object", "properties": properties, "required": list(required or [])}
+
+def _arr(items: Dict[str, Any], min_items: int = 0) -> Dict[str, Any]:
+    schema = {"type": "array", "items": items}
+    if min_items:
+        schema["minItems"] = min_items
+    return schema
+
+_STR = {"type": "string"}
+_NUM = {"type": "number"}
+_STR_LIST = _arr(_STR)
+
+_SCRIPT_BLOCK = _obj({
+    "block": {"type": "integer"},
+    "section": _STR,
+    "audio_text": _STR,
+    "word_count": {"type": "integer"},
+    "duration_seconds": _NUM,
+    "visual_suggestion": _STR
+}, required=["section", "audio_text"])
+
+SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "TrendHunter": _obj({
+        "opportunities": _arr(_obj({
+            "topic": _STR,
+            "angle": _STR,
+            "urgency": _STR,
+            "competition": _STR,
+            "traffic_potential": _NUM,
+            "reason": _STR,
+            "hook_idea": _STR
+        }, required=["topic", "angle"]), min_items=1),
+        "trend_insights": _STR
+    }, required=["opportunities"]),
+    "CompetitorAnalyst": _obj({
+        "competitors": _arr(_obj({
+            "title": _STR,
+            "link": _STR,
+            "views": _STR,
+            "published_date": _STR,
+            "winning_strategy": _STR,
+            "our_weakness": _STR
+        }, required=["title"])),
+        "niche_patterns": _STR
+    }, required=["competitors"]),
+    "AudienceProfiler": _obj({
+        "psychographics": _obj({
+            "primary_fears": _STR_LIST,
+            "deep_desires": _STR_LIST,
+            "common_objections": _STR_LIST
+        }),
+        "messaging_guide": _obj({
+            "speak_to": _STR,
+            "avoid_words": _STR_LIST
+        })
+    }, required=["psychographics", "messaging_guide"]),
+    "ProjectManager": _obj({
+        "selected_topic": _obj({"title": _STR, "angle": _STR, "hook": _STR}, required=["title"]),
+        "content_strategy": _obj({
+            "storytelling_technique": _STR,
+            "target_length_minutes": _NUM,
+            "tone": _STR
+        })
+    }, required=["selected_topic", "content_strategy"]),
+    "ScriptArchitect": _obj({
+        "outline": _arr(_obj({
+            "block_number": {"type": "integer"},
+            "section": _STR,
+            "content_brief": _STR,
+            "retention_trigger": _STR
+        }, required=["section"]), min_items=1)
+    }, required=["outline"]),
+    "LeadWriter": _obj({
+        "script": _arr(_SCRIPT_BLOCK, min_items=1),
+        "total_word_count": {"type": "integer"},
+        "estimated_duration_minutes": _NUM
+    }, required=["script"]),
+    "HookMaster": _obj({
+        "selected_hook": _obj({"text": _STR, "psychology": _STR}, required=["text"])
+    }, required=["selected_hook"]),
+    "ComedySpecialist": _obj({
+        "enhanced_script": _arr(_SCRIPT_BLOCK, min_items=1)
+    }, required=["enhanced_script"]),
+    "ArtDirector": _obj({
+        "visual_style": _obj({
+            "aesthetic": _STR,
+            "color_palette": _STR_LIST,
+            "lighting": _STR
+        }, required=["aesthetic"])
+    }, required=["visual_style"]),
+    "ThumbnailStrategist": _obj({
+        "concept": _STR,
+        "text_overlay": _STR,
+        "technical_prompt": _STR
+    }, required=["technical_prompt"]),
+    "AudioDirector": _obj({
+        "audio_notes": _arr(_obj({"block": {"type": "integer"}, "tone": _STR, "sfx": _STR})),
+        "global_notes": {"type": "object"}
+    }, required=["audio_notes"]),
+    "SEOOptimizer": _obj({
+        "titles": _obj({"primary": _STR, "alternatives": _STR_LIST}, required=["primary"]),
+        "description": _obj({"hook": _STR, "full_description": _STR}),
+        "tags": _STR_LIST
+    }, required=["titles", "description", "tags"]),
+    "SpecialistAuditor": _obj({
+        "criteria_scores": _arr(_obj({
+            "name": _STR,
+            "score": {"type": "number", "minimum": 0, "maximum": 10},
+            "comment": _STR
+        }, required=["name", "score"])),
+        "overall_score": {"type": "number", "minimum": 0, "maximum": 10},
+        "verdict": _STR,
+        "top_issues": _STR_LIST,
+        "quick_wins": _STR_LIST
+    }, required=["criteria_scores", "overall_score", "verdict"])
+}
+
+def get_schema(agent_id: str) -> Optional[Dict[str, Any]]:
+    return SCHEMAS.get(agent_id)
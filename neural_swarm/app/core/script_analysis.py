@@ -0,0 +1,149 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from .settings import settings_manager
+from .knowledge import WORD_RE, fold_text
+from .duration import duration_model, spoken_words
+
+_VOWEL_GROUP = re.compile(r"[aeiouáéíóúü]+")
+# Two of these next to each other are a hiatus (two syllables); an accented í/ú breaks a diphthong
+_HIATUS = set("aeoáéóíú")
+_SENTENCE = re.compile(r"[.!?…]+")
+_MARKUP = re.compile(r"\[[^\]]*\]|\*")
+
+def _config() -> Dict[str, Any]:
+    cfg = settings_manager.get("script_gate", {}) or {}
+    return {
+        "enabled": cfg.get("enabled", True),
+        "hopeless_score": cfg.get("hopeless_score", 3),
+        "strong_score": cfg.get("strong_score", 8.5),
+        "hook_words": cfg.get("hook_words", [15, 60]),
+        "min_readability": cfg.get("min_readability", 50),
+        "max_repetition": cfg.get("max_repetition", 0.12),
+        "duplicate_similarity": cfg.get("duplicate_similarity", 0.8),
+        "reduced_panel": cfg.get("reduced_panel", ["Director Creativo", "Experto YouTube", "Director Visual"]),
+    }
+
+def syllables(word: str) -> int:
+    """Spanish syllable count from vowel groups (diphthongs count once, hiatus twice)."""
+    count = 0
+    for group in _VOWEL_GROUP.findall(word.lower()):
+        count += 1 + sum(1 for a, b in zip(group, group[1:]) if a in _HIATUS and b in _HIATUS)
+    return max(1, count)
+
+def readability(text: str) -> Optional[float]:
+    """Fernández Huerta index (Flesch adapted to Spanish): 60-70 is standard prose, higher is easier."""
+    clean = _MARKUP.sub(" ", text or "")
+    words = WORD_RE.findall(clean)
+    words = [w for w in words if not w.isdigit()]
+    if not words:
+        return None
+    sentences = max(1, len([s for s in _SENTENCE.split(clean) if WORD_RE.search(s)]))
+    per_100 = 100 / len(words)
+    return round(206.84 - 0.60 * sum(syllables(w) for w in words) * per_100 - 1.02 * sentences * per_100, 1)
+
+def _shingles(text: str, n: int = 3) -> List[Tuple[str, ...]]:
+    words = WORD_RE.findall(fold_text(_MARKUP.sub(" ", text or "")))
+    return [tuple(words[i:i + n]) for i in range(len(words) - n + 1)]
+
+def repetition_ratio(texts: List[str]) -> float:
+    """Share of word trigrams in the script that already appeared earlier in it."""
+    grams = [g for t in texts for g in _shingles(t)]
+    return round(1 - len(set(grams)) / len(grams), 3) if grams else 0.0
+
+def duplicate_blocks(texts: List[str], threshold: float) -> List[Tuple[int, int]]:
+    """Pairs of non-empty blocks whose trigram sets overlap by at least `threshold` (Jaccard)."""
+    sets = [set(_shingles(t)) for t in texts]
+    pairs = []
+    for i in range(len(sets)):
+        for j in range(i + 1, len(sets)):
+            if sets[i] and sets[j] and len(sets[i] & sets[j]) / len(sets[i] | sets[j]) >= threshold:
+                pairs.append((i, j))
+    return pairs
+
+def analyze_script(blocks: List[Dict[str, Any]], total_seconds: float) -> Dict[str, Any]:
+    """Local quality report of a script, computed without any model call.
+
+    The 0-10 `score` starts at 10 and loses points for empty or duplicated
+    blocks, repetition, blocks far off their word budget, total length off
+    target, hard readability and a hook that is too short or too long.
+    `verdict` is "hopeless" (rewrite it), "strong" (a reduced panel is
+    enough) or "review" (full panel).
+    """
+    cfg = _config()
+    texts = [str(b.get("audio_text", "") or "") for b in blocks]
+    issues: List[str] = []
+    if not any(t.strip() for t in texts):
+        return {"score": 0.0, "verdict": "hopeless", "issues": ["El guion está vacío: no hay texto para locutar"],
+                "blocks": len(blocks)}
+
+    score = 10.0
+    empty = [i for i, t in enumerate(texts) if not t.strip()]
+    if empty:
+        score -= 3 * len(empty)
+        issues.append(f"Bloques vacíos: {', '.join(str(i + 1) for i in empty)}")
+    duplicates = duplicate_blocks(texts, cfg["duplicate_similarity"])
+    if duplicates:
+        score -= 3 * len(duplicates)
+        issues.append("Bloques duplicados: " + ", ".join(f"{i + 1} y {j + 1}" for i, j in duplicates))
+
+    repetition = repetition_ratio(texts)
+    if repetition > cfg["max_repetition"]:
+        score -= min(3.0, (repetition - cfg["max_repetition"]) * 20)
+        issues.append(f"Texto repetitivo: {repetition:.0%} de las frases de tres palabras se repiten")
+
+    words = [spoken_words(t) for t in texts]
+    targets = duration_model.block_targets([b.get("section", "") for b in blocks], total_seconds)
+    # The hook is judged by its own length range below
+    off_target = [i for i, (w, t) in enumerate(zip(words, targets)) if i and w and abs(w - t) / t > 0.5]
+    if off_target:
+        score -= 2 * len(off_target) / len(blocks)
+        issues.append("Bloques lejos de su longitud objetivo: " + ", ".join(
+            f"{i + 1} ({words[i]}/{targets[i]} palabras)" for i in off_target[:5]))
+    predicted = sum(duration_model.predict(t) for t in texts)
+    deviation = abs(predicted - total_seconds) / total_seconds if total_seconds else 0.0
+    tolerance = (settings_manager.get("duration", {}) or {}).get("tolerance", 0.15)
+    if deviation > tolerance:
+        score -= min(3.0, 10 * (deviation - tolerance))
+        issues.append(f"Duración prevista {predicted / 60:.1f} min frente a {total_seconds / 60:.1f} min objetivo")
+
+    reading_ease = readability(" ".join(texts))
+    if reading_ease is not None and reading_ease < cfg["min_readability"]:
+        score -= min(2.0, (cfg["min_readability"] - reading_ease) / 10)
+        issues.append(f"Lectura difícil para locución (índice Fernández Huerta {reading_ease:.0f})")
+
+    hook_words = words[0]
+    low, high = cfg["hook_words"]
+    if not low <= hook_words <= high:
+        score -= 1
+        issues.append(f"Hook de {hook_words} palabras (recomendado {low}-{high})")
+
+    score = round(max(0.0, score), 1)
+    broken = len(empty) + len(duplicates) >= max(1, len(blocks) / 2)
+    if broken or score <= cfg["hopeless_score"]:
+        verdict = "hopeless"
+    elif score >= cfg["strong_score"]:
+        verdict = "strong"
+    else:
+        verdict = "review"
+    return {
+        "score": score,
+        "verdict": verdict,
+        "issues": issues,
+        "blocks": len(blocks),
+        "word_counts": words,
+        "target_words": targets,
+        "repetition_ratio": repetition,
+        "readability": reading_ease,
+        "hook_words": hook_words,
+        "predicted_seconds": round(predicted, 1),
+        "target_seconds": round(total_seconds, 1),
+    }
+
+def panel_plan(analysis: Dict[str, Any]) -> Tuple[str, Optional[List[str]]]:
+    """Which audit panel a script gets after the local analysis: ("skipped" | "reduced" | "full", auditor names)."""
+    cfg = _config()
+    if not cfg["enabled"] or analysis["verdict"] == "review":
+        return "full", None
+    if analysis["verdict"] == "hopeless":
+        return "skipped", None
+    return "reduced", cfg["reduced_panel"]
@@ -1,6 +1,7 @@
 import json
 import os
 from typing import Dict, Any
+from .persistence import file_writer, json_bytes
 
 class SettingsManager:
     """Manages application settings and persistence."""
@@ -21,6 +22,9 @@ class SettingsManager:
     def get_defaults(self) -> Dict[str, Any]:
         return {
             "api_key": "", 
+            "api_keys": [],
+            "key_rpm_limit": None,
+            "api_timeout_seconds": 600,
             "language": "es",
             "models": {
                 "fast": "gemini-3-flash-preview",
@@ -28,7 +32,32 @@ class SettingsManager:
                 "image": "gemini-2.5-flash-image",
                 "audio": "gemini-2.5-flash-preview-tts"
             },
-            "voice_name": "Fenrir"
+            "voice_name": "Fenrir",
+            "tts": {"chunk_chars": 600, "crossfade_ms": 10, "gap_ms": 120},
+            "audio_processing": {"enabled": True, "target_dbfs": -20, "silence_dbfs": -45, "pad_ms": 120, "peak_dbfs": -1, "max_gain_db": 20},
+            "master_audio": {"gap_ms": 400},
+            "uploads": {"max_mb": 25},
+            "storage": {"blob_cache_mb": 64},
+            "scheduling": {"enabled": True, "max_concurrent": 8, "reserved_interactive": 2, "batch_max": 2, "abandoned_max": 4},
+            "jobs": {"max_concurrent": 2, "keep_minutes": 60, "max_kept": 200, "priority": "pipeline"},
+            "asset_storage": {"backend": "local", "public_base_url": ""},
+            "asset_gc": {"enabled": True, "grace_hours": 24, "interval_minutes": 30, "batch": 500},
+            "render": {"fps": 30, "width": 1280, "height": 720, "crf": 28, "workers": None},
+            "providers": {},
+            "routing": {},
+            "cascades": {},
+            "model_costs": {},
+            "execution_mode": "interactive",
+            "max_parallel_calls": 4,
+            "batch": {"backend": "gemini", "window_seconds": 2, "poll_seconds": 15, "max_requests": 200},
+            "deadlines": {"default": 180, "DeepResearcher": 420, "CompetitorAnalyst": 300, "VoiceAgent": 120, "ImageAgent": 120},
+            "deadline_budget": 3,
+            "hedging": {"agents": ["SpecialistAuditor", "PromptEngineer", "SEOOptimizer"], "percentile": 95, "min_samples": 20},
+            "circuit_breaker": {"enabled": True, "window": 20, "min_calls": 5, "error_rate": 0.5, "cooldown_seconds": 60, "fallbacks": {}},
+            "knowledge_base": {"enabled": True, "trends_reuse_hours": 12, "trends_days": 7, "competitors_days": 14, "research_days": 60, "research_chunks": 6, "max_entries": 30, "max_items": 25},
+            "dedup": {"enabled": True, "flag_threshold": 0.45, "block_threshold": 0.7, "max_projects": 500},
+            "duration": {"words_per_second": 2.5, "prior_weight": 5, "tolerance": 0.15, "max_blocks": 4, "max_projects": 200},
+            "script_gate": {"enabled": True, "hopeless_score": 3, "strong_score": 8.5, "hook_words": [15, 60], "min_readability": 50, "max_repetition": 0.12, "duplicate_similarity": 0.8, "reduced_panel": ["Director Creativo", "Experto YouTube", "Director Visual"]}
         }
 
     def get(self, key: str, default: Any = None) -> Any:
@@ -39,8 +68,8 @@ class SettingsManager:
         self._save()
 
     def _save(self):
-        with open(self.settings_file, 'w', encoding='utf-8') as f:
-            json.dump(self.settings, f, indent=4, ensure_ascii=False)
+        # Atomic and off the caller's thread; rapid updates coalesce into one write
+        file_writer.write(self.settings_file, json_bytes(self.settings))
 
 # Singleton instance
 from .constants import SETTINGS_FILE
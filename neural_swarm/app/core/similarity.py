@@ -0,0 +1,131 @@
+import os
+import math
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from .config import DB_FILE
+from .database import Database
+from .settings import settings_manager
+from .knowledge import WORD_RE, fold_text
+
+def _config() -> Dict[str, Any]:
+    cfg = settings_manager.get("dedup", {}) or {}
+    return {
+        "enabled": cfg.get("enabled", True),
+        "flag_threshold": cfg.get("flag_threshold", 0.45),
+        "block_threshold": cfg.get("block_threshold", 0.7),
+        "max_projects": cfg.get("max_projects", 500),
+    }
+
+def terms(text: str) -> List[str]:
+    """Folded words longer than 3 chars plus their bigrams (bigrams keep "inteligencia artificial" apart from "artificial")."""
+    words = [w for w in WORD_RE.findall(fold_text(text)) if len(w) > 3]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+def project_text(project: Dict[str, Any]) -> str:
+    """Topic, titles and hooks of a stored project."""
+    # Slim DB records carry the selected topic in their summary; full projects in the bible
+    selected = (project.get("summary") or {}).get("selected_topic") or (project.get("project_bible") or {}).get("selected_topic") or {}
+    parts = [
+        project.get("topic", ""),
+        (project.get("metadata") or {}).get("title", ""),
+        selected.get("title", ""),
+        selected.get("angle", ""),
+        selected.get("hook", ""),
+    ]
+    return " ".join(p for p in parts if isinstance(p, str))
+
+class TopicIndex:
+    """TF-IDF index over past projects, rebuilt when the project database changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._docs: List[Tuple[Dict[str, Any], Dict[str, float]]] = []
+        self._idf: Dict[str, float] = {}
+        self._default_idf = 1.0
+
+    def _vector(self, counts: Counter) -> Dict[str, float]:
+        vec = {t: (1 + math.log(c)) * self._idf.get(t, self._default_idf) for t, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {t: v / norm for t, v in vec.items()}
+
+    def _refresh(self):
+        # Saves of this process bump the revision (the file stat alone can miss two quick
+        # saves of the same size); the stat still catches writes by other workers
+        try:
+            stat = os.stat(DB_FILE)
+            signature = (Database.revision, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = (Database.revision, 0, 0)
+        if signature == self._signature:
+            return
+        projects = Database.load().get("projects", [])[-_config()["max_projects"]:]
+        counted = [(p, Counter(terms(project_text(p)))) for p in projects]
+        counted = [(p, c) for p, c in counted if c]
+        df: Counter = Counter()
+        for _, counts in counted:
+            df.update(counts.keys())
+        n = len(counted)
+        self._idf = {t: math.log((1 + n) / (1 + d)) + 1 for t, d in df.items()}
+        self._default_idf = math.log(1 + n) + 1
+        self._docs = [(p, self._vector(c)) for p, c in counted]
+        self._signature = signature
+
+    def query(self, text: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """Past projects most similar to `text`, as {"project_id", "topic", "date", "score"}."""
+        counts = Counter(terms(text))
+        if not counts:
+            return []
+        with self._lock:
+            self._refresh()
+            vec = self._vector(counts)
+            scored = []
+            for project, doc in self._docs:
+                score = sum(w * doc.get(t, 0.0) for t, w in vec.items())
+                if score > 0:
+                    scored.append((score, project))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [
+            {"project_id": p.get("id"), "topic": p.get("topic", ""), "date": p.get("date", ""), "score": round(s, 3)}
+            for s, p in scored[:limit]
+        ]
+
+    def closest(self, text: str) -> Optional[Dict[str, Any]]:
+        """Closest past project when it is at least `flag_threshold` similar."""
+        if not _config()["enabled"]:
+            return None
+        matches = self.query(text, 1)
+        if matches and matches[0]["score"] >= _config()["flag_threshold"]:
+            return matches[0]
+        return None
+
+topic_index = TopicIndex()
+
+def opportunity_text(opportunity: Dict[str, Any]) -> str:
+    return " ".join(str(opportunity.get(k, "")) for k in ("topic", "angle", "hook_idea"))
+
+def rank_opportunities(opportunities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Flags trend opportunities that repeat a past project and steers away from them.
+
+    Close matches get an `already_produced` note (seen by ProjectManager in its
+    prompt) and sink below novel ones; near-duplicates over `block_threshold`
+    are dropped unless nothing else is left.
+    """
+    cfg = _config()
+    if not cfg["enabled"] or not opportunities:
+        return opportunities
+    novel, similar, duplicates = [], [], []
+    for opp in opportunities:
+        if not isinstance(opp, dict):
+            novel.append(opp)
+            continue
+        match = topic_index.closest(opportunity_text(opp))
+        if match is None:
+            opp.pop("already_produced", None)
+            novel.append(opp)
+            continue
+        opp["already_produced"] = f"{match['topic']} ({match['date'][:10]}, similitud {match['score']:.2f})"
+        (duplicates if match["score"] >= cfg["block_threshold"] else similar).append(opp)
+    ranked = novel + similar
+    return ranked if ranked else duplicates
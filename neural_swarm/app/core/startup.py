@@ -0,0 +1,87 @@
+"""Perfil de arranque: tiempo de importación de la API por módulo.
+
+Importa la app en un intérprete limpio con `python -X importtime` y resume
+dónde se va el arranque en frío:
+
+    python -m neural_swarm.app.core.startup --target-ms 800
+
+Sale con código 1 si la importación supera el objetivo (útil en CI).
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from .constants import BASE_DIR
+
+APP_MODULE = "neural_swarm.app.main"
+# Directory that contains the neural_swarm package
+ROOT_DIR = os.path.dirname(BASE_DIR)
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Rows of `-X importtime` output as {"module", "self_us", "cumulative_us", "depth"}."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            rows.append({
+                "module": name.strip(),
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": (len(name) - len(name.lstrip())) // 2,
+            })
+        except ValueError:
+            continue
+    return rows
+
+def profile_imports(module: str = APP_MODULE, top: int = 15) -> Dict[str, Any]:
+    """Imports `module` in a fresh interpreter and reports the import cost per package and per app module."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in (ROOT_DIR, os.environ.get("PYTHONPATH")) if p))
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"import {module} failed")
+    rows = parse_importtime(proc.stderr)
+    packages: Dict[str, int] = defaultdict(int)
+    for row in rows:
+        packages[row["module"].split(".")[0]] += row["self_us"]
+    own = [r for r in rows if r["module"].startswith("neural_swarm")]
+    return {
+        "module": module,
+        "import_ms": round(sum(r["cumulative_us"] for r in rows if r["depth"] == 0) / 1000, 1),
+        "process_ms": round(wall * 1000, 1),
+        "modules_imported": len(rows),
+        "packages": [{"package": name, "self_ms": round(us / 1000, 1)}
+                     for name, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]],
+        "app_modules": [{"module": r["module"], "cumulative_ms": round(r["cumulative_us"] / 1000, 1)}
+                        for r in sorted(own, key=lambda r: r["cumulative_us"], reverse=True)[:top]],
+    }
+
+def report(profile: Dict[str, Any], target_ms: Optional[float] = None) -> str:
+    lines = [f"Importar {profile['module']}: {profile['import_ms']:.0f} ms "
+             f"({profile['modules_imported']} módulos, proceso {profile['process_ms']:.0f} ms)"]
+    if target_ms:
+        verdict = "OK" if profile["import_ms"] <= target_ms else "SUPERADO"
+        lines.append(f"Objetivo: {target_ms:.0f} ms -> {verdict}")
+    lines.append("\nPaquetes (tiempo propio):")
+    lines += [f"  {p['self_ms']:>8.1f} ms  {p['package']}" for p in profile["packages"]]
+    lines.append("\nMódulos de la app (acumulado):")
+    lines += [f"  {m['cumulative_ms']:>8.1f} ms  {m['module']}" for m in profile["app_modules"]]
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default=APP_MODULE)
+    parser.add_argument("--target-ms", type=float, default=None)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    profile = profile_imports(args.module, args.top)
+    print(report(profile, args.target_ms))
+    if args.target_ms and profile["import_ms"] > args.target_ms:
+        sys.exit(1)
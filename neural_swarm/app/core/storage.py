@@ -0,0 +1,315 @@
+import os
+import hmac
+import time
+import hashlib
+import datetime
+import threading
+import urllib.parse
+import urllib.request
+import urllib.error
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterator, Optional, Tuple
+from .constants import AUDIO_DIR, IMAGE_DIR, VIDEO_DIR
+from .settings import settings_manager
+from .metrics import metrics
+
+# Local directory of every asset kind: the working copy that TTS, mastering and render read and write
+ASSET_DIRS = {"audio": AUDIO_DIR, "images": IMAGE_DIR, "video": VIDEO_DIR}
+UPLOAD_CHUNK_BYTES = 1 << 20
+
+class StorageError(Exception):
+    """Error devuelto por el backend de almacenamiento de assets."""
+
+def local_path(kind: str, name: str) -> str:
+    return os.path.join(ASSET_DIRS[kind], name)
+
+class AssetStorage:
+    """Interfaz común del almacenamiento de assets (audio, imágenes, vídeo).
+
+    The local directories stay the working copy; a backend is where finished
+    files are published so every API worker can fetch or serve them.
+    """
+    name: str = "base"
+
+    def put(self, kind: str, name: str, path: str):
+        """Publishes the local file `path` as `kind/name`."""
+        raise NotImplementedError
+
+    def fetch(self, kind: str, name: str, path: str) -> bool:
+        """Downloads `kind/name` into `path`; False when the object does not exist."""
+        raise NotImplementedError
+
+    def delete(self, kind: str, name: str):
+        raise NotImplementedError
+
+    def size(self, kind: str, name: str) -> Optional[int]:
+        """Size in bytes, or None when the object does not exist."""
+        raise NotImplementedError
+
+    def list(self, kind: str) -> Iterator[Tuple[str, int, float]]:
+        """(name, size, mtime) of every stored object of `kind`."""
+        raise NotImplementedError
+
+    def url(self, kind: str, name: str) -> Optional[str]:
+        """URL a client can be redirected to (CDN or presigned), or None to serve the file directly."""
+        return None
+
+class LocalStorage(AssetStorage):
+    """Assets live only in the local directories (the default, single-worker setup)."""
+    name = "local"
+
+    def __init__(self, public_base_url: str = ""):
+        self.public_base_url = public_base_url.rstrip("/")
+
+    def put(self, kind: str, name: str, path: str):
+        target = local_path(kind, name)
+        if os.path.abspath(path) != os.path.abspath(target):
+            os.replace(path, target)
+
+    def fetch(self, kind: str, name: str, path: str) -> bool:
+        return os.path.exists(local_path(kind, name))
+
+    def delete(self, kind: str, name: str):
+        try:
+            os.remove(local_path(kind, name))
+        except FileNotFoundError:
+            pass
+
+    def size(self, kind: str, name: str) -> Optional[int]:
+        try:
+            return os.path.getsize(local_path(kind, name))
+        except OSError:
+            return None
+
+    def list(self, kind: str) -> Iterator[Tuple[str, int, float]]:
+        with os.scandir(ASSET_DIRS[kind]) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    st = entry.stat()
+                    yield entry.name, st.st_size, st.st_mtime
+
+    def url(self, kind: str, name: str) -> Optional[str]:
+        # A CDN in front of the asset directories (e.g. nginx or a pull zone)
+        if self.public_base_url:
+            return f"{self.public_base_url}/{kind}/{urllib.parse.quote(name)}"
+        return None
+
+def _quote(value: str, safe: str = "-_.~") -> str:
+    return urllib.parse.quote(value, safe=safe)
+
+class S3Storage(AssetStorage):
+    """Backend S3-compatible (AWS S3, MinIO, R2...) sobre HTTP con firma SigV4.
+
+    Path-style URLs (`{endpoint}/{bucket}/{key}`), which every S3-compatible
+    server accepts. Objects are `{prefix}{kind}/{name}`. Serve endpoints
+    redirect to `public_base_url` when set (a CDN in front of the bucket) or
+    to a presigned GET valid for `presign_seconds`.
+    """
+    name = "s3"
+
+    def __init__(self, endpoint: str, bucket: str, access_key: str, secret_key: str, region: str = "us-east-1",
+                 prefix: str = "", public_base_url: str = "", presign_seconds: int = 3600, timeout: float = 60):
+        parsed = urllib.parse.urlsplit(endpoint.rstrip("/"))
+        self.scheme, self.host = parsed.scheme or "https", parsed.netloc
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix
+        self.public_base_url = public_base_url.rstrip("/")
+        self.presign_seconds = presign_seconds
+        self.timeout = timeout
+
+    def _key(self, kind: str, name: str) -> str:
+        return f"{self.prefix}{kind}/{name}"
+
+    def _uri(self, key: str = "") -> str:
+        return f"/{_quote(self.bucket)}/{_quote(key, '-_.~/')}" if key else f"/{_quote(self.bucket)}"
+
+    def _signing_key(self, day: str) -> bytes:
+        key = f"AWS4{self.secret_key}".encode("utf-8")
+        for part in (day, self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+        return key
+
+    def _signature(self, method: str, uri: str, query: Dict[str, str], headers: Dict[str, str], payload_hash: str, stamp: str) -> str:
+        canonical_query = "&".join(f"{_quote(k)}={_quote(v)}" for k, v in sorted(query.items()))
+        names = sorted(h.lower() for h in headers)
+        lowered = {k.lower(): str(v).strip() for k, v in headers.items()}
+        canonical_headers = "".join(f"{n}:{lowered[n]}\n" for n in names)
+        canonical = "\n".join([method, uri, canonical_query, canonical_headers, ";".join(names), payload_hash])
+        scope = f"{stamp[:8]}/{self.region}/s3/aws4_request"
+        to_sign = "\n".join(["AWS4-HMAC-SHA256", stamp, scope, hashlib.sha256(canonical.encode("utf-8")).hexdigest()])
+        return hmac.new(self._signing_key(stamp[:8]), to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def _request(self, method: str, key: str = "", query: Optional[Dict[str, str]] = None, body: Any = None,
+                 payload_hash: str = hashlib.sha256(b"").hexdigest(), length: Optional[int] = None):
+        query = query or {}
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        uri = self._uri(key)
+        headers = {"Host": self.host, "x-amz-date": stamp, "x-amz-content-sha256": payload_hash}
+        if length is not None:
+            headers["Content-Length"] = str(length)
+        signature = self._signature(method, uri, query, headers, payload_hash, stamp)
+        signed = ";".join(sorted(h.lower() for h in headers))
+        headers["Authorization"] = (f"AWS4-HMAC-SHA256 Credential={self.access_key}/{stamp[:8]}/{self.region}/s3/aws4_request, "
+                                    f"SignedHeaders={signed}, Signature={signature}")
+        url = f"{self.scheme}://{self.host}{uri}"
+        if query:
+            url += "?" + "&".join(f"{_quote(k)}={_quote(v)}" for k, v in sorted(query.items()))
+        req = urllib.request.Request(url, data=body, headers=headers, method=method)
+        return urllib.request.urlopen(req, timeout=self.timeout)
+
+    def _call(self, method: str, key: str = "", **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._request(method, key, **kwargs)
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise StorageError(f"{method} {key or self.bucket}: {e.code} {e.reason}: {e.read()[:300].decode('utf-8', 'replace')}")
+        except urllib.error.URLError as e:
+            raise StorageError(f"{method} {key or self.bucket}: {e.reason}")
+        finally:
+            metrics.observe("asset_storage", self.name, method.lower(), time.perf_counter() - started)
+
+    def put(self, kind: str, name: str, path: str):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b""):
+                digest.update(chunk)
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            resp = self._call("PUT", self._key(kind, name), body=f, payload_hash=digest.hexdigest(), length=size)
+        if resp is None:
+            raise StorageError(f"Bucket {self.bucket!r} not found")
+        resp.close()
+        metrics.incr("asset_storage", kind, "uploaded_bytes", size)
+
+    def fetch(self, kind: str, name: str, path: str) -> bool:
+        resp = self._call("GET", self._key(kind, name))
+        if resp is None:
+            return False
+        tmp = f"{path}.part"
+        try:
+            with resp, open(tmp, "wb") as f:
+                for chunk in iter(lambda: resp.read(UPLOAD_CHUNK_BYTES), b""):
+                    f.write(chunk)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        metrics.incr("asset_storage", kind, "fetched")
+        return True
+
+    def delete(self, kind: str, name: str):
+        resp = self._call("DELETE", self._key(kind, name))
+        if resp is not None:
+            resp.close()
+
+    def size(self, kind: str, name: str) -> Optional[int]:
+        resp = self._call("HEAD", self._key(kind, name))
+        if resp is None:
+            return None
+        with resp:
+            return int(resp.headers.get("Content-Length", 0))
+
+    def list(self, kind: str) -> Iterator[Tuple[str, int, float]]:
+        prefix = self._key(kind, "")
+        token = None
+        while True:
+            query = {"list-type": "2", "prefix": prefix}
+            if token:
+                query["continuation-token"] = token
+            resp = self._call("GET", query=query)
+            if resp is None:
+                raise StorageError(f"Bucket {self.bucket!r} not found")
+            with resp:
+                root = ET.fromstring(resp.read())
+            ns = root.tag[:root.tag.index("}") + 1] if root.tag.startswith("{") else ""
+            for item in root.iter(f"{ns}Contents"):
+                key = item.findtext(f"{ns}Key", "")
+                modified = item.findtext(f"{ns}LastModified", "")
+                try:
+                    mtime = datetime.datetime.fromisoformat(modified.replace("Z", "+00:00")).timestamp()
+                except ValueError:
+                    mtime = time.time()
+                yield key[len(prefix):], int(item.findtext(f"{ns}Size", "0")), mtime
+            token = root.findtext(f"{ns}NextContinuationToken")
+            if root.findtext(f"{ns}IsTruncated") != "true" or not token:
+                return
+
+    def url(self, kind: str, name: str) -> Optional[str]:
+        key = self._key(kind, name)
+        if self.public_base_url:
+            return f"{self.public_base_url}/{_quote(key, '-_.~/')}"
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        query = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{stamp[:8]}/{self.region}/s3/aws4_request",
+            "X-Amz-Date": stamp,
+            "X-Amz-Expires": str(self.presign_seconds),
+            "X-Amz-SignedHeaders": "host",
+        }
+        uri = self._uri(key)
+        query["X-Amz-Signature"] = self._signature("GET", uri, query, {"host": self.host}, "UNSIGNED-PAYLOAD", stamp)
+        return f"{self.scheme}://{self.host}{uri}?" + "&".join(f"{_quote(k)}={_quote(v)}" for k, v in query.items())
+
+STORAGE_TYPES = {
+    "local": lambda cfg: LocalStorage(public_base_url=cfg.get("public_base_url", "")),
+    "s3": lambda cfg: S3Storage(
+        endpoint=cfg.get("endpoint", "https://s3.amazonaws.com"),
+        bucket=cfg.get("bucket", ""),
+        access_key=cfg.get("access_key", ""),
+        secret_key=cfg.get("secret_key", ""),
+        region=cfg.get("region", "us-east-1"),
+        prefix=cfg.get("prefix", ""),
+        public_base_url=cfg.get("public_base_url", ""),
+        presign_seconds=cfg.get("presign_seconds", 3600),
+        timeout=cfg.get("timeout", 60),
+    ),
+}
+
+_backend_lock = threading.Lock()
+_backend: Optional[Tuple[str, AssetStorage]] = None
+
+def get_storage() -> AssetStorage:
+    """Backend configured under `asset_storage` (rebuilt when the settings change)."""
+    global _backend
+    cfg = settings_manager.get("asset_storage", {}) or {}
+    signature = repr(sorted(cfg.items()))
+    with _backend_lock:
+        if _backend is None or _backend[0] != signature:
+            kind = cfg.get("backend", "local")
+            if kind not in STORAGE_TYPES:
+                raise StorageError(f"Unknown asset_storage.backend {kind!r} ({', '.join(STORAGE_TYPES)})")
+            _backend = (signature, STORAGE_TYPES[kind](cfg))
+        return _backend[1]
+
+def publish(kind: str, name: str) -> bool:
+    """Publishes a freshly written local asset to the backend. Blocking: run it in a worker.
+
+    A failed upload is logged and counted, never raised: the local copy still
+    serves this worker, and the next write of the asset publishes it again.
+    """
+    try:
+        get_storage().put(kind, name, local_path(kind, name))
+        return True
+    except (StorageError, OSError) as e:
+        metrics.incr("asset_storage", kind, "publish_failed")
+        print(f"⚠️ No se pudo publicar {kind}/{name}: {e}")
+        return False
+
+def ensure_local(kind: str, name: str) -> Optional[str]:
+    """Local path of an asset, downloading it from the backend when this worker lacks it; None if missing."""
+    path = local_path(kind, name)
+    if os.path.exists(path):
+        return path
+    try:
+        return path if get_storage().fetch(kind, name, path) else None
+    except StorageError as e:
+        print(f"⚠️ No se pudo descargar {kind}/{name}: {e}")
+        return None
@@ -6,59 +6,263 @@ import logging
 
 import asyncio
 import inspect
+import contextvars
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 
-async def retry_with_backoff(fn, max_retries=10, initial_delay=2):
-    """Ejecuta una función (síncrona o asíncrona) con reintentos, backoff exponencial y manejo de errores de cuota."""
+# Dedicated pool for blocking model calls. It is larger than asyncio's default
+# executor because in batch mode each queued request parks a thread until its job ends.
+_call_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="swarm-call")
+
+def submit_blocking(fn, *args) -> concurrent.futures.Future:
+    """Submits a blocking function to the call pool, keeping the caller's contextvars.
+
+    The returned future completes when the thread does, even if whoever awaited it was cancelled.
+    """
+    ctx = contextvars.copy_context()
+    return _call_executor.submit(ctx.run, fn, *args)
+
+async def run_blocking(fn, *args):
+    """Runs a blocking function in the call pool, keeping the caller's contextvars."""
+    return await asyncio.wrap_future(submit_blocking(fn, *args))
+
+async def retry_with_backoff(fn, max_retries=10, initial_delay=2, max_partial_retries=2, agent_id=None):
+    """Ejecuta una función (síncrona o asíncrona) con reintentos, backoff exponencial y manejo de errores de cuota.
+
+    Los `PartialOutputError` (JSON roto o fuera de esquema) se reintentan sin backoff
+    y como máximo `max_partial_retries` veces: el modelo respondió, solo hay que pedirlo de nuevo.
+    Con `agent_id`, cada intento síncrono tiene el deadline del agente (y hedging si está activado)
+    y el conjunto de intentos, un deadline global (`deadline_budget`): agotado, no se reintenta más.
+    """
+    from .deadlines import run_attempt, overall_deadline
+    from .breaker import CircuitOpenError
+    deadline_at = overall_deadline(agent_id) if agent_id else None
+    partial_failures = 0
     for i in range(max_retries):
         try:
             if inspect.iscoroutinefunction(fn):
                 return await fn()
-            return fn()
+            # Blocking SDK calls run in a worker thread so gathered calls really overlap
+            return await run_attempt(fn, agent_id, deadline_at)
+        except PartialOutputError as e:
+            partial_failures += 1
+            if partial_failures > max_partial_retries or i == max_retries - 1 or _expired(deadline_at):
+                raise e
+            await asyncio.sleep(random.uniform(0, 0.5))
+        except CircuitOpenError:
+            # The model is known to be down: backing off here would only stall the run
+            raise
         except Exception as e:
-            error_msg = str(e).upper()
-            is_rate_limit = any(x in error_msg for x in ["429", "QUOTA", "LIMIT"])
+            from .ai import is_rate_limit_error, key_pool
+            is_rate_limit = is_rate_limit_error(e)
             
             if i == max_retries - 1:
                 raise e
             
-            # Si es un error de cuota, esperamos más tiempo
-            if is_rate_limit:
+            # Si es un error de cuota, esperamos más tiempo (salvo que otra key sana pueda atender el reintento)
+            if is_rate_limit and key_pool.healthy_count() <= 1:
                 delay = (initial_delay * 2) * (2 ** i) + random.uniform(0, 5)
             else:
                 delay = initial_delay * (2 ** i) + random.uniform(0, 1)
-                
+
+            # No point sleeping past the overall deadline: the retry could not start in time
+            if _expired(deadline_at, delay):
+                raise e
             await asyncio.sleep(delay)
 
-def clean_and_parse_json(text: str) -> any:
-    """Limpia la respuesta del LLM y la convierte en un diccionario o lista JSON."""
+def _expired(deadline_at: Optional[float], delay: float = 0.0) -> bool:
+    return deadline_at is not None and time.monotonic() + delay >= deadline_at
+
+async def gather_limited(coros, limit: Optional[int] = None) -> List[Any]:
+    """`asyncio.gather` con como mucho `limit` corrutinas a la vez (None = sin límite)."""
+    coros = list(coros)
+    if not limit or limit >= len(coros):
+        return await asyncio.gather(*coros)
+    semaphore = asyncio.Semaphore(limit)
+
+    async def _run(coro):
+        async with semaphore:
+            return await coro
+    return await asyncio.gather(*[_run(c) for c in coros])
+
+class PartialOutputError(Exception):
+    """Salida del LLM irrecuperable o fuera de esquema. Es un fallo parcial reintentable."""
+    def __init__(self, message: str, partial: Any = None, errors: Optional[List[str]] = None):
+        super().__init__(message)
+        self.partial = partial
+        self.errors = errors or []
+
+class JSONRepairParser:
+    """Parser JSON incremental y tolerante.
+
+    Recorre el texto una sola vez (se puede alimentar por fragmentos con `feed`)
+    recordando el último punto en el que la estructura estaba completa. Si la
+    salida llega truncada, `value()` corta en ese punto y cierra los corchetes
+    abiertos. También elimina comas colgantes y el texto tras el valor raíz.
+    """
+    def __init__(self):
+        self.out: List[str] = []
+        self.stack: List[str] = []
+        self.started = False
+        self.done = False
+        self.in_string = False
+        self.escape = False
+        self.string_is_key = False
+        self.prev_sig = ""
+        self.safe_len = 0
+        self.safe_depth = 0
+
+    def _mark_safe(self):
+        self.safe_len = len(self.out)
+        self.safe_depth = len(self.stack)
+
+    def _strip_trailing_comma(self):
+        j = len(self.out) - 1
+        while j >= 0 and self.out[j].isspace():
+            j -= 1
+        if j >= 0 and self.out[j] == ",":
+            del self.out[j:]
+
+    def feed(self, chunk: str):
+        out = self.out
+        for ch in chunk:
+            if self.done:
+                return
+            if not self.started:
+                if ch not in "{[":
+                    continue
+                self.started = True
+            if self.in_string:
+                out.append(ch)
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    self.prev_sig = '"'
+                    if not self.string_is_key:
+                        self._mark_safe()
+                continue
+            if ch == '"':
+                self.in_string = True
+                self.string_is_key = bool(self.stack) and self.stack[-1] == "{" and self.prev_sig in "{,"
+                out.append(ch)
+            elif ch in "{[":
+                self.stack.append(ch)
+                out.append(ch)
+                self.prev_sig = ch
+                if len(self.stack) == 1:
+                    self._mark_safe()
+            elif ch in "}]":
+                if not self.stack:
+                    continue
+                self._strip_trailing_comma()
+                opener = self.stack.pop()
+                out.append("}" if opener == "{" else "]")
+                self.prev_sig = ch
+                self._mark_safe()
+                if not self.stack:
+                    self.done = True
+            elif ch == ",":
+                self._mark_safe()
+                out.append(ch)
+                self.prev_sig = ch
+            elif ch in "\x00\x7f" or (ch < " " and not ch.isspace()):
+                continue
+            else:
+                out.append(ch)
+                if not ch.isspace():
+                    self.prev_sig = ch
+
+    def text(self) -> str:
+        """Texto JSON reparado (cerrado) a partir de lo recibido hasta ahora."""
+        if not self.started:
+            return ""
+        if self.done:
+            return "".join(self.out)
+        body = self.out[:self.safe_len]
+        while body and (body[-1].isspace() or body[-1] == ","):
+            body.pop()
+        closers = ["}" if c == "{" else "]" for c in reversed(self.stack[:self.safe_depth])]
+        return "".join(body) + "".join(closers)
+
+    def value(self) -> Any:
+        return json.loads(self.text(), strict=False)
+
+_FENCE_RE = re.compile(r'```(?:json|JSON)?\s*([\s\S]*?)(?:```|$)')
+
+def parse_json_tolerant(text: str) -> Any:
+    """Parsea JSON del LLM recuperando bloques markdown y salidas truncadas."""
+    if not text:
+        raise PartialOutputError("Respuesta vacía del modelo")
+    text = text.strip()
     try:
-        # Intenta encontrar el bloque JSON si el modelo devolvió markdown
-        json_match = re.search(r'```json\s*([\s\S]*?)\s*```', text)
-        if json_match:
-            text = json_match.group(1)
-        
-        # Limpiezas comunes
-        text = text.strip()
-        text = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', text)
-        
-        return json.loads(text)
-    except Exception as e:
-        # Intenta parsing agresivo si falla el estándar
-        try:
-            # Busca el primer '[' o '{' y el último ']' o '}'
-            start_bracket = text.find('[')
-            start_brace = text.find('{')
-            
-            start = -1
-            if start_bracket != -1 and (start_brace == -1 or start_bracket < start_brace):
-                start = start_bracket
-                end = text.rfind(']')
-            elif start_brace != -1:
-                start = start_brace
-                end = text.rfind('}')
-            
-            if start != -1 and end != -1:
-                return json.loads(text[start:end+1])
-        except:
-            pass
-        return {}
+        return json.loads(text, strict=False)
+    except ValueError:
+        pass
+    fence = _FENCE_RE.search(text)
+    if fence and any(c in fence.group(1) for c in "{["):
+        text = fence.group(1)
+    parser = JSONRepairParser()
+    parser.feed(text)
+    try:
+        return parser.value()
+    except ValueError as e:
+        raise PartialOutputError(f"JSON irrecuperable: {e}", partial=text[:500])
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool
+}
+
+def validate_schema(data: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """Valida `data` contra un subset de JSON Schema. Devuelve la lista de errores."""
+    errors = []
+    expected = schema.get("type")
+    if expected:
+        py_type = _JSON_TYPES.get(expected)
+        if py_type and (not isinstance(data, py_type) or (expected in ("integer", "number") and isinstance(data, bool))):
+            return [f"{path}: se esperaba {expected}, se recibió {type(data).__name__}"]
+    if isinstance(data, dict):
+        for key in schema.get("required", []):
+            if key not in data:
+                errors.append(f"{path}.{key}: campo requerido ausente")
+        for key, sub in schema.get("properties", {}).items():
+            if key in data:
+                errors.extend(validate_schema(data[key], sub, f"{path}.{key}"))
+    elif isinstance(data, list):
+        if len(data) < schema.get("minItems", 0):
+            errors.append(f"{path}: se esperaban al menos {schema['minItems']} elementos")
+        if "items" in schema:
+            for i, item in enumerate(data):
+                errors.extend(validate_schema(item, schema["items"], f"{path}[{i}]"))
+    elif isinstance(data, (int, float)):
+        if "minimum" in schema and data < schema["minimum"]:
+            errors.append(f"{path}: {data} < {schema['minimum']}")
+        if "maximum" in schema and data > schema["maximum"]:
+            errors.append(f"{path}: {data} > {schema['maximum']}")
+    return errors
+
+def clean_and_parse_json(text: str, schema: Optional[Dict[str, Any]] = None) -> Any:
+    """Limpia la respuesta del LLM y la convierte en un diccionario o lista JSON.
+
+    Nunca devuelve `{}` en silencio: si el texto es irrecuperable o no cumple
+    `schema`, lanza `PartialOutputError` (que `retry_with_backoff` reintenta).
+    """
+    data = parse_json_tolerant(text)
+    if schema is not None:
+        ensure_schema(data, schema)
+    return data
+
+def ensure_schema(data: Any, schema: Dict[str, Any]) -> Any:
+    """Lanza `PartialOutputError` si `data` no cumple `schema`; si lo cumple, lo devuelve."""
+    errors = validate_schema(data, schema)
+    if errors:
+        raise PartialOutputError(f"Salida fuera de esquema: {'; '.join(errors[:3])}", partial=data, errors=errors)
+    return data
@@ -1,14 +1,17 @@
 import json
+import asyncio
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 from fastapi import WebSocket
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
+        self.loop = asyncio.get_running_loop()
         self.active_connections.append(websocket)
 
     def disconnect(self, websocket: WebSocket):
@@ -28,4 +31,10 @@ class ConnectionManager:
             except:
                 pass
 
+    def broadcast_threadsafe(self, message: str, type: str = "info", payload: dict = None):
+        """Broadcast from a worker thread (no-op until a client has connected)."""
+        if self.loop is None or self.loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self.broadcast(message, type, payload), self.loop)
+
 manager = ConnectionManager()
@@ -1,15 +1,34 @@
 import os
+import time
+_import_started = time.perf_counter()
+import asyncio
+from typing import Optional, List
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, BackgroundTasks, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
-from .core.config import AUDIO_DIR, IMAGE_DIR
+from .core.config import IMAGE_DIR, ensure_data_dirs
 from .core.websocket import manager
-from .core.database import Database
+from .core.database import Database, VersionConflict, MissingSection, SaveFailed
+from .core.patch import PatchError
+from .core.persistence import file_writer, stream_to_file, upload_chunks, UploadTooLarge
 from .orchestrator.neural_orch import NeuralSwarmOrchestrator
 from .core.settings import settings_manager
 from .core.i18n import i18n
+from .core.ai import key_pool
+from .core.metrics import metrics
+from .core.cascade import escalation_rates
+from .core.breaker import breakers
+from .core.utils import run_blocking, gather_limited
+from .core.batch import parallel_limit
+from .core.jobs import job_manager, JobConflict
+from .core.scheduler import call_scheduler, priority, INTERACTIVE
+from .core.duration import duration_model
+from .core.assets import asset_collector, project_usage
+from .core.storage import get_storage, ensure_local, publish
+from .core.export import stream_package
+from .core.render import build_timeline, to_edl, to_fcpxml, render_draft
 
 app = FastAPI(title="Neural Swarm v2.0")
 
@@ -20,9 +39,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global Orchestrator
+# Global Orchestrator (cheap to create: agents and the graph are built on first use)
 neural_swarm = NeuralSwarmOrchestrator()
 
+@app.exception_handler(MissingSection)
+async def missing_section_handler(request, exc: MissingSection):
+    # A project whose blob is gone is served as an error, never as a project without that section
+    return JSONResponse({"detail": str(exc)}, status_code=500)
+
+@app.exception_handler(SaveFailed)
+async def save_failed_handler(request, exc: SaveFailed):
+    # Disk full, permissions...: the edit was not stored and no new version exists
+    return JSONResponse({"detail": str(exc)}, status_code=503)
+
+@app.on_event("startup")
+async def on_startup():
+    ensure_data_dirs()
+    # Records saved before heavy sections moved to blobs are migrated once
+    await run_blocking(Database.compact)
+    # Unreferenced audio/images/video past the grace period are swept in the background
+    asset_collector.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    asset_collector.stop()
+    # Queued DB/settings writes reach the disk before the worker exits
+    await run_blocking(file_writer.flush, 10)
+
 @app.websocket("/ws/logs")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
@@ -45,39 +88,79 @@ async def serve_ui():
         return HTMLResponse(content='<h1>frontend.html not found</h1>', status_code=404)
 
 @app.post("/api/start")
-async def start_generation(data: dict, background_tasks: BackgroundTasks):
+async def start_generation(data: dict):
     niche = data.get("niche", "Tech & AI")
-    background_tasks.add_task(neural_swarm.run_full_pipeline, niche)
+    # A plain task (not BackgroundTasks) so /api/stop can cancel it without touching the request
+    asyncio.create_task(neural_swarm.run_full_pipeline(niche, data.get("mode")))
     return {"status": "started", "message": f"🧠 Neural Swarm v2.0 iniciado para: {niche}"}
 
 @app.post("/api/stop")
 async def stop_generation():
     neural_swarm.stop()
     await manager.broadcast("🛑 Sistema solicitado detenerse...", "info")
-    return {"status": "stopping", "message": "Neural Swarm stopping at next checkpoint..."}
+    return {"status": "stopping", "message": "Neural Swarm stopping; in-flight calls are being cancelled..."}
 
 @app.get("/api/projects")
 def get_projects():
-    return Database.load()["projects"]
+    # Slim records: heavy sections (script, bible, audits...) are fetched per project
+    return Database.list_projects()
+
+@app.get("/api/projects/{project_id}")
+def get_project(project_id: str):
+    project = Database.get_project(project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
 
 @app.delete("/api/projects/{project_id}")
 def delete_project(project_id: str):
     Database.delete_project(project_id)
     return {"status": "deleted"}
 
+@app.get("/api/projects/{project_id}/storage")
+def get_project_storage(project_id: str):
+    assets = Database.project_assets(project_id)
+    if assets is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project_usage(project_id, assets)
+
+@app.get("/api/storage")
+def get_storage_usage():
+    usage = [project_usage(p["id"], Database.project_assets(p["id"]) or {}) for p in Database.load()["projects"]]
+    return {
+        "projects": sorted(usage, key=lambda u: u["total_bytes"], reverse=True),
+        "total_bytes": sum(u["total_bytes"] for u in usage),
+        "last_gc": asset_collector.last_report,
+    }
+
+@app.post("/api/assets/gc")
+async def collect_assets(dry_run: bool = True):
+    # Dry run by default: reports what a pass would delete
+    return await asset_collector.collect(dry_run=dry_run)
+
+def serve_asset(kind: str, filename: str, not_found: str):
+    """Redirect to the storage backend (CDN or presigned URL) when it has one, else stream the local copy."""
+    filename = os.path.basename(filename)
+    url = get_storage().url(kind, filename)
+    if url:
+        metrics.incr("asset_storage", kind, "redirects")
+        return RedirectResponse(url, status_code=307)
+    path = ensure_local(kind, filename)
+    if not path:
+        raise HTTPException(status_code=404, detail=not_found)
+    return FileResponse(path)
+
 @app.get("/audio/{filename}")
 def get_audio(filename: str):
-    path = os.path.join(AUDIO_DIR, filename)
-    if not os.path.exists(path):
-        raise HTTPException(status_code=404, detail="Audio file not found")
-    return FileResponse(path)
+    return serve_asset("audio", filename, "Audio file not found")
 
 @app.get("/images/{filename}")
 def get_image(filename: str):
-    path = os.path.join(IMAGE_DIR, filename)
-    if not os.path.exists(path):
-        raise HTTPException(status_code=404, detail="Image not found")
-    return FileResponse(path)
+    return serve_asset("images", filename, "Image not found")
+
+@app.get("/video/{filename}")
+def get_video(filename: str):
+    return serve_asset("video", filename, "Video file not found")
 
 # --- Settings & I18n Endpoints ---
 
@@ -90,15 +173,34 @@ def update_settings(new_settings: dict):
     settings_manager.update(new_settings)
     return {"status": "ok", "settings": settings_manager.settings}
 
+@app.get("/api/keys/usage")
+def get_key_usage():
+    return {"keys": key_pool.usage()}
+
+@app.get("/api/metrics")
+def get_metrics():
+    return {"metrics": metrics.snapshot(), "cascade_escalation_rate": escalation_rates(), "circuit_breakers": breakers.states(),
+            "duration_model": duration_model.coefficients(), "scheduler": call_scheduler.snapshot()}
+
+@app.get("/api/startup_profile")
+async def get_startup_profile(target_ms: Optional[float] = None):
+    """Import-time profile of the API measured in a fresh interpreter."""
+    from .core.startup import profile_imports
+    try:
+        profile = await run_blocking(profile_imports)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    profile["target_ms"] = target_ms
+    profile["within_target"] = None if target_ms is None else profile["import_ms"] <= target_ms
+    profile["this_process_import_ms"] = round(metrics.average("startup", "api", "import_seconds") * 1000, 1)
+    return profile
+
 @app.get("/api/i18n/{lang}")
 def get_translations(lang: str):
     # This ensures the language is loaded
     i18n.load_language(lang)
     return i18n.translations
 
-import shutil
-import time
-from typing import Optional, List
 from fastapi import UploadFile, File
 
 # --- Models for granular API requests ---
@@ -114,31 +216,159 @@ class EditorRequest(BaseModel):
 class AutoFixRequest(BaseModel):
     instruction: Optional[str] = None
 
+async def save_fields(project_id: str, ops: List[dict]) -> dict:
+    """Writes only what a handler changed, as a patch, so PATCHes and job results that landed
+    while it worked are kept; returns {"id", "version", "changed"} like PATCH."""
+    try:
+        result = await run_blocking(Database.patch_project, project_id, ops)
+    except PatchError as e:
+        # e.g. the block was deleted, or its text edited, while the handler worked
+        raise HTTPException(status_code=409, detail=f"Project changed while the request ran: {e}")
+    if result is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    version, changed = result
+    return {"id": project_id, "version": version, "changed": changed}
+
+def block_ops(index: int, block: dict, fields) -> List[dict]:
+    return [{"op": "add", "path": f"/script/{index}/{field}", "value": block[field]} for field in fields if field in block]
+
+def thumbnail_ops(project: dict, filename: str) -> List[dict]:
+    if isinstance(project.get("metadata"), dict):
+        return [{"op": "add", "path": "/metadata/thumbnail_file", "value": filename}]
+    return [{"op": "add", "path": "/metadata", "value": {"thumbnail_file": filename}}]
+
 @app.post("/api/retry_audio")
 async def retry_audio(req: RetryRequest):
-    db = Database.load()
-    project = next((p for p in db["projects"] if p["id"] == req.project_id), None)
+    project = await run_blocking(Database.get_project, req.project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
     try:
         block = project["script"][req.block_index]
-        # Re-synthesize this block
-        new_files = await neural_swarm.voice_agent.synthesize([block], project["id"], offset=req.block_index)
+        # Re-synthesize this block (the user is waiting: ahead of running pipelines)
+        with priority(INTERACTIVE):
+            new_files = await neural_swarm.voice_agent.synthesize([block], project["id"], index_offset=req.block_index)
         
-        # VoiceAgent.synthesize already handles file naming if offset is provided
+        # VoiceAgent.synthesize already handles file naming if index_offset is provided
         if new_files:
             block['audio_file'] = new_files[0]
             
-        Database.update_project(project)
-        return project
+        # Only the block fields that changed go back, like PATCH
+        return await save_fields(project["id"], block_ops(req.block_index, block, ("audio_file", "duration_seconds", "audio_chunks", "audio_processing")))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/projects/{project_id}/process_audio")
+async def process_audio(project_id: str):
+    project = await run_blocking(Database.get_project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    from .core.mastering import process_project_audio
+    report = await process_project_audio(project)
+    if not report["enabled"]:
+        raise HTTPException(status_code=400, detail="Audio processing is disabled (audio_processing.enabled)")
+    for error in report["errors"]:
+        await manager.broadcast(f"⚠️ Audio del bloque {error['block'] + 1} no procesado: {error['error']}", "warning")
+    if not report["processed"]:
+        if report["errors"]:
+            raise HTTPException(status_code=500, detail={"message": "No block audio could be processed", "errors": report["errors"]})
+        raise HTTPException(status_code=400, detail="Project has no block audio")
+    await save_fields(project_id, [op for i in report["processed"] for op in
+                             block_ops(i, project["script"][i], ("duration_seconds", "audio_processing", "audio_chunks"))])
+    project = await run_blocking(Database.get_project, project_id)
+    if report["errors"]:
+        # Partial success: the processed blocks are saved, the failures are listed
+        return JSONResponse({"project": project, "errors": report["errors"]}, status_code=207)
+    return project
+
+@app.post("/api/projects/{project_id}/master_audio")
+async def build_master_audio(project_id: str, force: bool = False):
+    project = await run_blocking(Database.get_project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    # Rebuilds only when a block's audio or gap changed since the last build
+    previous = project.get("master_audio")
+    master = await neural_swarm.assemble_master_audio(project, force)
+    if not master:
+        raise HTTPException(status_code=400, detail="Project has no block audio")
+    if master != previous:
+        await save_fields(project_id, [{"op": "add", "path": "/master_audio", "value": master}])
+    return master
+
+@app.get("/api/projects/{project_id}/timeline")
+def get_timeline(project_id: str, format: str = "json"):
+    project = Database.get_project(project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    timeline = build_timeline(project)
+    if format == "edl":
+        return Response(to_edl(timeline), media_type="text/plain", headers={"Content-Disposition": f'attachment; filename="{project_id}.edl"'})
+    if format == "fcpxml":
+        return Response(to_fcpxml(timeline), media_type="application/xml", headers={"Content-Disposition": f'attachment; filename="{project_id}.fcpxml"'})
+    return JSONResponse(timeline)
+
+@app.get("/api/projects/{project_id}/export")
+def export_project(project_id: str):
+    # Streamed as it is built: block audio, images, thumbnail, script (txt/srt/json) and SEO package
+    project = Database.get_project(project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return StreamingResponse(stream_package(project), media_type="application/zip",
+                             headers={"Content-Disposition": f'attachment; filename="{project_id}.zip"'})
+
+@app.post("/api/projects/{project_id}/render_draft")
+async def render_draft_video(project_id: str):
+    project = await run_blocking(Database.get_project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    async def _render(job):
+        await job.update(message="🎬 Renderizando borrador")
+        filename = await render_draft(project)
+        await apply_job_patch(project_id, [{"op": "add", "path": "/draft_video", "value": filename}])
+        return {"file": filename, "url": f"/video/{filename}"}
+
+    # A render already running for this project is returned instead of starting another
+    return job_accepted("render_draft", project_id, _render)
+
+def job_accepted(kind: str, project_id: str, fn, target: str = "", params=None) -> JSONResponse:
+    """Submits a job and answers 202 with its id: progress streams over the websocket, the result
+    is at /api/jobs/{id}. 409 with the active job's id when one of the same kind is running with other `params`."""
+    try:
+        job = job_manager.submit(kind, project_id, fn, target, params)
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "job_id": e.job.id, "url": f"/api/jobs/{e.job.id}"})
+    return JSONResponse({"job_id": job.id, "status": job.status, "url": f"/api/jobs/{job.id}"}, status_code=202)
+
+async def apply_job_patch(project_id: str, ops: List[dict]) -> dict:
+    """Writes a job's changes as a patch, so edits made while it ran are kept; returns the project."""
+    if await run_blocking(Database.patch_project, project_id, ops) is None:
+        raise RuntimeError("Project was deleted while the job ran")
+    return await run_blocking(Database.get_project, project_id)
+
+@app.get("/api/jobs")
+def list_jobs(project_id: Optional[str] = None):
+    return job_manager.list(project_id)
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.delete("/api/jobs/{job_id}")
+def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job.id, "status": job.status}
+
 @app.post("/api/projects/{project_id}/audit_panel")
 async def audit_panel_endpoint(project_id: str):
-    db = Database.load()
-    project_dict = next((p for p in db["projects"] if p["id"] == project_id), None)
+    project_dict = await run_blocking(Database.get_project, project_id)
     if not project_dict:
         raise HTTPException(status_code=404, detail="Project not found")
     
@@ -148,42 +378,77 @@ async def audit_panel_endpoint(project_id: str):
     context = ProjectContext(project_id=project_id, niche=project_dict.get("niche", ""))
     context.final_script = project_dict.get("script", [])
     context.project_bible = project_dict.get("project_bible", {})
-    
-    context = await neural_swarm.audit_panel.execute(context)
-    panel_report = context.audit_report
-    
-    project_dict["audit_report"] = {
-        "type": "panel",
-        "global_score": panel_report["global_score"],
-        "global_verdict": panel_report["global_verdict"],
-        "critique": panel_report["global_verdict"],
-        "suggestions": [f"[{report.get('agent_name')}] {report.get('top_issues', ['N/A'])[0] if report.get('top_issues') else 'N/A'}" for report in panel_report["agent_reports"]],
-        "panel": panel_report
-    }
-    Database.update_project(project_dict)
-    return project_dict
+
+    async def _audit(job):
+        panel = neural_swarm.audit_panel
+        await job.update(0, len(panel.agents), "🎯 Panel de auditoría en curso")
+
+        async def _on_report(agent_name, report):
+            await job.update(job.progress["done"] + 1, message=f"{agent_name}: {report.get('overall_score', 0)}/10")
+
+        panel_report = (await panel.execute(context, on_report=_on_report)).audit_report
+        audit_report = {
+            "type": "panel",
+            "global_score": panel_report["global_score"],
+            "global_verdict": panel_report["global_verdict"],
+            "critique": panel_report["global_verdict"],
+            "suggestions": [f"[{report.get('agent_name')}] {report.get('top_issues', ['N/A'])[0] if report.get('top_issues') else 'N/A'}" for report in panel_report["agent_reports"]],
+            "panel": panel_report
+        }
+        return await apply_job_patch(project_id, [{"op": "add", "path": "/audit_report", "value": audit_report}])
+
+    return job_accepted("audit_panel", project_id, _audit)
 
 @app.post("/api/editor/expand")
 async def editor_expand(req: EditorRequest):
-    expanded = await neural_swarm.editor.expand_text(req.text, req.context)
+    with priority(INTERACTIVE):
+        expanded = await neural_swarm.editor.expand_text(req.text, req.context)
     return {"text": expanded}
 
 @app.post("/api/editor/shorten")
 async def editor_shorten(req: EditorRequest):
-    shortened = await neural_swarm.editor.shorten_text(req.text)
+    with priority(INTERACTIVE):
+        shortened = await neural_swarm.editor.shorten_text(req.text)
     return {"text": shortened}
 
 @app.put("/api/projects/{project_id}")
 async def update_project_endpoint(project_id: str, project_data: dict):
+    """Replaces a whole project. Prefer PATCH; like it, this needs the `version` the edit was based on (409 if stale)."""
     if project_data.get('id') != project_id:
         raise HTTPException(status_code=400, detail="Project ID mismatch")
-    Database.update_project(project_data)
+    if not isinstance(project_data.get("version"), int):
+        raise HTTPException(status_code=400, detail="version is required")
+    try:
+        if not await run_blocking(Database.update_project, project_data, project_data["version"]):
+            raise HTTPException(status_code=404, detail="Project not found")
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "version": e.current_version})
     return project_data
 
+class PatchRequest(BaseModel):
+    ops: List[dict]
+    version: Optional[int] = None
+
+@app.patch("/api/projects/{project_id}")
+async def patch_project_endpoint(project_id: str, req: PatchRequest):
+    """JSON Patch (add/remove/replace/test) on one project; returns only the changed fragments.
+
+    Send the `version` the edit was based on: if the project moved on since, 409 with the current version.
+    """
+    try:
+        result = await run_blocking(Database.patch_project, project_id, req.ops, req.version)
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "version": e.current_version})
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    version, changed = result
+    return {"id": project_id, "version": version, "changed": changed}
+
 @app.post("/api/projects/{project_id}/images/thumbnail")
 async def regen_thumbnail(project_id: str):
-    db = Database.load()
-    project = next((p for p in db["projects"] if p["id"] == project_id), None)
+    project = await run_blocking(Database.get_project, project_id)
     if not project: raise HTTPException(404, "Project not found")
     
     prompt = project.get("metadata", {}).get("thumbnail_prompt")
@@ -193,16 +458,14 @@ async def regen_thumbnail(project_id: str):
     filename = await neural_swarm.image_agent.generate_image(prompt, project_id, f"thumbnail_{int(time.time())}")
     
     if filename:
-        project["metadata"]["thumbnail_file"] = filename
-        Database.update_project(project)
+        await save_fields(project_id, thumbnail_ops(project, filename))
         return {"file": filename}
     else:
         raise HTTPException(500, "Failed to generate thumbnail")
 
 @app.post("/api/projects/{project_id}/autofix")
 async def autofix_project(project_id: str, req: AutoFixRequest):
-    db = Database.load()
-    project = next((p for p in db["projects"] if p["id"] == project_id), None)
+    project = await run_blocking(Database.get_project, project_id)
     if not project: raise HTTPException(404, "Project not found")
     
     instruction = req.instruction
@@ -213,33 +476,52 @@ async def autofix_project(project_id: str, req: AutoFixRequest):
         else:
             raise HTTPException(400, "No instruction or audit report found")
     
-    await neural_swarm.log(f"🪄 Iniciando Auto-Fix para: {project['topic']}")
-    
-    for block in project.get("script", []):
-        refined = await neural_swarm.editor.refine_text(block['audio_text'], instruction)
-        block['audio_text'] = refined
-    
-    project['status'] = 'Auto-Fixed'
-    Database.update_project(project)
-    await neural_swarm.log("✅ Auto-Fix completado.")
-    return project
+    originals = [block.get('audio_text', '') for block in project.get("script", [])]
+
+    async def _autofix(job):
+        await neural_swarm.log(f"🪄 Iniciando Auto-Fix para: {project['topic']}")
+        await job.update(0, len(originals))
+
+        async def _refine(index, text):
+            refined = await neural_swarm.editor.refine_text(text, instruction)
+            await job.update(job.progress["done"] + 1, message=f"🪄 Bloque {index + 1}/{len(originals)} refinado")
+            return refined
+
+        refined = await gather_limited([_refine(i, text) for i, text in enumerate(originals)], parallel_limit())
+        # Blocks the user edited while the job ran keep their edit
+        current = await run_blocking(Database.get_project, project_id) or {}
+        script = current.get("script", [])
+        ops = [{"op": "replace", "path": f"/script/{i}/audio_text", "value": text}
+               for i, text in enumerate(refined) if i < len(script) and script[i].get("audio_text", "") == originals[i]]
+        ops.append({"op": "add", "path": "/status", "value": "Auto-Fixed"})
+        result = await apply_job_patch(project_id, ops)
+        await neural_swarm.log("✅ Auto-Fix completado.")
+        return result
+
+    return job_accepted("autofix", project_id, _autofix, params={"instruction": instruction})
+
+async def save_upload(file: UploadFile, filename: str) -> dict:
+    """Streams an upload into IMAGE_DIR (size-limited, hashed, atomic) and publishes it; 413 past `uploads.max_mb`."""
+    max_bytes = int((settings_manager.get("uploads", {}) or {}).get("max_mb", 25) * (1 << 20))
+    try:
+        upload = await stream_to_file(upload_chunks(file), os.path.join(IMAGE_DIR, filename), max_bytes)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    await run_blocking(publish, "images", filename)
+    return upload
 
 @app.post("/api/projects/{project_id}/upload/thumbnail")
 async def upload_thumbnail(project_id: str, file: UploadFile = File(...)):
-    filename = f"{project_id}_thumb_custom_{int(time.time())}_{file.filename}"
-    filepath = os.path.join(IMAGE_DIR, filename)
-    with open(filepath, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    db = Database.load()
-    project = next((p for p in db["projects"] if p["id"] == project_id), None)
+    filename = f"{project_id}_thumb_custom_{int(time.time())}_{os.path.basename(file.filename or 'upload')}"
+    upload = await save_upload(file, filename)
+    project = await run_blocking(Database.get_project, project_id)
     if project:
-        project["metadata"]["thumbnail_file"] = filename
-        Database.update_project(project)
-    return {"file": filename}
+        await save_fields(project_id, thumbnail_ops(project, filename))
+    return {"file": filename, "size": upload["size"], "sha256": upload["sha256"]}
+
 @app.post("/api/projects/{project_id}/images/block/{block_index}")
 async def regen_block_images(project_id: str, block_index: int):
-    db = Database.load()
-    project = next((p for p in db["projects"] if p["id"] == project_id), None)
+    project = await run_blocking(Database.get_project, project_id)
     if not project: raise HTTPException(404, "Project not found")
     
     try:
@@ -253,82 +535,94 @@ async def regen_block_images(project_id: str, block_index: int):
     
     if not prompts: raise HTTPException(400, "No visual prompts in block")
     
-    await neural_swarm.log(f"🔄 Regenerando imágenes para bloque {block_index}...")
-    new_images = []
-    for i, p in enumerate(prompts[:3]):
-        img = await neural_swarm.image_agent.generate_image(p, project_id, f"block_{block_index}_img_{i}_{int(time.time())}")
-        if img: new_images.append(img)
-        
-    block["generated_images"] = new_images
-    Database.update_project(project)
-    return {"images": new_images}
+    prompts = prompts[:3]
+
+    async def _regen(job):
+        await neural_swarm.log(f"🔄 Regenerando imágenes para bloque {block_index}...")
+        await job.update(0, len(prompts))
+
+        async def _generate(i, p):
+            img = await neural_swarm.image_agent.generate_image(p, project_id, f"block_{block_index}_img_{i}_{int(time.time())}")
+            await job.update(job.progress["done"] + 1, message=f"🖼️ Imagen {job.progress['done'] + 1}/{len(prompts)} del bloque {block_index}")
+            return img
+
+        new_images = [img for img in await gather_limited([_generate(i, p) for i, p in enumerate(prompts)], parallel_limit()) if img]
+        await apply_job_patch(project_id, [{"op": "add", "path": f"/script/{block_index}/generated_images", "value": new_images}])
+        return {"images": new_images}
+
+    return job_accepted("regen_block_images", project_id, _regen, target=f"block {block_index}", params={"prompts": prompts})
 
 @app.post("/api/projects/{project_id}/images/all")
 async def regen_all_images(project_id: str, background_tasks: BackgroundTasks):
-    db = Database.load()
-    project = next((p for p in db["projects"] if p["id"] == project_id), None)
+    project = await run_blocking(Database.get_project, project_id)
     if not project: raise HTTPException(404, "Project not found")
 
     async def _process_all_images():
         await neural_swarm.log(f"🚀 Iniciando generación masiva para: {project.get('topic')}")
+        ops = []
         # Thumbnail
         meta = project.get("metadata", {})
         if meta.get("thumbnail_prompt"):
              thm = await neural_swarm.image_agent.generate_image(meta["thumbnail_prompt"], project_id, f"thumb_all_{int(time.time())}")
-             if thm: meta["thumbnail_file"] = thm
+             if thm: ops += thumbnail_ops(project, thm)
         # Blocks
         for i, block in enumerate(project.get("script", [])):
             prompt = block.get("visual_prompt") or (block.get("visual_prompts")[0] if block.get("visual_prompts") else None)
             if prompt:
                 img = await neural_swarm.image_agent.generate_image(prompt, project_id, f"block_{i}_all_{int(time.time())}")
-                if img: block["generated_images"] = [img]
-        Database.update_project(project)
-        await manager.broadcast("Imágenes actualizadas", "project_update", project)
+                if img: ops.append({"op": "add", "path": f"/script/{i}/generated_images", "value": [img]})
+        try:
+            updated = await apply_job_patch(project_id, ops)
+        except (PatchError, RuntimeError) as e:
+            await neural_swarm.log(f"⚠️ Imágenes no guardadas: {e}")
+            return
+        await manager.broadcast("Imágenes actualizadas", "project_update", updated)
 
     background_tasks.add_task(_process_all_images)
     return {"status": "started"}
 
 @app.post("/api/projects/{project_id}/block/{block_index}/refine")
 async def refine_block_endpoint(project_id: str, block_index: int, req: AutoFixRequest):
-    db = Database.load()
-    project = next((p for p in db["projects"] if p["id"] == project_id), None)
+    project = await run_blocking(Database.get_project, project_id)
     if not project: raise HTTPException(404, "Project not found")
     try:
         block = project["script"][block_index]
     except IndexError: raise HTTPException(404, "Block not found")
         
-    refined_text = await neural_swarm.editor.refine_text(block['audio_text'], req.instruction or "Mejorar redacción.")
-    block['audio_text'] = refined_text
-    Database.update_project(project)
+    with priority(INTERACTIVE):
+        refined_text = await neural_swarm.editor.refine_text(block['audio_text'], req.instruction or "Mejorar redacción.")
+    # 409 if the block's text was edited meanwhile, instead of overwriting that edit
+    await save_fields(project_id, [{"op": "test", "path": f"/script/{block_index}/audio_text", "value": block['audio_text']},
+                             {"op": "replace", "path": f"/script/{block_index}/audio_text", "value": refined_text}])
     return {"text": refined_text}
 
 @app.post("/api/projects/{project_id}/block/{block_index}/regen_prompt")
 async def regen_visual_prompt_endpoint(project_id: str, block_index: int):
-    db = Database.load()
-    project = next((p for p in db["projects"] if p["id"] == project_id), None)
+    project = await run_blocking(Database.get_project, project_id)
     if not project: raise HTTPException(404, "Project not found")
     try:
         block = project["script"][block_index]
     except IndexError: raise HTTPException(404, "Block not found")
 
-    new_prompt = await neural_swarm.editor.regenerate_visual_prompt(block['audio_text'], project.get('topic', ''))
-    block['visual_prompt'] = new_prompt
-    Database.update_project(project)
+    with priority(INTERACTIVE):
+        new_prompt = await neural_swarm.editor.regenerate_visual_prompt(block['audio_text'], project.get('topic', ''))
+    await save_fields(project_id, [{"op": "add", "path": f"/script/{block_index}/visual_prompt", "value": new_prompt}])
     return {"visual_prompt": new_prompt}
 
 @app.post("/api/projects/{project_id}/upload/block/{block_index}")
 async def upload_block_image(project_id: str, block_index: int, file: UploadFile = File(...)):
-    filename = f"{project_id}_block{block_index}_custom_{int(time.time())}_{file.filename}"
-    filepath = os.path.join(IMAGE_DIR, filename)
-    with open(filepath, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    db = Database.load()
-    project = next((p for p in db["projects"] if p["id"] == project_id), None)
+    filename = f"{project_id}_block{block_index}_custom_{int(time.time())}_{os.path.basename(file.filename or 'upload')}"
+    upload = await save_upload(file, filename)
+    project = await run_blocking(Database.get_project, project_id)
     if project:
         try:
             block = project["script"][block_index]
-            if "generated_images" not in block: block["generated_images"] = []
-            block["generated_images"].insert(0, filename)
-            Database.update_project(project)
         except IndexError: raise HTTPException(404, "Block not found")
-    return {"file": filename}
+        if isinstance(block.get("generated_images"), list):
+            ops = [{"op": "add", "path": f"/script/{block_index}/generated_images/0", "value": filename}]
+        else:
+            ops = [{"op": "add", "path": f"/script/{block_index}/generated_images", "value": [filename]}]
+        await save_fields(project_id, ops)
+    return {"file": filename, "size": upload["size"], "sha256": upload["sha256"]}
+
+metrics.observe("startup", "api", "import_seconds", time.perf_counter() - _import_started)
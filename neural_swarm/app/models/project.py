@@ -20,6 +20,9 @@ class ProjectContext:
     deep_research: str = ""
     human_stories: str = ""
     verified_research: str = ""
+    # Verified research reused from the niche knowledge base and the sources of this run's grounded research
+    known_research: str = ""
+    research_sources: List[dict] = field(default_factory=list)
     
     # Phase 3: Scripting outputs
     script_outline: List[dict] = field(default_factory=list)
@@ -1,83 +1,115 @@
 import time
 import asyncio
+import importlib
+import contextvars
 from datetime import datetime
-from typing import Dict, TypedDict, Annotated, List, Any
-
-from langgraph.graph import StateGraph, END
+from typing import Dict, TypedDict, Annotated, List, Any, Optional
 
 from ..models.project import ProjectContext
+from ..core.config import ensure_data_dirs
 from ..core.database import Database
 from ..core.websocket import manager
+from ..core.settings import settings_manager
+from ..core.batch import BatchSession, current_batch, parallel_limit
+from ..core.utils import gather_limited, run_blocking
+from ..core.duration import duration_model, target_seconds
+from ..core.script_analysis import analyze_script, panel_plan
+from ..core.metrics import metrics
+
+# Agents are created on first use: attribute -> (module under app.agents, class or singleton).
+# Importing an agent module pulls in its provider stack, so a cold start only pays for what it runs.
+AGENTS = {
+    # Dept 1: Strategy
+    "trend_hunter": ("strategy", "TrendHunterAgent"),
+    "audience_profiler": ("strategy", "AudienceProfilerAgent"),
+    "competitor_analyst": ("strategy", "CompetitorAnalystAgent"),
+    "project_manager": ("strategy", "ProjectManagerAgent"),
+    # Dept 2: Research
+    "deep_researcher": ("research", "DeepResearcherAgent"),
+    "investigative_journalist": ("research", "InvestigativeJournalistAgent"),
+    "fact_checker": ("research", "FactCheckerAgent"),
+    # Dept 3: Narrative
+    "script_architect": ("narrative", "ScriptArchitectAgent"),
+    "lead_writer": ("narrative", "LeadWriterAgent"),
+    "hook_master": ("narrative", "HookMasterAgent"),
+    "comedy_specialist": ("narrative", "ComedySpecialistAgent"),
+    # Dept 4: Art
+    "art_director": ("art", "ArtDirectorAgent"),
+    "prompt_engineer": ("art", "PromptEngineerAgent"),
+    "thumbnail_strategist": ("art", "ThumbnailStrategistAgent"),
+    # Dept 5: Post-Production
+    "audio_director": ("post_production", "AudioDirectorAgent"),
+    "seo_optimizer": ("post_production", "SEOOptimizerAgent"),
+    # Helper agents
+    "voice_agent": ("helpers", "VoiceAgent"),
+    "image_agent": ("helpers", "ImageAgent"),
+    # New Departments (Audit & Editor)
+    "audit_panel": ("audit", "audit_panel"),
+    "editor": ("editor", "EditorAgent"),
+}
+
+class PipelineRun:
+    """Stop flag and latest graph state of one run_full_pipeline call."""
+
+    def __init__(self, state: ProjectContext):
+        self.stop_requested = False
+        self.state = state
+
+
+# Run of the current task; graph nodes inherit it through their copied context
+current_run: contextvars.ContextVar[Optional[PipelineRun]] = contextvars.ContextVar("current_run", default=None)
 
-# Import Agents
-from ..agents.strategy import TrendHunterAgent, AudienceProfilerAgent, ProjectManagerAgent, CompetitorAnalystAgent
-from ..agents.research import DeepResearcherAgent, InvestigativeJournalistAgent, FactCheckerAgent
-from ..agents.narrative import ScriptArchitectAgent, LeadWriterAgent, HookMasterAgent, ComedySpecialistAgent
-from ..agents.art import ArtDirectorAgent, PromptEngineerAgent, ThumbnailStrategistAgent
-from ..agents.post_production import AudioDirectorAgent, SEOOptimizerAgent
-from ..agents.helpers import VoiceAgent, ImageAgent
-from ..agents.audit import audit_panel
-from ..agents.editor import EditorAgent
 
 class NeuralSwarmOrchestrator:
     """Orquestador del Enjambre Neural v2.2 - LangGraph Powered."""
     
     def __init__(self):
-        # Dept 1: Strategy
-        self.trend_hunter = TrendHunterAgent()
-        self.audience_profiler = AudienceProfilerAgent()
-        self.competitor_analyst = CompetitorAnalystAgent()
-        self.project_manager = ProjectManagerAgent()
-        
-        # Dept 2: Research
-        self.deep_researcher = DeepResearcherAgent()
-        self.investigative_journalist = InvestigativeJournalistAgent()
-        self.fact_checker = FactCheckerAgent()
-        
-        # Dept 3: Narrative
-        self.script_architect = ScriptArchitectAgent()
-        self.lead_writer = LeadWriterAgent()
-        self.hook_master = HookMasterAgent()
-        self.comedy_specialist = ComedySpecialistAgent()
-        
-        # Dept 4: Art
-        self.art_director = ArtDirectorAgent()
-        self.prompt_engineer = PromptEngineerAgent()
-        self.thumbnail_strategist = ThumbnailStrategistAgent()
-        
-        # Dept 5: Post-Production
-        self.audio_director = AudioDirectorAgent()
-        self.seo_optimizer = SEOOptimizerAgent()
-        
-        # Helper agents
-        self.voice_agent = VoiceAgent()
-        self.image_agent = ImageAgent()
-        
-        # New Departments (Audit & Editor)
-        self.audit_panel = audit_panel
-        self.editor = EditorAgent()
+        self.running_tasks: Dict[asyncio.Task, PipelineRun] = {}
+        self._graph = None
 
-        self.stop_requested = False
+    def __getattr__(self, name: str):
+        # Only called for attributes not set yet: builds the agent and caches it on the instance
+        if name not in AGENTS:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        module_name, attr = AGENTS[name]
+        target = getattr(importlib.import_module(f"..agents.{module_name}", __package__), attr)
+        agent = target() if isinstance(target, type) else target
+        setattr(self, name, agent)
+        return agent
 
-        # Build Graph
-        self.graph = self._build_graph()
+    @property
+    def graph(self):
+        """The LangGraph workflow, compiled on first use (langgraph is the slowest import we have)."""
+        if self._graph is None:
+            self._graph = self._build_graph()
+        return self._graph
     
     async def log(self, message: str, phase: str = ""):
         prefix = f"[🧠 NeuralSwarm{' | ' + phase if phase else ''}]"
         print(f"{prefix} {message}")
         await manager.broadcast(f"{prefix} {message}", "info")
 
-    async def check_stop(self):
-        if self.stop_requested:
+    async def check_stop(self, state: ProjectContext = None):
+        run = current_run.get()
+        if run is None:
+            return
+        if state is not None:
+            # Latest state seen by a node; saved as a partial project if the run is stopped
+            run.state = state
+        if run.stop_requested:
             await self.log("🛑 DETENCIÓN SOLICITADA POR EL USUARIO. Abortando misión...", "SYSTEM")
             raise Exception("Swarm stopped by user")
 
     def stop(self):
-        """Signals the orchestrator to stop at the next checkpoint."""
-        self.stop_requested = True
+        """Stops running pipelines now: cancels their tasks, which interrupts backoff
+        sleeps and pending gathers and cancels queued batch jobs."""
         print("🛑 Orchestrator Stop Signal Received.")
+        for task, run in list(self.running_tasks.items()):
+            run.stop_requested = True
+            task.cancel()
 
     def _build_graph(self):
+        from langgraph.graph import StateGraph, END
         workflow = StateGraph(ProjectContext)
 
         # Nodes
@@ -86,6 +118,7 @@ class NeuralSwarmOrchestrator:
         workflow.add_node("scripting", self.run_phase_3_scripting)
         workflow.add_node("quality_check", self.run_quality_audit)
         workflow.add_node("refine", self.run_script_refinement) # NEW
+        workflow.add_node("rewrite", self.run_script_rewrite)
         workflow.add_node("assets", self.run_phase_4_assets)
         workflow.add_node("media", self.generate_media_node)
 
@@ -101,11 +134,13 @@ class NeuralSwarmOrchestrator:
             self.should_refine_script,
             {
                 "refine": "refine", # Goes to refinement first
+                "rewrite": "rewrite", # Hopeless draft: write it again instead of polishing it
                 "proceed": "assets"
             }
         )
         
         workflow.add_edge("refine", "quality_check") # Re-audit after refinement
+        workflow.add_edge("rewrite", "quality_check")
         workflow.add_edge("assets", "media")
         workflow.add_edge("media", END)
 
@@ -114,7 +149,7 @@ class NeuralSwarmOrchestrator:
     # --- LangGraph Node Methods ---
 
     async def run_phase_1_strategy(self, state: ProjectContext):
-        await self.check_stop()
+        await self.check_stop(state)
         await self.log("🏢 FASE 1: ESTRATEGIA Y DIRECCIÓN", "FASE 1")
         await asyncio.gather(
             self.trend_hunter.execute(state),
@@ -125,7 +160,7 @@ class NeuralSwarmOrchestrator:
         return state
 
     async def run_phase_2_research(self, state: ProjectContext):
-        await self.check_stop()
+        await self.check_stop(state)
         await self.log("🔎 FASE 2: INTELIGENCIA E INVESTIGACIÓN", "FASE 2")
         await asyncio.gather(
             self.deep_researcher.execute(state),
@@ -135,7 +170,7 @@ class NeuralSwarmOrchestrator:
         return state
 
     async def run_phase_3_scripting(self, state: ProjectContext):
-        await self.check_stop()
+        await self.check_stop(state)
         await self.log("✍️ FASE 3: NARRATIVA Y GUION", "FASE 3")
         await self.script_architect.execute(state)
         await self.lead_writer.execute(state)
@@ -144,13 +179,57 @@ class NeuralSwarmOrchestrator:
         return state
 
     async def run_quality_audit(self, state: ProjectContext):
-        await self.check_stop()
+        await self.check_stop(state)
         await self.log("🔍 CONTROL DE CALIDAD: AUDITORÍA", "AUDIT")
-        await self.audit_panel.execute(state)
+        target = target_seconds(state.project_bible.get("content_strategy", {}))
+        analysis = analyze_script(state.final_script, target)
+        length = None
+        if panel_plan(analysis)[0] != "skipped":
+            # Length is checked (and fixed) before the panel, so refinements that drift are caught too
+            length = await self.editor.fit_length(
+                state.final_script, target, state.project_bible.get("selected_topic", {}).get("title", "")
+            )
+            if length["actions"]:
+                analysis = analyze_script(state.final_script, target)
+        await self.log(f"🧮 Análisis local: {analysis['score']}/10 ({analysis['verdict']})", "AUDIT")
+        metrics.incr("script_gate", analysis["verdict"], "count")
+
+        panel, auditors = panel_plan(analysis)
+        if panel == "skipped":
+            # No point paying seven auditors to say the draft is broken
+            await self.log("🚫 Borrador inservible: se reescribe sin convocar al panel", "AUDIT")
+            state.audit_report = {
+                "panel_version": "2.2",
+                "global_score": analysis["score"],
+                "global_verdict": "Reescribir",
+                "agent_reports": [],
+                "top_issues": [],
+                "quick_wins": [],
+                "timestamp": datetime.now().isoformat()
+            }
+        else:
+            await self.audit_panel.execute(state, only=auditors)
+        metrics.incr("script_gate", "panel", panel)
+        local_issues = [("Análisis local", issue) for issue in analysis["issues"]]
+        state.audit_report["top_issues"] = (local_issues + list(state.audit_report.get("top_issues", [])))[:5]
+        state.audit_report["panel"] = panel
+        state.audit_report["heuristics"] = analysis
+        state.audit_report["predicted_duration"] = length
+        return state
+
+    async def run_script_rewrite(self, state: ProjectContext):
+        await self.check_stop(state)
+        await self.log("♻️ REESCRIBIENDO EL GUION DESDE LA ESCALETA...", "REWRITE")
+        if not state.script_outline:
+            await self.script_architect.execute(state)
+        await self.lead_writer.execute(state)
+        await self.hook_master.execute(state)
+        await self.comedy_specialist.execute(state)
+        state.refinement_count += 1
         return state
 
     async def run_script_refinement(self, state: ProjectContext):
-        await self.check_stop()
+        await self.check_stop(state)
         await self.log("✍️ REFINANDO GUIÓN SEGÚN AUDITORÍA...", "REFINE")
         issues = "\n".join([f"- {i[0]}: {i[1]}" for i in state.audit_report.get("top_issues", [])])
         
@@ -165,9 +244,13 @@ class NeuralSwarmOrchestrator:
         return state
 
     def should_refine_script(self, state: ProjectContext):
-        score = state.audit_report.get("overall_score", 10)
+        score = state.audit_report.get("global_score", 10)
         max_refinements = 3
         
+        if state.audit_report.get("panel") == "skipped" and state.refinement_count < max_refinements:
+            print(f"⚠️ Borrador inservible ({score}/10). Reescritura completa (Intento {state.refinement_count + 1}/{max_refinements}).")
+            return "rewrite"
+        
         if score < 7 and state.refinement_count < max_refinements:
             print(f"⚠️ Calidad insuficiente ({score}/10). Re-escritura iniciada (Intento {state.refinement_count + 1}/{max_refinements}).")
             return "refine"
@@ -178,7 +261,7 @@ class NeuralSwarmOrchestrator:
         return "proceed"
 
     async def run_phase_4_assets(self, state: ProjectContext):
-        await self.check_stop()
+        await self.check_stop(state)
         await self.log("🎨 FASE 4: PRODUCCIÓN DE ACTIVOS", "FASE 4")
         async def visual_track():
             await self.art_director.execute(state)
@@ -193,23 +276,27 @@ class NeuralSwarmOrchestrator:
         return state
 
     async def generate_media_node(self, state: ProjectContext):
-        await self.check_stop()
+        await self.check_stop(state)
         await self.log("🎬 GENERACIÓN DE MEDIA", "MEDIA")
-        # Generate images
-        for i, prompt_data in enumerate(state.visual_prompts):
-            filename = await self.image_agent.generate_image(prompt_data.get("prompt", ""), state.project_id, f"block_{i}")
-            if filename: state.generated_images.append(filename)
-        
-        # Thumbnail
+        limit = parallel_limit()
         thumb_prompt = state.thumbnail_concept.get("technical_prompt", "")
-        if thumb_prompt:
-            thumb_file = await self.image_agent.generate_image(thumb_prompt, state.project_id, "thumbnail")
-            if thumb_file: state.thumbnail_concept["generated_file"] = thumb_file
         
-        # Audio
-        for i, block in enumerate(state.final_script):
-            audio_file = await self.voice_agent.synthesize([block], state.project_id, i)
-            if audio_file: state.audio_files.append(audio_file[0])
+        # Images, thumbnail and per-block audio are independent of each other
+        images, thumb_file, audio_files = await asyncio.gather(
+            gather_limited([
+                self.image_agent.generate_image(prompt_data.get("prompt", ""), state.project_id, f"block_{i}")
+                for i, prompt_data in enumerate(state.visual_prompts)
+            ], limit),
+            self.image_agent.generate_image(thumb_prompt, state.project_id, "thumbnail") if thumb_prompt else asyncio.sleep(0),
+            gather_limited([
+                self.voice_agent.synthesize([block], state.project_id, i)
+                for i, block in enumerate(state.final_script)
+            ], limit)
+        )
+        
+        state.generated_images.extend(f for f in images if f)
+        if thumb_file: state.thumbnail_concept["generated_file"] = thumb_file
+        state.audio_files.extend(files[0] for files in audio_files if files)
         
         return state
 
@@ -234,8 +321,12 @@ class NeuralSwarmOrchestrator:
                 "audio_text": block.get("audio_text", ""),
                 "visual_prompt": visual_prompts[i].get("prompt", "") if i < len(visual_prompts) else "",
                 "word_count": block.get("word_count", len(block.get("audio_text", "").split())),
-                "duration_seconds": block.get("duration_seconds", 30),
+                # Real WAV length once synthesized; until then the calibrated prediction
+                "duration_seconds": block.get("duration_seconds") if block.get("audio_file") and block.get("duration_seconds")
+                                    else round(duration_model.predict(block.get("audio_text", "")), 1),
                 "audio_file": block.get("audio_file", ""),
+                "audio_chunks": block.get("audio_chunks", []),
+                "audio_processing": block.get("audio_processing", {}),
                 "generated_images": [generated_images[i]] if i < len(generated_images) else []
             })
         
@@ -255,6 +346,7 @@ class NeuralSwarmOrchestrator:
             "status": "Neural Swarm v2.2 - LangGraph Completed",
             "script": script_blocks,
             "metadata": metadata,
+            "seo_package": seo_package,
             "project_bible": project_bible,
             "audience_profile": get_val(context, "audience_profile", {}),
             "competitor_analysis": get_val(context, "competitor_analysis", []),
@@ -264,21 +356,71 @@ class NeuralSwarmOrchestrator:
             "neural_swarm_version": "2.2"
         }
     
-    async def run_full_pipeline(self, niche: str) -> dict:
-        self.stop_requested = False
+    async def assemble_master_audio(self, project: dict, force: bool = False):
+        """Post-production: one master track plus the block timing index (kept in project["master_audio"])."""
+        try:
+            from ..core.mastering import build_master_track
+            master = await run_blocking(build_master_track, project, force)
+        except Exception as e:
+            await self.log(f"⚠️ Error montando la pista máster: {e}", "MASTER")
+            return None
+        if master:
+            await self.log(f"🎚️ Pista máster lista: {master['file']} ({master['duration_seconds']:.1f}s)", "MASTER")
+        return master
+    
+    async def calibrate_durations(self, project: dict):
+        """Feeds the real block durations of this run back into the duration predictor."""
+        try:
+            samples = await run_blocking(duration_model.calibrate, project)
+        except Exception as e:
+            await self.log(f"⚠️ Error calibrando duraciones: {e}", "MASTER")
+            return
+        if samples:
+            rate = duration_model.coefficients()
+            await self.log(f"⏱️ Predictor de duración calibrado con {samples} bloques ({rate['words_per_minute']} palabras/min)", "MASTER")
+    
+    async def run_full_pipeline(self, niche: str, mode: Optional[str] = None) -> dict:
+        """Runs the whole graph. mode="batch" sends every model call through batch jobs."""
+        ensure_data_dirs()
         project_id = f"proj_{int(time.time())}"
-        await self.log("🚀 ENJAMBRE NEURAL v2.2 - INICIANDO (LANGGRAPH)", "SYSTEM")
+        mode = mode or settings_manager.get("execution_mode", "interactive")
+        await self.log(f"🚀 ENJAMBRE NEURAL v2.2 - INICIANDO (LANGGRAPH{' | BATCH' if mode == 'batch' else ''})", "SYSTEM")
         
+        session = BatchSession.from_settings(asyncio.get_running_loop()) if mode == "batch" else None
+        token = current_batch.set(session)
         initial_state = ProjectContext(project_id=project_id, niche=niche)
+        run = PipelineRun(initial_state)
+        run_token = current_run.set(run)
+        task = asyncio.current_task()
+        self.running_tasks[task] = run
         try:
             # Run the graph
             final_state = await self.graph.ainvoke(initial_state)
             
             project = self.compile_project(final_state)
-            Database.add_project(project)
+            await self.assemble_master_audio(project)
+            await self.calibrate_durations(project)
+            await run_blocking(Database.add_project, project)
             
             await self.log(f"✅ PRODUCCIÓN COMPLETADA: {project.get('topic')[:50]}...", "SYSTEM")
             return project
+        except asyncio.CancelledError:
+            if not run.stop_requested:
+                raise
+            # Blocking calls already in a worker thread finish on their own; their results are dropped
+            if session is not None:
+                session.cancel()
+            project = self.compile_project(run.state)
+            project["status"] = "Stopped by user (partial)"
+            await run_blocking(Database.add_project, project)
+            await self.log("🛑 Producción detenida. Estado parcial guardado.", "SYSTEM")
+            return project
         except Exception as e:
             await self.log(f"❌ ERROR CRÍTICO EN EL GRAFO: {e}", "SYSTEM")
             raise e
+        finally:
+            self.running_tasks.pop(task, None)
+            current_run.reset(run_token)
+            current_batch.reset(token)
+            if session is not None:
+                await session.close()
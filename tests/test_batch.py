@@ -0,0 +1,139 @@
+"""Batch mode end to end on LocalBatchBackend: flush, submit, poll, result and cancel."""
+import json
+import time
+import asyncio
+
+import pytest
+from google.genai import types
+
+from neural_swarm.app.core.ai import client
+from neural_swarm.app.core.batch import BatchSession, LocalBatchBackend, current_batch
+from neural_swarm.app.core.utils import run_blocking
+
+SCHEMA = {"type": "object", "properties": {"topic": {"type": "string"}, "score": {"type": "integer", "minimum": 5}}}
+
+
+def _json_config():
+    return types.GenerateContentConfig(response_mime_type="application/json", response_json_schema=SCHEMA)
+
+
+def _run(backend, calls, **session_kwargs):
+    """Runs `calls(session)` inside a batch session; returns (results, session)."""
+    async def _main():
+        session = BatchSession(backend, asyncio.get_running_loop(), **{"window": 0.05, "poll_interval": 0.01, **session_kwargs})
+        token = current_batch.set(session)
+        try:
+            return await calls(session), session
+        finally:
+            current_batch.reset(token)
+            await session.close()
+    return asyncio.run(_main())
+
+
+def _generate(model, contents, config=None):
+    return run_blocking(lambda: client.models.generate_content(model=model, contents=contents, config=config))
+
+
+def test_local_backend_submit_poll_result():
+    backend = LocalBatchBackend()
+    name = backend.submit("m", [{"contents": "uno", "config": None}, {"contents": "dos", "config": _json_config()}])
+    deadline = time.monotonic() + 5
+    while backend.poll(name)[1] is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    state, results = backend.poll(name)
+    assert state == "JOB_STATE_SUCCEEDED"
+    assert [error for _, error in results] == [None, None]
+    assert results[0][0].text == "[batch:m] uno"
+    assert json.loads(results[1][0].text) == {"topic": "stub", "score": 5}
+
+
+def test_phase_calls_share_one_job_per_model():
+    backend = LocalBatchBackend()
+
+    async def calls(session):
+        return await asyncio.gather(
+            _generate("fast", "a", _json_config()),
+            _generate("fast", "b", _json_config()),
+            _generate("fast", "c"),
+            _generate("slow", "d"),
+        )
+
+    responses, _ = _run(backend, calls)
+    assert len(backend.jobs) == 2
+    assert json.loads(responses[0].text) == {"topic": "stub", "score": 5}
+    assert responses[2].text == "[batch:fast] c"
+    assert responses[3].text == "[batch:slow] d"
+
+
+def test_max_requests_flushes_before_the_window():
+    backend = LocalBatchBackend()
+
+    async def calls(session):
+        return await asyncio.gather(*[_generate("fast", str(i)) for i in range(4)])
+
+    started = time.monotonic()
+    responses, _ = _run(backend, calls, window=5.0, max_requests=2)
+    assert time.monotonic() - started < 5.0
+    assert [r.text for r in responses] == [f"[batch:fast] {i}" for i in range(4)]
+    assert [len(job["results"]) for job in backend.jobs.values()] == [2, 2]
+
+
+def test_media_modalities_get_inline_data():
+    backend = LocalBatchBackend()
+    audio = types.GenerateContentConfig(response_modalities=["AUDIO"])
+    image = types.GenerateContentConfig(response_modalities=["IMAGE"])
+
+    async def calls(session):
+        return await asyncio.gather(_generate("tts", "hola", audio), _generate("img", "gato", image))
+
+    (speech, picture), _ = _run(backend, calls)
+    assert speech.candidates[0].content.parts[0].inline_data.mime_type == "audio/pcm"
+    assert picture.candidates[0].content.parts[0].inline_data.data.startswith(b"\x89PNG")
+
+
+def test_failed_request_raises_for_its_caller_only():
+    def executor(model, request):
+        if request["contents"] == "bad":
+            raise ValueError("blocked")
+        return types.GenerateContentResponse(candidates=[types.Candidate(
+            content=types.Content(role="model", parts=[types.Part(text="ok")]))])
+
+    async def calls(session):
+        return await asyncio.gather(_generate("m", "good"), _generate("m", "bad"), return_exceptions=True)
+
+    (good, bad), _ = _run(LocalBatchBackend(executor), calls)
+    assert good.text == "ok"
+    assert isinstance(bad, RuntimeError) and "blocked" in str(bad)
+
+
+def test_cancel_fails_parked_callers_and_cancels_the_job():
+    backend = LocalBatchBackend(latency=0.5)
+
+    async def calls(session):
+        pending = asyncio.gather(_generate("m", "a"), _generate("m", "b"), return_exceptions=True)
+        while not backend.jobs:
+            await asyncio.sleep(0.01)
+        session.cancel()
+        return await pending
+
+    errors, _ = _run(backend, calls, window=0.01)
+    for error in errors:
+        assert isinstance(error, RuntimeError) and "stopped" in str(error)
+    time.sleep(0.1)
+    assert [job["state"] for job in backend.jobs.values()] == ["JOB_STATE_CANCELLED"]
+
+
+def test_cancel_drops_requests_not_yet_flushed():
+    backend = LocalBatchBackend()
+
+    async def calls(session):
+        pending = asyncio.ensure_future(_generate("m", "a"))
+        while not session.pending:
+            await asyncio.sleep(0.01)
+        session.cancel()
+        return await asyncio.gather(pending, return_exceptions=True)
+
+    (error,), _ = _run(backend, calls, window=5.0)
+    assert isinstance(error, RuntimeError) and "stopped" in str(error)
+    assert backend.jobs == {}
@@ -0,0 +1,82 @@
+"""OpenAICompatibleProvider against the local `/v1/chat/completions` stub."""
+import json
+import urllib.request
+
+import pytest
+
+from neural_swarm.app.core import providers
+from neural_swarm.app.core.llm_stub import serve_in_background
+from neural_swarm.app.core.providers import OpenAICompatibleProvider
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "score": {"type": "integer", "minimum": 3},
+        "tags": {"type": "array", "items": {"type": "string"}, "minItems": 2},
+        "approved": {"type": "boolean"},
+    },
+    "required": ["title", "score", "tags", "approved"],
+}
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = serve_in_background()
+    host, port = server.server_address
+    yield f"http://{host}:{port}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def provider(stub_url):
+    return OpenAICompatibleProvider(base_url=stub_url + "/", default_model="stub-model", timeout=5)
+
+
+def test_chat_completion_round_trip(provider):
+    text = provider.generate_text("stub-model", "Hola, mundo")
+    assert text == "[stub:stub-model] Hola, mundo"
+
+
+def test_default_model_when_none_given(provider):
+    assert provider.generate_text("", "ping").startswith("[stub:stub-model]")
+
+
+def test_json_schema_mode_returns_valid_instance(provider):
+    data = provider.generate_json("stub-model", "Dame un título", SCHEMA)
+    assert data == {"title": "stub", "score": 3, "tags": ["stub", "stub"], "approved": True}
+
+
+def test_json_object_mode_without_schema_support(stub_url):
+    provider = OpenAICompatibleProvider(base_url=stub_url, default_model="stub-model", json_schema=False, timeout=5)
+    assert provider.generate_json("stub-model", "Dame JSON") == {}
+
+
+def test_request_body_and_auth_header(stub_url, monkeypatch):
+    sent = []
+    real_urlopen = urllib.request.urlopen
+
+    def _spy(req, timeout=None):
+        sent.append(req)
+        return real_urlopen(req, timeout=timeout)
+
+    monkeypatch.setattr(urllib.request, "urlopen", _spy)
+    provider = OpenAICompatibleProvider(base_url=stub_url, api_key="secret", default_model="stub-model", timeout=5)
+    provider.generate_json("stub-model", "prompt", SCHEMA)
+    body = json.loads(sent[0].data)
+    assert sent[0].full_url == stub_url + "/chat/completions"
+    assert sent[0].get_header("Authorization") == "Bearer secret"
+    assert body["messages"] == [{"role": "user", "content": "prompt"}]
+    assert body["response_format"] == {"type": "json_schema", "json_schema": {"name": "output", "schema": SCHEMA}}
+
+
+def test_routing_sends_agent_to_configured_provider(stub_url, monkeypatch):
+    monkeypatch.setitem(providers.settings_manager.settings, "providers",
+                        {"local": {"type": "openai", "base_url": stub_url, "model": "routed-model"}})
+    monkeypatch.setitem(providers.settings_manager.settings, "routing", {"PromptEngineer": "local"})
+    monkeypatch.setattr(providers, "_provider_cache", {})
+    provider, model = providers.resolve_route("PromptEngineer.expand", "gemini-2.0-flash")
+    assert isinstance(provider, OpenAICompatibleProvider)
+    assert model == "routed-model"
+    assert provider.generate_text(model, "hola") == "[stub:routed-model] hola"
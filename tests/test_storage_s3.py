@@ -0,0 +1,215 @@
+"""S3Storage against an in-process S3 stand-in that checks every SigV4 signature.
+
+The stand-in verifies signatures from the request as received (path, query
+and signed headers), independently of how S3Storage builds them, so an
+encoding or canonicalization mistake fails here the way it would on S3/MinIO.
+"""
+import hmac
+import hashlib
+import datetime
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+import pytest
+
+from neural_swarm.app.core.storage import S3Storage, StorageError
+
+ACCESS_KEY = "minio-test"
+SECRET_KEY = "minio-test-secret"
+REGION = "eu-west-1"
+BUCKET = "swarm-assets"
+PAGE_SIZE = 2
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+def _enc(value: str, safe: str = "-_.~") -> str:
+    return urllib.parse.quote(value, safe=safe)
+
+
+def _expected_signature(method, path, params, headers, signed_headers, payload_hash, stamp, scope):
+    canonical_uri = _enc(urllib.parse.unquote(path), "-_.~/")
+    canonical_query = "&".join(f"{_enc(k)}={_enc(v)}" for k, v in sorted(params))
+    canonical_headers = "".join(f"{name}:{' '.join(headers[name].split())}\n" for name in signed_headers)
+    canonical = "\n".join([method, canonical_uri, canonical_query, canonical_headers, ";".join(signed_headers), payload_hash])
+    to_sign = "\n".join(["AWS4-HMAC-SHA256", stamp, scope, hashlib.sha256(canonical.encode()).hexdigest()])
+    key = f"AWS4{SECRET_KEY}".encode()
+    for part in scope.split("/"):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    return hmac.new(key, to_sign.encode(), hashlib.sha256).hexdigest()
+
+
+class FakeS3Handler(BaseHTTPRequestHandler):
+    objects = {}
+
+    def _reply(self, status, body=b"", content_type="application/xml"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _authorize(self, body):
+        """None when the request is correctly signed, otherwise the reason."""
+        parts = urllib.parse.urlsplit(self.path)
+        params = urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        query = dict(params)
+        headers = {k.lower(): v for k, v in self.headers.items()}
+        if "X-Amz-Signature" in query:
+            credential, stamp = query.get("X-Amz-Credential", ""), query.get("X-Amz-Date", "")
+            signed_headers = query.get("X-Amz-SignedHeaders", "").split(";")
+            signature, payload_hash = query["X-Amz-Signature"], "UNSIGNED-PAYLOAD"
+            params = [(k, v) for k, v in params if k != "X-Amz-Signature"]
+            expires = datetime.timedelta(seconds=int(query.get("X-Amz-Expires", "0")))
+        else:
+            auth = headers.get("authorization", "")
+            if not auth.startswith("AWS4-HMAC-SHA256 "):
+                return "missing authorization"
+            fields = dict(item.strip().split("=", 1) for item in auth[len("AWS4-HMAC-SHA256 "):].split(","))
+            credential, signed_headers, signature = fields["Credential"], fields["SignedHeaders"].split(";"), fields["Signature"]
+            stamp, payload_hash = headers.get("x-amz-date", ""), headers.get("x-amz-content-sha256", "")
+            if payload_hash != hashlib.sha256(body).hexdigest():
+                return "payload hash mismatch"
+            expires = datetime.timedelta(minutes=15)
+        access_key, scope = credential.split("/", 1)
+        if access_key != ACCESS_KEY or scope != f"{stamp[:8]}/{REGION}/s3/aws4_request":
+            return "bad credential scope"
+        if "host" not in signed_headers or any(name not in headers for name in signed_headers):
+            return "unsigned host or missing signed header"
+        signed_at = datetime.datetime.strptime(stamp, "%Y%m%dT%H%M%SZ").replace(tzinfo=datetime.timezone.utc)
+        if abs(datetime.datetime.now(datetime.timezone.utc) - signed_at) > expires:
+            return "request expired"
+        expected = _expected_signature(self.command, parts.path, params, headers, signed_headers, payload_hash, stamp, scope)
+        if not hmac.compare_digest(expected, signature):
+            return "signature mismatch"
+        return None
+
+    def _handle(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        error = self._authorize(body)
+        if error:
+            self._reply(403, f"<Error><Code>SignatureDoesNotMatch</Code><Message>{error}</Message></Error>".encode())
+            return
+        parts = urllib.parse.urlsplit(self.path)
+        bucket, _, key = urllib.parse.unquote(parts.path).lstrip("/").partition("/")
+        if bucket != BUCKET:
+            self._reply(404, b"<Error><Code>NoSuchBucket</Code></Error>")
+            return
+        if not key:
+            self._list(dict(urllib.parse.parse_qsl(parts.query)))
+        elif self.command == "PUT":
+            self.objects[key] = (body, datetime.datetime.now(datetime.timezone.utc))
+            self._reply(200)
+        elif key not in self.objects:
+            self._reply(404, b"<Error><Code>NoSuchKey</Code></Error>")
+        elif self.command == "DELETE":
+            del self.objects[key]
+            self._reply(204)
+        else:
+            self._reply(200, self.objects[key][0], "application/octet-stream")
+
+    def _list(self, query):
+        prefix = query.get("prefix", "")
+        after = query.get("continuation-token", "")
+        keys = sorted(k for k in self.objects if k.startswith(prefix) and k > after)
+        page, truncated = keys[:PAGE_SIZE], len(keys) > PAGE_SIZE
+        items = "".join(
+            f"<Contents><Key>{escape(k)}</Key><Size>{len(self.objects[k][0])}</Size>"
+            f"<LastModified>{self.objects[k][1].strftime('%Y-%m-%dT%H:%M:%S.000Z')}</LastModified></Contents>"
+            for k in page
+        )
+        token = f"<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>" if truncated else ""
+        xml = (f'<?xml version="1.0" encoding="UTF-8"?><ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+               f"<Name>{BUCKET}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(page)}</KeyCount>"
+               f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>{token}{items}</ListBucketResult>")
+        self._reply(200, xml.encode())
+
+    do_GET = do_PUT = do_DELETE = do_HEAD = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def endpoint():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeS3Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    yield f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def storage(endpoint):
+    FakeS3Handler.objects = {}
+    return S3Storage(endpoint, BUCKET, ACCESS_KEY, SECRET_KEY, region=REGION, prefix="neural/", timeout=5)
+
+
+def _local_file(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_put_fetch_round_trip(storage, tmp_path):
+    data = b"RIFF" + bytes(range(256)) * 40
+    storage.put("audio", "bloque 1 ñ+&=.wav", _local_file(tmp_path, "src.wav", data))
+    assert set(FakeS3Handler.objects) == {"neural/audio/bloque 1 ñ+&=.wav"}
+    target = tmp_path / "copy.wav"
+    assert storage.fetch("audio", "bloque 1 ñ+&=.wav", str(target)) is True
+    assert target.read_bytes() == data
+    assert storage.size("audio", "bloque 1 ñ+&=.wav") == len(data)
+
+
+def test_missing_object_and_delete(storage, tmp_path):
+    assert storage.fetch("images", "nope.png", str(tmp_path / "nope.png")) is False
+    assert storage.size("images", "nope.png") is None
+    storage.put("images", "a.png", _local_file(tmp_path, "a.png", b"png"))
+    storage.delete("images", "a.png")
+    storage.delete("images", "a.png")
+    assert storage.size("images", "a.png") is None
+
+
+def test_list_follows_continuation_tokens(storage, tmp_path):
+    names = [f"proj_{i}_draft.mp4" for i in range(5)]
+    for i, name in enumerate(names):
+        storage.put("video", name, _local_file(tmp_path, name, b"v" * (i + 1)))
+    storage.put("audio", "other.wav", _local_file(tmp_path, "other.wav", b"a"))
+    listed = list(storage.list("video"))
+    assert [(name, size) for name, size, _ in listed] == [(name, i + 1) for i, name in enumerate(names)]
+    assert all(abs(mtime - datetime.datetime.now().timestamp()) < 60 for _, _, mtime in listed)
+
+
+def test_presigned_url_downloads_the_object(storage, tmp_path):
+    storage.put("images", "portada final.png", _local_file(tmp_path, "p.png", b"\x89PNG data"))
+    url = storage.url("images", "portada final.png")
+    with urllib.request.urlopen(url, timeout=5) as resp:
+        assert resp.read() == b"\x89PNG data"
+    with pytest.raises(urllib.error.HTTPError) as tampered:
+        urllib.request.urlopen(url.replace("X-Amz-Expires=3600", "X-Amz-Expires=7200"), timeout=5)
+    assert tampered.value.code == 403
+
+
+def test_public_base_url_skips_presigning(endpoint):
+    storage = S3Storage(endpoint, BUCKET, ACCESS_KEY, SECRET_KEY, region=REGION, prefix="neural/",
+                        public_base_url="https://cdn.example.com/")
+    assert storage.url("audio", "voz 1.wav") == "https://cdn.example.com/neural/audio/voz%201.wav"
+
+
+def test_wrong_secret_is_rejected(endpoint, tmp_path):
+    storage = S3Storage(endpoint, BUCKET, ACCESS_KEY, "not-the-secret", region=REGION, timeout=5)
+    with pytest.raises(StorageError, match="403"):
+        storage.put("audio", "x.wav", _local_file(tmp_path, "x.wav", b"x"))
+
+
+def test_unknown_bucket(endpoint, tmp_path):
+    storage = S3Storage(endpoint, "missing-bucket", ACCESS_KEY, SECRET_KEY, region=REGION, timeout=5)
+    with pytest.raises(StorageError, match="not found"):
+        storage.put("audio", "x.wav", _local_file(tmp_path, "x.wav", b"x"))
+    with pytest.raises(StorageError, match="not found"):
+        list(storage.list("audio"))